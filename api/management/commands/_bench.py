@@ -0,0 +1,103 @@
+"""
+Shared helpers for the benchmark management commands.
+
+Benchmarks always run against a throwaway test database (in-memory on
+SQLite, ``test_<name>`` on PostgreSQL) so they never touch real data.
+"""
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation, Operateur
+
+
+@contextmanager
+def scratch_database():
+    """Create a migrated test database for the duration of the block."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Return the fastest wall time (seconds) of ``repeat`` calls to func."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(func, repeat: int = 5) -> tuple[float, int]:
+    """
+    Best wall time (seconds) and query count of ``func``.
+
+    Every call runs in a transaction that is rolled back afterwards, so
+    state-changing functions (transitions, imports) can be repeated on
+    the same data. Queries are counted on an extra, untimed call.
+    """
+    def run():
+        with transaction.atomic():
+            func()
+            transaction.set_rollback(True)
+
+    # The log is capped (9000 entries): a full one would count 0 queries
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        run()
+    return best_of(run, repeat), len(ctx.captured_queries)
+
+
+def environment() -> dict:
+    """Context stored next to benchmark results (backend, git revision)."""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'vendor': connection.vendor,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'revision': revision,
+    }
+
+
+def populate_inventory(nb_concentrateurs: int, batch_size: int = 2000) -> None:
+    """Bulk-insert a minimal but realistic inventory (4 K per carton)."""
+    bos = [Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD]
+    operateurs = [op.value for op in Operateur]
+    etats = [Etat.EN_STOCK, Etat.POSE, Etat.EN_LIVRAISON, Etat.A_TESTER]
+
+    postes = Poste.objects.bulk_create([
+        Poste(code=f'BENCH-P{i:04d}', nom=f'Poste {i}', base_operationnelle=bos[i % 3])
+        for i in range(30)
+    ])
+    cartons = Carton.objects.bulk_create([
+        Carton(num_carton=f'BENCH-C{i:07d}', operateur=operateurs[i % 3])
+        for i in range((nb_concentrateurs + 3) // 4)
+    ], batch_size=batch_size)
+
+    Concentrateur.objects.bulk_create([
+        Concentrateur(
+            n_serie=f'BENCH-K{i:08d}',
+            carton=cartons[i // 4],
+            operateur=cartons[i // 4].operateur,
+            etat=etats[i % len(etats)],
+            affectation=bos[i % 3],
+            poste_pose=postes[i % len(postes)] if etats[i % len(etats)] == Etat.POSE else None,
+        )
+        for i in range(nb_concentrateurs)
+    ], batch_size=batch_size)
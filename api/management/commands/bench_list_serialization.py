@@ -0,0 +1,76 @@
+"""
+Management command comparing list serialization paths.
+
+Usage:
+    python manage.py bench_list_serialization
+    python manage.py bench_list_serialization --sizes 50 500 5000 --fields n_serie,etat,affectation
+"""
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import ConcentrateurListSerializer
+from apps.inventory.models import Concentrateur
+
+from ._bench import scratch_database, best_of, populate_inventory
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ConcentrateurListSerializer against the ?fields= values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[50, 500, 5000],
+            help='Page sizes to benchmark (default: 50 500 5000)'
+        )
+        parser.add_argument(
+            '--fields',
+            type=str,
+            default='n_serie,etat,affectation',
+            help='Sparse fieldset to request (default: n_serie,etat,affectation)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement, the best one is kept (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        repeat = options['repeat']
+        request = Request(APIRequestFactory().get('/', {'fields': options['fields']}))
+
+        with scratch_database():
+            populate_inventory(sizes[-1])
+            queryset = Concentrateur.objects.select_related('carton', 'poste_pose').order_by('-updated_at')
+
+            columns = ConcentrateurListSerializer(context={'request': request}).get_values_columns()
+            if columns is None:
+                self.stdout.write(self.style.WARNING(
+                    f"'{options['fields']}' is not served by the values() path, only the serializer is timed"
+                ))
+
+            self.stdout.write(f"{'rows':>6} {'full (ms)':>10} {'sparse (ms)':>12} {'values (ms)':>12} {'speedup':>8}")
+            for size in sizes:
+                full = best_of(
+                    lambda: ConcentrateurListSerializer(queryset[:size], many=True).data,
+                    repeat
+                )
+                sparse = best_of(
+                    lambda: ConcentrateurListSerializer(
+                        queryset[:size], many=True, context={'request': request}
+                    ).data,
+                    repeat
+                )
+                if columns is not None:
+                    values = best_of(lambda: list(queryset.values(*columns)[:size]), repeat)
+                    self.stdout.write(
+                        f"{size:>6} {full * 1000:>10.2f} {sparse * 1000:>12.2f} "
+                        f"{values * 1000:>12.2f} {full / values:>7.1f}x"
+                    )
+                else:
+                    self.stdout.write(f"{size:>6} {full * 1000:>10.2f} {sparse * 1000:>12.2f} {'-':>12} {'-':>8}")
@@ -0,0 +1,201 @@
+"""
+Management command timing service transitions, API endpoints and imports.
+
+Each dataset size is generated with ``generate_dataset`` in a scratch
+database. Every case records its best wall time and its query count;
+results can be written to JSON and compared with a previous run.
+
+SQLite by default; set ``USE_POSTGRES=True`` (and the ``DB_*`` variables)
+to run against a local PostgreSQL server.
+
+Usage:
+    python manage.py bench_suite
+    python manage.py bench_suite --sizes 1000 10000 --output bench.json
+    python manage.py bench_suite --output new.json --compare bench.json
+"""
+import io
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from apps.core.models import User
+from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
+from services.business_logic import ConcentrateurService
+from services.export import CONCENTRATEUR_COLUMNS, iter_csv
+
+from ._bench import scratch_database, measure, environment
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ConcentrateurService transitions, list/search/dashboard endpoints and import_csv'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Number of K in the generated datasets (default: 1000 10000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per measurement, the best one is kept (default: 3)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Dataset seed (default: 1)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Previous JSON results; fails if a case got slower or runs more queries'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=1.25,
+            help='Time ratio over the baseline reported as a regression (default: 1.25)'
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        self.temp_files = []
+        setup_test_environment()
+        try:
+            for size in sorted(options['sizes']):
+                with scratch_database():
+                    self.stdout.write(f"\n=== {size} K ===")
+                    call_command(
+                        'generate_dataset', '--cartons', max(size // 4, 1), '--postes', max(size // 8, 3),
+                        '--days', 365, '--seed', options['seed'], stdout=io.StringIO()
+                    )
+                    for name, func in self._cases():
+                        seconds, queries = measure(func, options['repeat'])
+                        results.append({'case': name, 'size': size, 'ms': round(seconds * 1000, 2),
+                                        'queries': queries})
+                        self.stdout.write(f"{name:<40} {seconds * 1000:>10.2f} ms {queries:>6} queries")
+        finally:
+            teardown_test_environment()
+            for path in self.temp_files:
+                Path(path).unlink(missing_ok=True)
+
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if options['compare']:
+            self._compare(results, options['compare'], options['threshold'])
+
+    def _cases(self):
+        """(name, callable) pairs for the current dataset."""
+        admin = User.objects.create_user(username='bench', password='bench', profil='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        def get(url, **params):
+            def call():
+                response = client.get(url, params)
+                assert response.status_code == 200, response.status_code
+            return call
+
+        cases = []
+
+        carton = Carton.objects.filter(concentrateurs__etat=Etat.EN_LIVRAISON).values_list('num_carton', flat=True).first()
+        if carton:
+            cases.append(('service.reception_carton',
+                          lambda: ConcentrateurService.reception_carton(carton, admin)))
+
+        operateur = Carton.objects.filter(
+            concentrateurs__etat=Etat.EN_STOCK, concentrateurs__affectation=Affectation.MAGASIN
+        ).values_list('operateur', flat=True).first()
+        if operateur:
+            cases.append(('service.commander_cartons',
+                          lambda: ConcentrateurService.commander_cartons(operateur, 1, admin)))
+
+        k_stock = Concentrateur.objects.filter(etat=Etat.EN_STOCK, affectation=Affectation.BO_NORD).first()
+        if k_stock:
+            poste = Poste.objects.create(code='BENCH-FREE', nom='Bench', base_operationnelle=Affectation.BO_NORD)
+            cases.append(('service.poser_concentrateur',
+                          lambda: ConcentrateurService.poser_concentrateur(k_stock.n_serie, poste.id, admin)))
+
+        k_pose = Concentrateur.objects.filter(etat=Etat.POSE).first()
+        if k_pose:
+            cases.append(('service.deposer_concentrateur',
+                          lambda: ConcentrateurService.deposer_concentrateur(k_pose.poste_pose_id, k_pose.n_serie, admin)))
+
+        k_test = Concentrateur.objects.filter(etat=Etat.A_TESTER).first()
+        if k_test:
+            cases.append(('service.tester_concentrateur',
+                          lambda: ConcentrateurService.tester_concentrateur(k_test.n_serie, True, admin)))
+
+        n_serie = Concentrateur.objects.values_list('n_serie', flat=True).first()
+        cases += [
+            ('api.dashboard_stats', get('/api/v1/dashboard/stats/')),
+            ('api.concentrateurs_list', get('/api/v1/concentrateurs/')),
+            ('api.concentrateurs_filter', get('/api/v1/concentrateurs/', etat=Etat.EN_STOCK,
+                                              affectation=Affectation.BO_NORD)),
+            ('api.concentrateurs_search', get('/api/v1/concentrateurs/', search=n_serie[-5:])),
+            ('api.cartons_disponibles', get('/api/v1/cartons/disponibles/')),
+            ('api.postes_list', get('/api/v1/postes/')),
+        ]
+
+        # Re-importing the current inventory: the unchanged-rerun path
+        csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False)
+        with csv_file:
+            for chunk in iter_csv(Concentrateur.objects.order_by('n_serie'), CONCENTRATEUR_COLUMNS):
+                csv_file.write(chunk)
+        self.temp_files.append(csv_file.name)
+        out = io.StringIO()
+        call_command('import_csv', csv_file.name, '--diff', '--dry-run', stdout=out)
+        if 'Concentrateurs updated: 0' not in out.getvalue():
+            raise CommandError(f"The exported inventory does not re-import unchanged:\n{out.getvalue()}")
+        for mode in ('--bulk', '--diff'):
+            cases.append((f'import_csv {mode}',
+                          lambda mode=mode: call_command('import_csv', csv_file.name, mode, stdout=io.StringIO())))
+        return cases
+
+    def _compare(self, results: list[dict], path: str, threshold: float):
+        baseline = json.loads(Path(path).read_text(encoding='utf-8'))
+        previous = {(r['case'], r['size']): r for r in baseline['results']}
+
+        self.stdout.write(f"\n=== Compared with {path} ({baseline['environment'].get('revision')}) ===")
+        regressions = 0
+        for result in results:
+            before = previous.get((result['case'], result['size']))
+            if before is None:
+                continue
+            ratio = result['ms'] / before['ms'] if before['ms'] else 1.0
+            # Sub-millisecond differences are noise
+            slower = ratio > threshold and result['ms'] - before['ms'] > 1
+            more_queries = result['queries'] > before['queries']
+            line = (f"{result['case']:<40} {result['size']:>7} {before['ms']:>10.2f} -> {result['ms']:>10.2f} ms "
+                    f"({ratio:.2f}x)  {before['queries']} -> {result['queries']} queries")
+            if slower or more_queries:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) against {path}")
+        self.stdout.write(self.style.SUCCESS("No regression"))
@@ -0,0 +1,87 @@
+"""
+Reusable ViewSet mixins for the read-only API endpoints.
+"""
+import hashlib
+from calendar import timegm
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from apps.tracking.models import DataVersion
+from .serializers import parse_fields_param
+
+
+class SparseFieldsetViewMixin:
+    """
+    Serve ``?fields=`` list requests from ``QuerySet.values()`` when possible.
+    
+    If every requested field is a plain model column, rows are fetched as
+    dicts and returned as-is: no model instantiation, no per-row serializer
+    work. Any other selection falls back to the regular serializer, which
+    still drops the fields that were not requested.
+    """
+    
+    def get_values_columns(self) -> list[str] | None:
+        """Columns for the values() fast path, or None to use the serializer."""
+        if not parse_fields_param(self.request):
+            return None
+        return self.get_serializer().get_values_columns()
+    
+    def list(self, request, *args, **kwargs):
+        columns = self.get_values_columns()
+        if columns is None:
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(list(page))
+        return Response(list(queryset))
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list endpoints.
+    
+    The validators are derived from a cheap change marker (see
+    ``get_change_marker``) so that an unchanged poll is answered with
+    ``304 Not Modified`` without running the page query or the serializer.
+    """
+    
+    def get_change_marker(self, queryset) -> tuple[tuple, datetime | None]:
+        """
+        Return ``(marker, last_modified)`` for the filtered queryset.
+        
+        Default: the global inventory DataVersion, bumped by every
+        transition and every Carton/Poste save.
+        """
+        version = DataVersion.current()
+        return (version.version,), version.updated_at
+    
+    def conditional_get(self, request, queryset, handler):
+        """Run ``handler()`` unless the client's cached copy is still fresh."""
+        marker, last_modified = self.get_change_marker(queryset)
+        key = repr((
+            marker, request.get_full_path(), request.accepted_media_type, request.user.pk
+        ))
+        etag = f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler()
+        
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Accept', 'Cookie'))
+        return response
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_get(
+            request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
@@ -13,11 +13,11 @@ class IsMagasin(BasePermission):
     
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
-            logger.warning("IsMagasin: User not authenticated")
+            logger.debug("IsMagasin: User not authenticated")
             return False
         
         has_permission = request.user.is_magasin or request.user.is_admin_profile
-        logger.info(f"IsMagasin check: user={request.user.username}, profil={request.user.profil}, allowed={has_permission}")
+        logger.debug(f"IsMagasin check: user={request.user.username}, profil={request.user.profil}, allowed={has_permission}")
         return has_permission
 
 
@@ -41,6 +41,16 @@ class IsBOTerrain(BasePermission):
         return request.user.is_bo_terrain or request.user.is_admin_profile
 
 
+class IsBOUser(BasePermission):
+    """Allow users attached to a BO (Commande or Terrain) or admin profile."""
+    message = "Action réservée aux profils BO"
+    
+    def has_permission(self, request, view):
+        if not request.user.is_authenticated:
+            return False
+        return bool(request.user.base_operationnelle) or request.user.is_admin_profile
+
+
 class IsLabo(BasePermission):
     """Allow users with 'labo' or 'admin' profile."""
     message = "Action réservée au profil Labo"
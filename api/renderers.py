@@ -0,0 +1,74 @@
+"""
+Fast DRF renderers: orjson for JSON, MessagePack for the field tablets.
+
+Both fall back on DRF's own JSONEncoder for types they cannot encode
+natively, so the payload is identical to the stock JSONRenderer output.
+"""
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_drf_encoder = JSONEncoder()
+
+# Datetimes go through DRF's encoder to keep its format ('Z' suffix,
+# millisecond precision) instead of orjson's microsecond isoformat.
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for JSONRenderer backed by orjson.
+    
+    Indented output (``Accept: application/json; indent=4`` or the
+    browsable API) is delegated to the stock renderer.
+    """
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        ret = orjson.dumps(data, default=_drf_encoder.default, option=ORJSON_OPTIONS)
+        # Same \u2028/\u2029 escaping as JSONRenderer (strict javascript subset)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render responses as MessagePack (``Accept: application/msgpack``)."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_drf_encoder.default, use_bin_type=True, datetime=False)
+
+
+class StreamRenderer(BaseRenderer):
+    """
+    Content-negotiation target for streamed exports.
+    
+    Export views build their own StreamingHttpResponse; ``render`` is
+    only reached for error payloads, which are sent as JSON.
+    """
+    charset = None
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_drf_encoder.default, option=ORJSON_OPTIONS)
+
+
+class CSVStreamRenderer(StreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONStreamRenderer(StreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
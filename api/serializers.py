@@ -1,14 +1,80 @@
 """
 DRF Serializers for all models.
 """
+import time
+
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 
 from apps.core.models import User, Profil
 from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
 from apps.tracking.models import Historique
+from services.metrics import SerializationTimer
+
+
+def parse_fields_param(request) -> list[str]:
+    """Return the field names requested via ``?fields=a,b,c`` (empty if none)."""
+    if request is None:
+        return []
+    raw = request.query_params.get('fields', '')
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+class TimedSerializerMixin:
+    """Report the time spent building ``.data`` to the request metrics."""
+    
+    @property
+    def data(self):
+        start = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            SerializationTimer.add(time.perf_counter() - start)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """``many=True`` counterpart: the children are not timed on their own."""
+
+
+class SparseFieldsetMixin:
+    """
+    Restrict a ModelSerializer to the fields requested via ``?fields=``.
+    
+    Unknown names are ignored; if none of the requested names exist
+    the serializer keeps its full field set.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = set(parse_fields_param(self.context.get('request')))
+        if requested & set(self.fields):
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+    
+    def get_values_columns(self) -> list[str] | None:
+        """
+        Model columns that can feed ``QuerySet.values()`` directly.
+        
+        Returns None as soon as one field needs a model instance
+        (method source, relation, annotation) or a representation that
+        differs from the raw DB value (timezone-aware datetimes).
+        """
+        opts = self.Meta.model._meta
+        columns = []
+        for name, field in self.fields.items():
+            if field.source != name or isinstance(field, serializers.DateTimeField):
+                return None
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.is_relation:
+                return None
+            columns.append(name)
+        return columns
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for User model."""
     base_operationnelle = serializers.CharField(read_only=True)
     profil_display = serializers.CharField(source='get_profil_display', read_only=True)
@@ -21,23 +87,25 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
 
-class PosteSerializer(serializers.ModelSerializer):
+class PosteSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Poste model."""
     class Meta:
         model = Poste
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'code', 'nom', 'base_operationnelle', 'actif']
 
 
-class CartonSerializer(serializers.ModelSerializer):
+class CartonSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Carton model."""
     nb_concentrateurs = serializers.IntegerField(source='concentrateurs_count', read_only=True)
     
     class Meta:
         model = Carton
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'num_carton', 'operateur', 'nb_concentrateurs', 'created_at']
 
 
-class ConcentrateurListSerializer(serializers.ModelSerializer):
+class ConcentrateurListSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Concentrateur list view (minimal fields)."""
     etat_display = serializers.CharField(source='get_etat_display', read_only=True)
     carton = serializers.CharField(source='carton.num_carton', read_only=True, allow_null=True)
@@ -45,13 +113,14 @@ class ConcentrateurListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Concentrateur
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'n_serie', 'operateur', 'etat', 'etat_display',
             'affectation', 'carton', 'poste_code', 'date_dernier_etat'
         ]
 
 
-class ConcentrateurDetailSerializer(serializers.ModelSerializer):
+class ConcentrateurDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Concentrateur detail view (all fields)."""
     etat_display = serializers.CharField(source='get_etat_display', read_only=True)
     carton = CartonSerializer(read_only=True)
@@ -67,7 +136,7 @@ class ConcentrateurDetailSerializer(serializers.ModelSerializer):
         ]
 
 
-class HistoriqueSerializer(serializers.ModelSerializer):
+class HistoriqueSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Historique (audit trail)."""
     action_display = serializers.CharField(source='get_action_display', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True, allow_null=True)
@@ -75,6 +144,7 @@ class HistoriqueSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Historique
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'action', 'action_display', 'user_name', 'concentrateur',
             'ancien_etat', 'nouvel_etat',
@@ -7,7 +7,8 @@ from .views import (
     CurrentUserView, LoginAPIView, LogoutAPIView, CSRFTokenView,
     ConcentrateurViewSet, CartonViewSet, PosteViewSet,
     ReceptionView, CommandeView, PoseView, DeposeView, TestView,
-    StockStatsView
+    HistoriqueExportView, SyncChangesView, StockStatsView, LifecycleStatsView, FleetAsOfView,
+    StockLevelsView, ReplenishmentView, StockoutSimulationView, MetricsView
 )
 
 router = DefaultRouter()
@@ -31,8 +32,22 @@ urlpatterns = [
     path('actions/pose/', PoseView.as_view(), name='action-pose'),
     path('actions/depose/', DeposeView.as_view(), name='action-depose'),
     path('actions/test/', TestView.as_view(), name='action-test'),
+    path('commande/replenishment/', ReplenishmentView.as_view(), name='commande-replenishment'),
+    
+    # Exports
+    path('historique/export/', HistoriqueExportView.as_view(), name='historique-export'),
+    
+    # Offline sync
+    path('sync/changes/', SyncChangesView.as_view(), name='sync-changes'),
     
     # Dashboard
     path('dashboard/stats/', StockStatsView.as_view(), name='dashboard-stats'),
     path('dashboard/stocks/', StockStatsView.as_view(), name='dashboard-stocks'),
+    path('dashboard/lifecycle/', LifecycleStatsView.as_view(), name='dashboard-lifecycle'),
+    path('dashboard/as-of/', FleetAsOfView.as_view(), name='dashboard-as-of'),
+    path('dashboard/stock-levels/', StockLevelsView.as_view(), name='dashboard-stock-levels'),
+    path('dashboard/stockout-simulation/', StockoutSimulationView.as_view(), name='dashboard-stockout-simulation'),
+    
+    # Monitoring
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -3,13 +3,17 @@ DRF ViewSets and APIViews for all endpoints.
 """
 import logging
 
-from django.db.models import Count, Q, F
+from django.conf import settings
+from django.db.models import Count, Q, F, Max
 from django.db.models.functions import TruncDay
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 from django.utils.timezone import now
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -20,22 +24,52 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 from apps.core.models import User
+from apps.inventory.filters import ConcentrateurFilter
 from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
-from apps.tracking.models import Historique
+from apps.tracking.filters import historique_filtersets
+from apps.tracking.models import Historique, DataVersion
 from services.business_logic import ConcentrateurService, TransitionError, PermissionError
+from services import forecasting, lifecycle, simulation, stock_levels
+from services.alerts import active_alerts
+from services.snapshots import ETAT, AFFECTATION, state_as_of
+from services.stock_levels import SERIES_DIMENSIONS
+from services.sync import changes_since
+from services.export import CONCENTRATEUR_COLUMNS, HISTORIQUE_COLUMNS, iter_export
+from services.metrics import request_metrics
+from services.query_budget import query_budget
 
 from .serializers import (
     UserSerializer, ConcentrateurListSerializer, ConcentrateurDetailSerializer,
     CartonSerializer, PosteSerializer, HistoriqueSerializer,
     ReceptionSerializer, CommandeSerializer, PoseSerializer, DeposeSerializer, TestSerializer
 )
-from .permissions import IsMagasin, IsBOCommande, IsBOTerrain, IsLabo
+from .permissions import IsMagasin, IsBOCommande, IsBOTerrain, IsBOUser, IsLabo, IsAdminProfile
+from .mixins import SparseFieldsetViewMixin, ConditionalGetMixin
+from .renderers import CSVStreamRenderer, NDJSONStreamRenderer
 
 logger = logging.getLogger(__name__)
 
+EXPORT_RENDERERS = [CSVStreamRenderer, NDJSONStreamRenderer]
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _export_response(request, queryset, columns, basename: str) -> StreamingHttpResponse:
+    """Stream ``queryset`` in the negotiated export format (CSV by default)."""
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        iter_export(queryset, columns, renderer.format),
+        content_type=renderer.media_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{basename}_{timezone.now():%Y%m%d}.{renderer.format}"'
+    )
+    return response
+
 
 # === Auth Views ===
 
+@query_budget(12)
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class LoginAPIView(APIView):
     """
@@ -64,6 +98,7 @@ class LoginAPIView(APIView):
             return Response({'error': 'Identifiants invalides'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+@query_budget(4)
 class LogoutAPIView(APIView):
     """Logout endpoint."""
     permission_classes = []
@@ -73,6 +108,7 @@ class LogoutAPIView(APIView):
         return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
 
 
+@query_budget(2)
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class CSRFTokenView(APIView):
     """
@@ -85,6 +121,7 @@ class CSRFTokenView(APIView):
         return Response({'detail': 'CSRF cookie set'})
 
 
+@query_budget(2)
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class CurrentUserView(APIView):
     """Get current authenticated user profile."""
@@ -97,19 +134,21 @@ class CurrentUserView(APIView):
 
 # === Model ViewSets ===
 
-class ConcentrateurViewSet(viewsets.ReadOnlyModelViewSet):
+@query_budget(6)
+class ConcentrateurViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Concentrateur.
     
-    list: GET /api/v1/concentrateurs/
+    list: GET /api/v1/concentrateurs/  (supports ?fields=n_serie,etat,...)
     retrieve: GET /api/v1/concentrateurs/{n_serie}/
     historique: GET /api/v1/concentrateurs/{n_serie}/historique/
+    export: GET /api/v1/concentrateurs/export/  (?format=csv|ndjson, same filters as list)
     """
     permission_classes = [IsAuthenticated]
     # pagination_class = None  # Re-enabled pagination via settings.py default
     lookup_field = 'n_serie'
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['etat', 'affectation', 'operateur', 'poste_pose']
+    filterset_class = ConcentrateurFilter
     search_fields = ['n_serie', 'carton__num_carton']
     ordering_fields = ['n_serie', 'date_dernier_etat', 'created_at']
     ordering = ['-updated_at']
@@ -122,16 +161,32 @@ class ConcentrateurViewSet(viewsets.ReadOnlyModelViewSet):
             return ConcentrateurDetailSerializer
         return ConcentrateurListSerializer
     
+    def get_change_marker(self, queryset):
+        """max(updated_at) + count of the filtered rows, plus the global version."""
+        version = DataVersion.current()
+        stats = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('id'))
+        last_modified = max(filter(None, [version.updated_at, stats['last']]), default=None)
+        return (version.version, stats['last'], stats['count']), last_modified
+    
     @action(detail=True, methods=['get'])
+    @query_budget(4)
     def historique(self, request, n_serie=None):
         """Get history for a specific concentrator."""
         concentrateur = self.get_object()
-        historique = concentrateur.historique.select_related('user').all()[:50]
+        historique = Historique.timeline(concentrateur, limit=50)
         serializer = HistoriqueSerializer(historique, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    @query_budget(3)
+    def export(self, request):
+        """Stream the filtered inventory as CSV (BDD_defi_EDF.csv layout) or NDJSON."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return _export_response(request, queryset, CONCENTRATEUR_COLUMNS, 'concentrateurs')
 
 
-class CartonViewSet(viewsets.ReadOnlyModelViewSet):
+@query_budget(6)
+class CartonViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for Carton."""
     permission_classes = [IsAuthenticated]
     serializer_class = CartonSerializer
@@ -144,9 +199,20 @@ class CartonViewSet(viewsets.ReadOnlyModelViewSet):
             concentrateurs_count=Count('concentrateurs')
         ).order_by('-created_at')
     
+    def get_change_marker(self, queryset):
+        """Global version plus the latest concentrateur change (counts depend on them)."""
+        version = DataVersion.current()
+        last = Concentrateur.objects.aggregate(last=Max('updated_at'))['last']
+        last_modified = max(filter(None, [version.updated_at, last]), default=None)
+        return (version.version, last), last_modified
+    
     @action(detail=False, methods=['get'])
+    @query_budget(5)
     def disponibles(self, request):
         """Get cartons available for ordering (in Magasin, en_stock)."""
+        return self.conditional_get(request, None, lambda: self._disponibles(request))
+    
+    def _disponibles(self, request):
         operateur = request.query_params.get('operateur')
         
         queryset = Carton.objects.filter(
@@ -165,8 +231,12 @@ class CartonViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @query_budget(5)
     def en_livraison(self, request):
         """Get cartons with concentrateurs currently in delivery (en_livraison state)."""
+        return self.conditional_get(request, None, lambda: self._en_livraison(request))
+    
+    def _en_livraison(self, request):
         queryset = Carton.objects.filter(
             concentrateurs__etat=Etat.EN_LIVRAISON
         ).distinct().annotate(
@@ -177,7 +247,8 @@ class CartonViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class PosteViewSet(viewsets.ReadOnlyModelViewSet):
+@query_budget(5)
+class PosteViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for Poste."""
     permission_classes = [IsAuthenticated]
     serializer_class = PosteSerializer
@@ -196,8 +267,26 @@ class PosteViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.order_by('code')
 
 
+@query_budget(3)
+class HistoriqueExportView(APIView):
+    """
+    Stream the audit trail (archives included) as CSV or NDJSON.
+    
+    GET /api/v1/historique/export/?format=ndjson&action=pose&since=2025-01-01T00:00:00
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = EXPORT_RENDERERS
+    
+    def get(self, request):
+        filtersets = historique_filtersets(request.query_params)
+        if not filtersets[0].is_valid():
+            raise ValidationError(filtersets[0].errors)
+        return _export_response(request, [fs.qs for fs in filtersets], HISTORIQUE_COLUMNS, 'historique')
+
+
 # === Action Views ===
 
+@query_budget(13)
 class ReceptionView(APIView):
     """Magasin: receive a carton."""
     permission_classes = [IsMagasin]
@@ -216,6 +305,7 @@ class ReceptionView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(16)
 class CommandeView(APIView):
     """BO Commande: order cartons."""
     permission_classes = [IsBOCommande]
@@ -235,6 +325,7 @@ class CommandeView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(17)
 class PoseView(APIView):
     """BO Terrain: pose a concentrator on a poste."""
     permission_classes = [IsBOTerrain]
@@ -254,6 +345,7 @@ class PoseView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(17)
 class DeposeView(APIView):
     """BO Terrain: depose a concentrator from a poste."""
     permission_classes = [IsBOTerrain]
@@ -273,6 +365,7 @@ class DeposeView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(31)
 class TestView(APIView):
     """Labo: test a concentrator."""
     permission_classes = [IsLabo]
@@ -292,8 +385,37 @@ class TestView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+# === Offline Sync ===
+
+@query_budget(6)
+class SyncChangesView(APIView):
+    """
+    BO tablets: concentrateurs, cartons and postes of the user's BO
+    changed since a cursor, with tombstones for rows that left the BO.
+    
+    GET /api/v1/sync/changes/             -> full dataset + cursor
+    GET /api/v1/sync/changes/?since=1234  -> delta since cursor 1234
+    Admins pick the BO with ?bo=BO Nord.
+    """
+    permission_classes = [IsBOUser]
+    
+    def get(self, request):
+        bo = request.user.base_operationnelle or request.query_params.get('bo')
+        if bo not in (Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD):
+            return Response({'error': 'BO inconnue'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        since = request.query_params.get('since')
+        try:
+            cursor = int(since) if since not in (None, '') else None
+        except ValueError:
+            return Response({'error': 'Curseur invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(changes_since(bo, cursor))
+
+
 # === Dashboard Views ===
 
+@query_budget(11)
 class StockStatsView(APIView):
     """Get stock statistics for dashboard."""
     permission_classes = [IsAuthenticated]
@@ -365,19 +487,8 @@ class StockStatsView(APIView):
             map_data[loc]['details'][etat] = item['count']
             map_data[loc]['total'] += item['count']
 
-        # 3. Alerts (Low Stock in BOs)
-        alerts = []
-        THRESHOLD = 5
-        bo_names = [Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD]
-        for bo in bo_names:
-            count = by_affectation.get(bo, 0)
-            if count < THRESHOLD:
-                alerts.append({
-                    'type': 'warning',
-                    'title': 'Stock Critique',
-                    'message': f"Stock faible sur {bo} ({count} unités)",
-                    'location': bo
-                })
+        # 3. Alerts: open alerts of the AlertRule table, kept by the transitions
+        alerts = active_alerts()
 
         # 4. KPI: Cycle Time & Velocity
         # Velocity: Items going out of stock (Pose or Commande BO) in last 30 days
@@ -392,29 +503,9 @@ class StockStatsView(APIView):
         en_stock_count = by_etat.get(Etat.EN_STOCK, 0)
         days_remaining = int(en_stock_count / velocity) if velocity > 0 else 999
 
-        # 5. KPI: Avg Cycle Time (Reception -> Pose)
-        # We look for finshed cycles in the last 60 days to be relevant
+        # 5. KPI: Avg Cycle Time (Reception -> Pose), from the lifecycle stages
         sixty_days_ago = now() - timedelta(days=60)
-        recent_poses = Historique.objects.filter(action='pose', timestamp__gte=sixty_days_ago).select_related('concentrateur').only('concentrateur_id', 'timestamp')
-        
-        total_days = 0
-        count_cycles = 0
-        
-        for pose in recent_poses:
-            # Find the LAST reception before this pose
-            reception = Historique.objects.filter(
-                concentrateur_id=pose.concentrateur_id,
-                action='reception',
-                timestamp__lt=pose.timestamp
-            ).order_by('-timestamp').first()
-            
-            if reception:
-                delta = (pose.timestamp - reception.timestamp).days
-                if delta >= 0:
-                    total_days += delta
-                    count_cycles += 1
-        
-        avg_cycle_time = round(total_days / count_cycles, 1) if count_cycles > 0 else 0
+        avg_cycle_time = lifecycle.cycle_time(sixty_days_ago)['mean_days'] or 0
 
         return Response({
             'total': total,
@@ -431,3 +522,212 @@ class StockStatsView(APIView):
                 'avg_cycle_time': avg_cycle_time
             }
         })
+
+
+@query_budget(8)
+class LifecycleStatsView(APIView):
+    """
+    Time spent per lifecycle stage, per user and réception-to-pose cycle
+    time, over the last ``days`` (default 90), from LifecycleStage.
+    
+    GET /api/v1/dashboard/lifecycle/?days=30
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', 90))
+        except ValueError:
+            days = 0
+        if days < 1:
+            return Response({'error': 'Paramètre days invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        since = timezone.now() - timedelta(days=days)
+        return Response({
+            'days': days,
+            'cycle_time': lifecycle.cycle_time(since),
+            'stages': lifecycle.stage_stats(since),
+            'operators': lifecycle.operator_stats(since),
+        })
+
+
+@query_budget(6)
+class FleetAsOfView(APIView):
+    """
+    Fleet state at a past instant, from the nearest daily snapshot plus
+    the Historique rows logged since (see services/snapshots.py).
+    
+    GET /api/v1/dashboard/as-of/?at=2025-06-30            -> end of that day
+    GET /api/v1/dashboard/as-of/?at=2025-06-30T12:00:00   -> counts at noon
+    Optional ?affectation= and ?etat= filters; ?detail=1 adds the rows.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        at = self._parse_at(request.query_params.get('at', ''))
+        if at is None:
+            return Response({'error': 'Paramètre at invalide (AAAA-MM-JJ ou date ISO 8601)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        state = state_as_of(at)
+        rows = state['rows'].values()
+        affectation = request.query_params.get('affectation')
+        etat = request.query_params.get('etat')
+        if affectation is not None:
+            rows = [row for row in rows if row[AFFECTATION] == affectation]
+        if etat is not None:
+            rows = [row for row in rows if row[ETAT] == etat]
+        
+        by_etat, by_affectation = {}, {}
+        for row in rows:
+            by_etat[row[ETAT]] = by_etat.get(row[ETAT], 0) + 1
+            if row[AFFECTATION]:
+                by_affectation[row[AFFECTATION]] = by_affectation.get(row[AFFECTATION], 0) + 1
+        
+        snapshot = state['snapshot']
+        data = {
+            'at': at,
+            'snapshot': snapshot.taken_at if snapshot else None,
+            'replayed': state['replayed'],
+            'total': len(rows),
+            'by_etat': by_etat,
+            'by_affectation': by_affectation,
+        }
+        if request.query_params.get('detail') == '1':
+            data['concentrateurs'] = [
+                dict(zip(('n_serie', 'etat', 'affectation', 'poste', 'carton'), row))
+                for row in sorted(rows)
+            ]
+        return Response(data)
+    
+    @staticmethod
+    def _parse_at(value: str) -> datetime | None:
+        try:
+            day = parse_date(value)
+            if day is not None:
+                # A bare date means the end of that day
+                at = datetime.combine(day + timedelta(days=1), time.min) - timedelta(microseconds=1)
+            else:
+                at = parse_datetime(value)
+        except ValueError:
+            return None
+        if at is None:
+            return None
+        return timezone.make_aware(at) if timezone.is_naive(at) else at
+
+
+@query_budget(3)
+class StockLevelsView(APIView):
+    """
+    End-of-day stock levels between two dates, from the StockLevel
+    rollup (manage.py rollup_stock_levels): one indexed read.
+    
+    GET /api/v1/dashboard/stock-levels/?start=2025-01-01&end=2025-12-31
+    Defaults to the last 30 days. Optional ?affectation=, ?etat= and
+    ?operateur= filters; ?by=affectation,etat chooses the series
+    (default: all three dimensions).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            end = parse_date(request.query_params.get('end', '')) if 'end' in request.query_params \
+                else timezone.localdate() - timedelta(days=1)
+            start = parse_date(request.query_params.get('start', '')) if 'start' in request.query_params \
+                else (end - timedelta(days=29) if end else None)
+        except ValueError:  # Well formed but impossible, e.g. 2025-02-30
+            start = end = None
+        if start is None or end is None or start > end or (end - start).days > 3660:
+            return Response({'error': 'Paramètres start/end invalides (AAAA-MM-JJ, 10 ans au plus)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        by = tuple(request.query_params.get('by', ','.join(SERIES_DIMENSIONS)).split(','))
+        if not set(by) <= set(SERIES_DIMENSIONS):
+            return Response({'error': f"Paramètre by invalide ({', '.join(SERIES_DIMENSIONS)})"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        filters = {
+            dimension: request.query_params[dimension]
+            for dimension in SERIES_DIMENSIONS if dimension in request.query_params
+        }
+        return Response({
+            'start': start,
+            'end': end,
+            'by': by,
+            'series': stock_levels.series(start, end, by, **filters),
+        })
+
+
+@query_budget(4)
+class ReplenishmentView(APIView):
+    """
+    Carton order recommendation per BO and opérateur, from the forecast
+    poses (services/forecasting.py, cached until the next rollup) and the
+    current BO stock.
+    
+    GET /api/v1/commande/replenishment/
+    BO Commande users get their own BO; admins all BOs or ?bo=.
+    """
+    permission_classes = [IsBOCommande]
+    
+    def get(self, request):
+        bo = request.user.base_operationnelle or request.query_params.get('bo')
+        return Response({
+            'lead_days': settings.REPLENISHMENT_LEAD_DAYS,
+            'cover_days': settings.REPLENISHMENT_COVER_DAYS,
+            'recommendations': forecasting.replenishment(timezone.localdate(), bo),
+        })
+
+
+@query_budget(4)
+class StockoutSimulationView(APIView):
+    """
+    Probability that each BO runs out of stock within ``weeks``, from
+    Monte Carlo trajectories of the stock flow (services/simulation.py),
+    cached by parameters until the next inventory change.
+    
+    GET /api/v1/dashboard/stockout-simulation/?weeks=8&trajectories=10000
+    Optional ?window= (days of history for the rates, default 90),
+    ?orders=0 (no new commandes), ?ok_ratio= (Labo OK share what-if)
+    and ?seed=.
+    """
+    permission_classes = [IsAdminProfile]
+    
+    # name: (type, default, minimum, maximum)
+    PARAMS = {
+        'weeks': (int, 8, 1, 52),
+        'trajectories': (int, 10000, 100, 100000),
+        'window': (int, 90, 7, 365),
+        'orders': (int, 1, 0, 1),
+        'ok_ratio': (float, None, 0, 1),
+        'seed': (int, 0, 0, 2 ** 32 - 1),
+    }
+    
+    def get(self, request):
+        params = {}
+        for name, (kind, default, low, high) in self.PARAMS.items():
+            try:
+                value = kind(request.query_params[name]) if name in request.query_params else default
+            except ValueError:
+                value = low - 1
+            if value is not None and not low <= value <= high:
+                return Response({'error': f'Paramètre {name} invalide ({low} à {high})'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            params[name] = value
+        params['orders'] = bool(params['orders'])
+        return Response(simulation.stockout_risk(**params))
+
+
+# === Monitoring ===
+
+@query_budget(2)
+class MetricsView(APIView):
+    """
+    Request metrics per view in the Prometheus text format.
+    
+    GET /api/v1/metrics/  (admin profile)
+    """
+    permission_classes = [IsAdminProfile]
+    
+    def get(self, request):
+        return HttpResponse(request_metrics.expose(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -5,3 +5,8 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     verbose_name = 'Core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from services.slow_queries import install
+        connection_created.connect(install, dispatch_uid='slow_query_logger')
@@ -0,0 +1,131 @@
+"""
+Management command summarizing the slow-query log by fingerprint.
+
+Reads ``SLOW_QUERY_LOG`` (JSON lines written by services/slow_queries.py)
+and prints one block per distinct statement: occurrences, total / mean /
+max time, call sites, a sample with its parameters and the EXPLAIN plan.
+
+Usage:
+    python manage.py slow_query_report
+    python manage.py slow_query_report --sort max --limit 10 --since 2025-06-01
+    python manage.py slow_query_report --log /var/log/edf/slow_queries.jsonl --clear
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'max': lambda group: group['max_ms'],
+    'count': lambda group: group['count'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Summarize captured slow queries, grouped by fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            type=str,
+            help='Slow-query log to read (default: SLOW_QUERY_LOG)'
+        )
+        parser.add_argument(
+            '--sort',
+            choices=sorted(SORT_KEYS),
+            default='total',
+            help='Order of the statements (default: total)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of statements shown (default: 20)'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only entries logged on or after this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Empty the log after the report'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['log'] or settings.SLOW_QUERY_LOG)
+        if not path.exists():
+            self.stdout.write(f"No slow query logged ({path} does not exist)")
+            return
+
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date().isoformat()
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+
+        groups = self._group(path, since)
+        ordered = sorted(groups.values(), key=SORT_KEYS[options['sort']], reverse=True)
+        total = sum(group['count'] for group in ordered)
+        self.stdout.write(f"{total} slow queries, {len(ordered)} distinct statements ({path})")
+
+        for rank, group in enumerate(ordered[:options['limit']], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n#{rank} {group['fingerprint']}  x{group['count']}  "
+                f"total {group['total_ms']:.1f} ms  mean {group['total_ms'] / group['count']:.1f} ms  "
+                f"max {group['max_ms']:.1f} ms  last {group['last']}"
+            ))
+            for site, count in group['call_sites'].most_common(3):
+                self.stdout.write(f"  at {site or '?'} (x{count})")
+            self.stdout.write(f"  {group['sql']}")
+            self.stdout.write(f"  params: {group['params']}")
+            if group['plan']:
+                self.stdout.write('  plan:')
+                for line in group['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if options['clear']:
+            path.write_text('', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"\n{path} cleared"))
+
+    def _group(self, path: Path, since: str | None) -> dict:
+        groups = {}
+        with path.open(encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial line from a crashed writer
+                    continue
+                if since and entry['time'][:10] < since:
+                    continue
+                group = groups.get(entry['fingerprint'])
+                if group is None:
+                    group = groups[entry['fingerprint']] = {
+                        'fingerprint': entry['fingerprint'],
+                        'count': 0,
+                        'total_ms': 0.0,
+                        'max_ms': 0.0,
+                        'sql': entry['sql'],
+                        'params': entry.get('params'),
+                        'plan': None,
+                        'last': None,
+                        'call_sites': Counter(),
+                    }
+                group['count'] += 1
+                group['total_ms'] += entry['ms']
+                if entry['ms'] >= group['max_ms']:
+                    # Keep the slowest occurrence as the sample
+                    group['max_ms'] = entry['ms']
+                    group['sql'] = entry['sql']
+                    group['params'] = entry.get('params')
+                group['plan'] = entry.get('plan') or group['plan']
+                group['last'] = max(group['last'] or '', entry['time'])
+                group['call_sites'][entry.get('call_site')] += 1
+        return groups
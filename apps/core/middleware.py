@@ -0,0 +1,164 @@
+"""
+Request instrumentation.
+
+RequestMetricsMiddleware: for every request, wall time, SQL time and
+query count, serialization and rendering time and response size, keyed by the resolved
+view name. Each request is logged as one JSON line (logger
+``apps.core.middleware``) and added to the histograms served at
+``/api/v1/metrics/``.
+
+ProfilingMiddleware: opt-in profiles of slow or sampled requests.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+
+import orjson
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from services.metrics import SerializationTimer, request_metrics
+from services.profiling import ProfileStore, SQLRecorder, StackSampler
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` hook summing query count and time."""
+    
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """Time each request and record it per view (see module docstring)."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        timer = QueryTimer()
+        request._render_seconds = 0.0
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer), SerializationTimer() as serialization:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        size = None if response.streaming else len(response.content)
+        request_metrics.observe(
+            view, request.method, response.status_code, duration,
+            timer.seconds, timer.queries, serialization.seconds, request._render_seconds, size
+        )
+        user = getattr(request, 'user', None)
+        logger.info(orjson.dumps({
+            'event': 'request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user': user.pk if user is not None and user.is_authenticated else None,
+            'duration_ms': round(duration * 1000, 2),
+            'db_ms': round(timer.seconds * 1000, 2),
+            'queries': timer.queries,
+            'serialization_ms': round(serialization.seconds * 1000, 2),
+            'render_ms': round(request._render_seconds * 1000, 2),
+            'size': size,
+        }).decode())
+        return response
+    
+    def process_template_response(self, request, response):
+        """DRF responses render after the view returns: time that step."""
+        start = time.perf_counter()
+        
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - start
+        
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiling (``PROFILE_REQUESTS``), see services/profiling.py.
+    
+    Drawn requests (``PROFILE_SAMPLE_RATE``) and those forced by a staff
+    user with ``X-Profile: 1`` run under cProfile; the others are stack
+    sampled and kept only when slower than ``PROFILE_THRESHOLD_MS``. The
+    saved profile id is returned in the ``X-Profile-Id`` header.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        forced = request.headers.get('X-Profile') == '1' and request.user.is_staff
+        if not (forced or settings.PROFILE_REQUESTS):
+            return self.get_response(request)
+        
+        sampled = forced or random.random() < settings.PROFILE_SAMPLE_RATE
+        recorder = SQLRecorder()
+        profiler = cProfile.Profile() if sampled else StackSampler(threading.get_ident())
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            if sampled:
+                profiler.enable()
+            else:
+                profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                if sampled:
+                    profiler.disable()
+                else:
+                    profiler.stop()
+        duration_ms = (time.perf_counter() - start) * 1000
+        
+        if forced:
+            trigger = 'forced'
+        elif sampled:
+            trigger = 'sampled'
+        elif duration_ms >= settings.PROFILE_THRESHOLD_MS:
+            trigger = 'slow'
+        else:
+            return response
+        
+        if sampled:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(80)
+            kind, report = 'cprofile', stream.getvalue()
+        else:
+            kind, report = 'stacks', profiler.report()
+        
+        match = request.resolver_match
+        response['X-Profile-Id'] = ProfileStore.from_settings().save({
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'trigger': trigger,
+            'kind': kind,
+            'view': match.view_name if match else '<unresolved>',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user': request.user.get_username() if request.user.is_authenticated else None,
+            'duration_ms': round(duration_ms, 2),
+            'db_ms': round(sum(statement['ms'] for statement in recorder.statements), 2),
+            'queries': recorder.total,
+            'profile': report,
+            'sql': recorder.statements,
+        })
+        return response
@@ -0,0 +1,40 @@
+"""
+Admin pages browsing the request profiles (services/profiling.py).
+
+Mounted under /admin/profiles/ with ``admin.site.admin_view`` (staff only).
+"""
+from django.contrib import admin
+from django.http import Http404
+from django.views.generic import TemplateView
+
+from services.profiling import ProfileStore
+
+
+class ProfileListView(TemplateView):
+    """Saved profiles, newest first."""
+    template_name = 'admin/profiles/list.html'
+    
+    def get_context_data(self, **kwargs):
+        return {
+            **admin.site.each_context(self.request),
+            **super().get_context_data(**kwargs),
+            'title': 'Profils de requêtes',
+            'profiles': ProfileStore.from_settings().entries(),
+        }
+
+
+class ProfileDetailView(TemplateView):
+    """One profile: request metadata, profile report and SQL."""
+    template_name = 'admin/profiles/detail.html'
+    
+    def get_context_data(self, **kwargs):
+        profile = ProfileStore.from_settings().get(kwargs['profile_id'])
+        if profile is None:
+            raise Http404("Profil introuvable (supprimé du tampon ?)")
+        return {
+            **admin.site.each_context(self.request),
+            **super().get_context_data(**kwargs),
+            'title': f"{profile['method']} {profile['path']}",
+            'profile': profile,
+            'slowest_sql': sorted(profile['sql'], key=lambda statement: statement['ms'], reverse=True)[:20],
+        }
@@ -3,6 +3,7 @@ from django.views.generic import TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from apps.inventory.models import Concentrateur
+from apps.tracking.models import Historique
 
 
 class HomeRedirectView(LoginRequiredMixin, View):
@@ -62,5 +63,5 @@ class ConcentrateurDetailView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         n_serie = self.kwargs['n_serie']
         context['concentrateur'] = get_object_or_404(Concentrateur, n_serie=n_serie)
-        context['historique'] = context['concentrateur'].historique.select_related('user').all()[:20]
+        context['historique'] = Historique.timeline(context['concentrateur'], limit=20)
         return context
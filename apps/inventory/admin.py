@@ -2,7 +2,8 @@ from django.contrib import admin
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
-from .models import Carton, Concentrateur, Poste
+from apps.tracking.models import ChangeLog, DataVersion
+from .models import Carton, Concentrateur, Poste, ImportCheckpoint
 
 
 class ConcentrateurResource(resources.ModelResource):
@@ -64,3 +65,20 @@ class ConcentrateurAdmin(ImportExportModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Manual edits bypass ConcentrateurService: keep offline clients in sync
+        ChangeLog.record(ChangeLog.entries_for_concentrateur(
+            obj, form.initial.get('affectation', ''), obj.affectation,
+            carton_ids=(form.initial.get('carton'),)
+        ))
+        DataVersion.bump()
+
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'rows_done', 'completed', 'started_at', 'updated_at')
+    list_filter = ('completed',)
+    search_fields = ('file_name', 'file_hash')
+    readonly_fields = ('file_hash', 'file_name', 'rows_done', 'completed', 'started_at', 'updated_at')
@@ -0,0 +1,14 @@
+"""
+FilterSets shared by the API list endpoints and the export command.
+"""
+import django_filters
+
+from .models import Concentrateur
+
+
+class ConcentrateurFilter(django_filters.FilterSet):
+    """Same filters as ConcentrateurViewSet's former ``filterset_fields``."""
+    
+    class Meta:
+        model = Concentrateur
+        fields = ['etat', 'affectation', 'operateur', 'poste_pose']
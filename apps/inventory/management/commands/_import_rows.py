@@ -0,0 +1,132 @@
+"""
+Row normalization for import_csv, kept free of database access.
+
+Module-level functions so that ``import_csv --workers`` can run them in
+a process pool; the command's own helpers delegate here.
+"""
+import hashlib
+from datetime import datetime
+
+from apps.inventory.models import Etat, Affectation
+
+ETAT_MAPPING = {
+    'en_livraison': Etat.EN_LIVRAISON,
+    'en livraison': Etat.EN_LIVRAISON,
+    'livraison': Etat.EN_LIVRAISON,
+    'en_stock': Etat.EN_STOCK,
+    'en stock': Etat.EN_STOCK,
+    'stock': Etat.EN_STOCK,
+    'pose': Etat.POSE,
+    'posé': Etat.POSE,
+    'a_tester': Etat.A_TESTER,
+    'à tester': Etat.A_TESTER,
+    'a tester': Etat.A_TESTER,
+    'tester': Etat.A_TESTER,
+    'en_attente_recond': Etat.EN_ATTENTE_RECONDITIONNEMENT,
+    'en attente reconditionnement': Etat.EN_ATTENTE_RECONDITIONNEMENT,
+    'hs': Etat.HS,
+    'hors service': Etat.HS,
+}
+
+AFFECTATION_MAPPING = {
+    'magasin': Affectation.MAGASIN,
+    'bo nord': Affectation.BO_NORD,
+    'bo_nord': Affectation.BO_NORD,
+    'nord': Affectation.BO_NORD,
+    'bo centre': Affectation.BO_CENTRE,
+    'bo_centre': Affectation.BO_CENTRE,
+    'centre': Affectation.BO_CENTRE,
+    'bo sud': Affectation.BO_SUD,
+    'bo_sud': Affectation.BO_SUD,
+    'sud': Affectation.BO_SUD,
+    'labo': Affectation.LABO,
+    'laboratoire': Affectation.LABO,
+}
+
+
+def parse_date(value: str):
+    """Parse date in DD/MM/YYYY format."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def bo_from_affectation(value: str) -> str | None:
+    """Get BO name from affectation for poste creation."""
+    value_lower = value.lower().strip() if value else ''
+    if 'nord' in value_lower:
+        return 'BO Nord'
+    elif 'centre' in value_lower:
+        return 'BO Centre'
+    elif 'sud' in value_lower:
+        return 'BO Sud'
+    return None
+
+
+def map_etat(value: str) -> str:
+    """Map CSV état value to model enum."""
+    return ETAT_MAPPING.get(value.lower().strip() if value else '', Etat.EN_LIVRAISON)
+
+
+def map_affectation(value: str) -> str:
+    """Map CSV affectation value to model enum; an empty one (HS K) stays empty."""
+    value = value.lower().strip() if value else ''
+    return AFFECTATION_MAPPING.get(value, Affectation.MAGASIN) if value else ''
+
+
+def fingerprint(num_carton, operateur, affectation, etat, poste_code, date_affectation, date_pose) -> bytes:
+    """
+    Digest of the imported columns of a concentrateur.
+    
+    Computed the same way for an incoming row and for the DB state
+    (``values_list`` with ``carton__num_carton`` / ``poste_pose__code``),
+    so equal digests mean the import would not change the row.
+    """
+    values = (num_carton, operateur, affectation, etat, poste_code, date_affectation, date_pose)
+    payload = '\x1f'.join('' if value is None else str(value) for value in values)
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+
+def normalize_row(row: dict) -> dict:
+    """Extract and map one CSV row to model values (raises ValueError)."""
+    n_serie = row.get('n_serie_concentrateur', '').strip()
+    if not n_serie:
+        raise ValueError("N° série manquant")
+    
+    affectation = row.get('affectation', '').strip()
+    record = {
+        'n_serie': n_serie,
+        'num_carton': row.get('num_carton', '').strip(),
+        'operateur': row.get('operateur', '').strip() or 'Inconnu',
+        'affectation': map_affectation(affectation),
+        'etat': map_etat(row.get('etat', '').strip()),
+        'poste_code': row.get('poste_pose', '').strip(),
+        'bo': bo_from_affectation(affectation),
+        'date_affectation': parse_date(row.get('date_affectation', '').strip()),
+        'date_pose': parse_date(row.get('date_pose', '').strip()),
+    }
+    # Postes are only linked when their BO is known (see _apply_bulk)
+    record['fingerprint'] = fingerprint(
+        record['num_carton'], record['operateur'], record['affectation'], record['etat'],
+        record['poste_code'] if record['bo'] else '', record['date_affectation'], record['date_pose'],
+    )
+    return record
+
+
+def normalize_chunk(fieldnames: list[str], rows: list[list[str]], first_row: int) -> tuple[list, list]:
+    """
+    Normalize a chunk of raw ``csv.reader`` rows (process pool task).
+    
+    Returns:
+        ``(records, errors)`` where errors are ``(row_num, message, raw_row)``
+    """
+    records, errors = [], []
+    for row_num, values in enumerate(rows, start=first_row):
+        try:
+            records.append(normalize_row(dict(zip(fieldnames, values))))
+        except Exception as e:
+            errors.append((row_num, str(e), values))
+    return records, errors
@@ -3,6 +3,7 @@ Management command to create sample data for testing.
 """
 from django.core.management.base import BaseCommand
 from apps.inventory.models import Carton, Concentrateur, Poste, Etat, Affectation, Operateur
+from services import lifecycle
 
 
 class Command(BaseCommand):
@@ -71,6 +72,7 @@ class Command(BaseCommand):
                     }
                 )
                 if created:
+                    lifecycle.open_initial([k])
                     self.stdout.write(f"  Created K: {n_serie}")
         
         # Create some concentrateurs in different states for testing
@@ -90,6 +92,7 @@ class Command(BaseCommand):
                 }
             )
             if created:
+                lifecycle.open_initial([k])
                 self.stdout.write(f"Created special K: {n_serie} ({etat})")
         
         self.stdout.write(self.style.SUCCESS("\nSample data created!"))
@@ -0,0 +1,85 @@
+"""
+Management command to stream concentrateurs or historique to CSV / NDJSON.
+
+Usage:
+    python manage.py export_inventory concentrateurs -o export.csv
+    python manage.py export_inventory concentrateurs --filter etat=en_stock --filter "affectation=BO Nord"
+    python manage.py export_inventory historique --format ndjson --filter since=2025-01-01T00:00:00
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.filters import ConcentrateurFilter
+from apps.inventory.models import Concentrateur
+from apps.tracking.filters import HistoriqueFilter
+from apps.tracking.models import Historique, HistoriqueArchive
+from services.export import CONCENTRATEUR_COLUMNS, HISTORIQUE_COLUMNS, FORMATS, CHUNK_SIZE, iter_export
+
+DATASETS = {
+    'concentrateurs': (ConcentrateurFilter, Concentrateur.objects.order_by('n_serie'), CONCENTRATEUR_COLUMNS),
+    # Archived rows first: they all predate the hot table
+    'historique': (HistoriqueFilter, [HistoriqueArchive.objects.order_by('timestamp', 'id'),
+                                      Historique.objects.order_by('timestamp', 'id')], HISTORIQUE_COLUMNS),
+}
+
+
+class Command(BaseCommand):
+    help = 'Stream concentrateurs or historique to CSV (BDD_defi_EDF.csv layout) or NDJSON'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dataset',
+            choices=sorted(DATASETS),
+            help='What to export'
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='csv',
+            help='Output format (default: csv)'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            type=str,
+            default='-',
+            help='Output file (default: stdout)'
+        )
+        parser.add_argument(
+            '--filter',
+            action='append',
+            default=[],
+            metavar='FIELD=VALUE',
+            help='Same filters as the API list endpoint, repeatable (e.g. etat=en_stock)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows fetched and written per chunk (default: {CHUNK_SIZE})'
+        )
+    
+    def handle(self, *args, **options):
+        filter_class, queryset, columns = DATASETS[options['dataset']]
+        
+        data = {}
+        for item in options['filter']:
+            field, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid filter '{item}', expected FIELD=VALUE")
+            data[field] = value
+        
+        filtersets = [filter_class(data, queryset=qs) for qs in (queryset if isinstance(queryset, list) else [queryset])]
+        if not filtersets[0].is_valid():
+            raise CommandError(f"Invalid filters: {dict(filtersets[0].errors)}")
+        
+        fmt = options['format']
+        chunks = iter_export([fs.qs for fs in filtersets], columns, fmt, options['chunk_size'])
+        
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk if isinstance(chunk, str) else chunk.decode('utf-8'), ending='')
+            return
+        
+        with open(options['output'], 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
@@ -0,0 +1,369 @@
+"""
+Management command to generate a large, realistic dataset for load testing.
+
+Cartons are delivered over the last ``--days`` days and their K walk
+through the real lifecycle (réception, commande BO, pose, dépose, test,
+reconditionnement) with one Historique row per transition, timestamped
+when it happened. Rows are written with raw bulk inserts
+(see services.bulk), so a 1M-K dataset builds in minutes; the lifecycle
+stages are then rebuilt from that Historique.
+
+Postes are drawn at random within the BO: give roughly as many postes as
+K expected to be posé to keep one K per poste.
+
+Usage:
+    python manage.py generate_dataset --cartons 1000 --postes 300
+    python manage.py generate_dataset --cartons 250000 --postes 3000 --days 1095 --seed 42
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation, Operateur
+from apps.tracking.models import ActionType, DataVersion, Historique
+from services import lifecycle
+from services.bulk import insert_rows
+from .populate_gps import ZONE_CENTERS, JITTER
+
+K_PER_CARTON = 4
+OPERATEURS = [op.value for op in Operateur]
+OPERATEUR_WEIGHTS = [0.4, 0.35, 0.25]
+OPERATEUR_LETTERS = {'Bouygues': 'B', 'Orange': 'O', 'SFR': 'S'}
+BOS = [Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD]
+
+# Value tables: the simulation stores indexes into these lists
+ETATS = [''] + [etat.value for etat in Etat]
+AFFECTATIONS = [''] + [affectation.value for affectation in Affectation]
+ACTIONS = [action.value for action in ActionType]
+
+# Lifecycle: (mean delay in days, probability that the step happens)
+COMMANDE = (10, 0.85)
+POSE = (20, 0.8)
+DEPOSE = (240, 0.3)
+TEST = (7, 0.95)
+TEST_OK_RATE = 0.7
+
+
+def _code(values: list, value) -> int:
+    return values.index(value)
+
+
+class Command(BaseCommand):
+    help = 'Generate cartons, postes and K lifecycles with matching historique for load testing'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cartons',
+            type=int,
+            default=1000,
+            help=f'Cartons delivered over the period ({K_PER_CARTON} K each, default: 1000)'
+        )
+        parser.add_argument(
+            '--postes',
+            type=int,
+            default=300,
+            help='Postes, spread over the three BO (default: 300)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Length of the simulated period, ending now (default: 365)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for a reproducible dataset'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows per insert batch (default: 10000)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['cartons'] < 1 or options['postes'] < 3 or options['days'] < 1:
+            raise CommandError("Need at least 1 carton, 3 postes and 1 day")
+        if Carton.objects.filter(num_carton__contains='71G').exists():
+            raise CommandError("A generated dataset is already present, flush the database first")
+        
+        started = time.perf_counter()
+        self.rng = np.random.default_rng(options['seed'])
+        self.days = options['days']
+        self.origin = timezone.now() - timedelta(days=self.days)
+        self.batch_size = options['batch_size']
+        
+        self._simulate(options['cartons'], options['postes'])
+        self.stdout.write(
+            f"Simulated {len(self.t)} K, {len(self.carton_num)} cartons, "
+            f"{sum(len(k) for k in self.events['k'])} transitions "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        
+        with transaction.atomic():
+            counts = self._write()
+            counts['stages'] = lifecycle.rebuild(self.batch_size)
+            DataVersion.bump()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['postes']} postes, {counts['cartons']} cartons, "
+            f"{counts['concentrateurs']} concentrateurs, {counts['historique']} historique rows "
+            f"and {counts['stages']} lifecycle stages "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
+    
+    # === SIMULATION ===
+    def _simulate(self, nb_cartons: int, nb_postes: int):
+        """Run every K through its lifecycle, vectorized over all K at each step."""
+        rng = self.rng
+        
+        # Postes, round-robin over the BO
+        self.poste_bo = np.arange(nb_postes) % len(BOS)
+        self.postes_by_bo = [np.flatnonzero(self.poste_bo == b) for b in range(len(BOS))]
+        
+        # Cartons and their K, delivered (en livraison, no affectation) over the period
+        carton_op = rng.choice(len(OPERATEURS), size=nb_cartons, p=OPERATEUR_WEIGHTS)
+        self.carton_num = [
+            f"C{OPERATEUR_LETTERS[OPERATEURS[op]]}71G{i:07d}" for i, op in enumerate(carton_op.tolist())
+        ]
+        self.carton_op = carton_op.tolist()
+        self.carton_recond = [False] * nb_cartons
+        self.carton_t = rng.uniform(0, self.days, size=nb_cartons).tolist()
+        
+        n = nb_cartons * K_PER_CARTON
+        self.carton = np.repeat(np.arange(nb_cartons), K_PER_CARTON)
+        self.operateur = carton_op[self.carton]
+        self.t = np.asarray(self.carton_t)[self.carton]
+        self.created = self.t.copy()
+        self.etat = np.full(n, _code(ETATS, Etat.EN_LIVRAISON))
+        self.affectation = np.zeros(n, dtype=np.int64)
+        self.poste = np.full(n, -1)
+        self.date_affectation = np.full(n, np.nan)
+        self.date_pose = np.full(n, np.nan)
+        self.events = {key: [] for key in ('k', 'action', 't', 'ancien_etat', 'nouvel_etat',
+                                           'ancienne_affectation', 'nouvelle_affectation', 'poste', 'carton')}
+        
+        idx = np.arange(n)
+        while len(idx):
+            idx = self._cycle(idx)
+    
+    def _cycle(self, idx: np.ndarray) -> np.ndarray:
+        """One delivery-to-test cycle; returns the K that come back reconditioned."""
+        rng = self.rng
+        magasin = _code(AFFECTATIONS, Affectation.MAGASIN)
+        labo = _code(AFFECTATIONS, Affectation.LABO)
+        
+        # Réception of the whole carton
+        per_carton = rng.uniform(1, 5, size=len(self.carton_num))
+        idx = self._advance(idx, per_carton[self.carton[idx]], 1.0)
+        self._log(idx, ActionType.RECEPTION, Etat.EN_LIVRAISON, Etat.EN_STOCK,
+                  self.affectation[idx], magasin)
+        self.etat[idx] = _code(ETATS, Etat.EN_STOCK)
+        self.affectation[idx] = magasin
+        
+        # Commande of the whole carton by a BO
+        mean, probability = COMMANDE
+        per_carton = rng.exponential(mean, size=len(self.carton_num))
+        draws = rng.random(len(self.carton_num))
+        bo = rng.integers(len(BOS), size=len(self.carton_num))
+        idx = self._advance(idx, per_carton[self.carton[idx]], probability, draws[self.carton[idx]])
+        bo_code = np.array([_code(AFFECTATIONS, b) for b in BOS])[bo[self.carton[idx]]]
+        self._log(idx, ActionType.COMMANDE_BO, '', '', magasin, bo_code)
+        self.affectation[idx] = bo_code
+        self.date_affectation[idx] = self.t[idx]
+        
+        # Pose on a poste of the BO
+        mean, probability = POSE
+        idx = self._advance(idx, rng.exponential(mean, size=len(idx)), probability)
+        postes = np.empty(len(idx), dtype=np.int64)
+        k_bo = bo[self.carton[idx]]
+        for b, candidates in enumerate(self.postes_by_bo):
+            mask = k_bo == b
+            postes[mask] = rng.choice(candidates, size=mask.sum())
+        self._log(idx, ActionType.POSE, Etat.EN_STOCK, Etat.POSE, 0, 0, poste=postes)
+        self.etat[idx] = _code(ETATS, Etat.POSE)
+        self.poste[idx] = postes
+        self.date_pose[idx] = self.t[idx]
+        
+        # Dépose, sent to the labo
+        mean, probability = DEPOSE
+        idx = self._advance(idx, rng.exponential(mean, size=len(idx)), probability)
+        self._log(idx, ActionType.DEPOSE, Etat.POSE, Etat.A_TESTER,
+                  self.affectation[idx], labo, poste=self.poste[idx])
+        self.etat[idx] = _code(ETATS, Etat.A_TESTER)
+        self.affectation[idx] = labo
+        self.poste[idx] = -1
+        self.date_pose[idx] = np.nan
+        
+        # Test: OK waits for reconditioning (detached from its carton), HS is final
+        mean, probability = TEST
+        idx = self._advance(idx, rng.exponential(mean, size=len(idx)), probability)
+        ok = rng.random(len(idx)) < TEST_OK_RATE
+        hs = idx[~ok]
+        self._log(hs, ActionType.TEST_HS, Etat.A_TESTER, Etat.HS, labo, 0)
+        self.etat[hs] = _code(ETATS, Etat.HS)
+        self.affectation[hs] = 0
+        idx = idx[ok]
+        self._log(idx, ActionType.TEST_OK, Etat.A_TESTER, Etat.EN_ATTENTE_RECONDITIONNEMENT, labo, magasin)
+        self.etat[idx] = _code(ETATS, Etat.EN_ATTENTE_RECONDITIONNEMENT)
+        self.affectation[idx] = magasin
+        self.carton[idx] = -1
+        
+        return self._recondition(idx)
+    
+    def _recondition(self, idx: np.ndarray) -> np.ndarray:
+        """Pack tested-OK K by 4 of the same operateur into reconditioned cartons."""
+        back = []
+        for op in range(len(OPERATEURS)):
+            ks = idx[self.operateur[idx] == op]
+            ks = ks[np.argsort(self.t[ks], kind='stable')]
+            groups = ks[:len(ks) // K_PER_CARTON * K_PER_CARTON].reshape(-1, K_PER_CARTON)
+            group_t = self.t[groups].max(axis=1) + self.rng.uniform(0, 2, size=len(groups))
+            keep = group_t <= self.days
+            groups, group_t = groups[keep], group_t[keep]
+            
+            first = len(self.carton_num)
+            letter = OPERATEUR_LETTERS[OPERATEURS[op]]
+            # 71GR, not 71R: the service numbers real reconditioned cartons from Max(K?71R...)
+            self.carton_num += [f"K{letter}71GR{first + i:06d}" for i in range(len(groups))]
+            self.carton_op += [op] * len(groups)
+            self.carton_recond += [True] * len(groups)
+            self.carton_t += group_t.tolist()
+            
+            cartons = np.arange(first, first + len(groups))
+            self.carton[groups] = cartons[:, None]
+            self.t[groups] = group_t[:, None]
+            back.append(groups.ravel())
+        
+        idx = np.concatenate(back) if back else np.array([], dtype=np.int64)
+        self._log(idx, ActionType.RECONDITIONNEMENT, Etat.EN_ATTENTE_RECONDITIONNEMENT, Etat.EN_LIVRAISON,
+                  0, 0, carton=self.carton[idx])
+        self.etat[idx] = _code(ETATS, Etat.EN_LIVRAISON)
+        return idx
+    
+    def _advance(self, idx: np.ndarray, delays, probability: float, draws=None) -> np.ndarray:
+        """Keep the K whose step happens (with ``probability``) before the end of the period."""
+        if draws is None:
+            draws = self.rng.random(len(idx))
+        new_t = self.t[idx] + delays
+        happens = (draws < probability) & (new_t <= self.days)
+        idx = idx[happens]
+        self.t[idx] = new_t[happens]
+        return idx
+    
+    def _log(self, idx, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation,
+             poste=-1, carton=-1):
+        """Record one transition for every K of ``idx`` (values as table indexes)."""
+        n = len(idx)
+        columns = {
+            'k': idx,
+            'action': _code(ACTIONS, action),
+            't': self.t[idx],
+            'ancien_etat': _code(ETATS, ancien_etat),
+            'nouvel_etat': _code(ETATS, nouvel_etat),
+            'ancienne_affectation': ancienne_affectation,
+            'nouvelle_affectation': nouvelle_affectation,
+            'poste': poste,
+            'carton': carton,
+        }
+        for key, value in columns.items():
+            self.events[key].append(np.broadcast_to(value, n).copy())
+    
+    # === WRITE ===
+    def _write(self) -> dict[str, int]:
+        counts = {}
+        day = timedelta(days=1)
+        origin = self.origin
+        
+        poste_codes = [f"POSTE-G{BOS[b].split()[-1][0]}{i:05d}" for i, b in enumerate(self.poste_bo.tolist())]
+        counts['postes'] = insert_rows(
+            Poste, ['code', 'nom', 'base_operationnelle', 'actif'],
+            ((code, f"Poste {code[7:]}", BOS[b], True) for code, b in zip(poste_codes, self.poste_bo.tolist())),
+            self.batch_size
+        )
+        poste_ids = dict(Poste.objects.filter(code__in=poste_codes).values_list('code', 'id'))
+        poste_ids = [poste_ids[code] for code in poste_codes]
+        
+        counts['cartons'] = insert_rows(
+            Carton, ['num_carton', 'operateur', 'created_at', 'is_reconditionne'],
+            (
+                (num, OPERATEURS[op], origin + t * day, recond)
+                for num, op, t, recond in zip(self.carton_num, self.carton_op, self.carton_t, self.carton_recond)
+            ),
+            self.batch_size
+        )
+        carton_ids = dict(
+            Carton.objects.filter(num_carton__contains='71G').values_list('num_carton', 'id')
+        )
+        carton_ids = [carton_ids[num] for num in self.carton_num]
+        
+        # Current position: zone center + jitter, as populate_gps does
+        centers = np.array([ZONE_CENTERS.get(a, (np.nan, np.nan)) for a in AFFECTATIONS])
+        coords = centers[self.affectation] + self.rng.uniform(-JITTER, JITTER, size=(len(self.t), 2))
+        
+        n_series = [
+            f"K{OPERATEUR_LETTERS[OPERATEURS[op]]}71G{i:08d}" for i, op in enumerate(self.operateur.tolist())
+        ]
+        counts['concentrateurs'] = insert_rows(
+            Concentrateur,
+            ['n_serie', 'carton', 'operateur', 'affectation', 'latitude', 'longitude', 'etat', 'poste_pose',
+             'date_affectation', 'date_pose', 'date_dernier_etat', 'created_at', 'updated_at'],
+            (
+                (
+                    n_serie,
+                    carton_ids[carton] if carton >= 0 else None,
+                    OPERATEURS[op],
+                    AFFECTATIONS[affectation],
+                    None if lat != lat else lat,
+                    None if lng != lng else lng,
+                    ETATS[etat],
+                    poste_ids[poste] if poste >= 0 else None,
+                    None if date_affectation != date_affectation else (origin + date_affectation * day).date(),
+                    None if date_pose != date_pose else (origin + date_pose * day).date(),
+                    (origin + t * day).date(),
+                    origin + created * day,
+                    origin + t * day,
+                )
+                for n_serie, carton, op, affectation, (lat, lng), etat, poste, date_affectation, date_pose, t, created
+                in zip(
+                    n_series, self.carton.tolist(), self.operateur.tolist(), self.affectation.tolist(),
+                    coords.tolist(), self.etat.tolist(), self.poste.tolist(), self.date_affectation.tolist(),
+                    self.date_pose.tolist(), self.t.tolist(), self.created.tolist(),
+                )
+            ),
+            self.batch_size
+        )
+        k_ids = dict(Concentrateur.objects.filter(n_serie__contains='71G').values_list('n_serie', 'id'))
+        k_ids = [k_ids[n_serie] for n_serie in n_series]
+        
+        # Historique in chronological order
+        events = {key: np.concatenate(parts) for key, parts in self.events.items()}
+        order = np.argsort(events['t'], kind='stable')
+        events = {key: values[order].tolist() for key, values in events.items()}
+        counts['historique'] = insert_rows(
+            Historique,
+            ['concentrateur', 'action', 'ancien_etat', 'nouvel_etat', 'ancienne_affectation',
+             'nouvelle_affectation', 'poste', 'commentaire', 'timestamp'],
+            (
+                (
+                    k_ids[k],
+                    ACTIONS[action],
+                    ETATS[ancien_etat],
+                    ETATS[nouvel_etat],
+                    AFFECTATIONS[ancienne_affectation],
+                    AFFECTATIONS[nouvelle_affectation],
+                    poste_codes[poste] if poste >= 0 else '',
+                    f"Assigné au carton reconditionné {self.carton_num[carton]}" if carton >= 0 else '',
+                    origin + t * day,
+                )
+                for k, action, t, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste, carton
+                in zip(*(events[key] for key in self.events))
+            ),
+            self.batch_size
+        )
+        return counts
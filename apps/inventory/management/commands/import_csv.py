@@ -4,16 +4,36 @@ Management command to import concentrateurs from BDD_defi_EDF.csv.
 Usage:
     python manage.py import_csv BDD_defi_EDF.csv
     python manage.py import_csv BDD_defi_EDF.csv --dry-run
+    python manage.py import_csv BDD_defi_EDF.csv --bulk
+    python manage.py import_csv operateur_full.csv --stream --chunk-size 5000
+    python manage.py import_csv operateur_full.csv --resume
+    python manage.py import_csv operateur_full.csv --copy   # PostgreSQL only
+    python manage.py import_csv operateur_full.csv --workers 8
+    python manage.py import_csv BDD_defi_EDF.csv --diff [--dry-run]
+    python manage.py import_csv operateur_full.csv --dry-run --workers 8 --error-report errors.csv
 """
 import csv
+import hashlib
+import io
+import itertools
 import logging
-from datetime import datetime
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import django
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 
-from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
+from apps.inventory.models import Concentrateur, Carton, Poste, Etat, ImportCheckpoint
+from apps.tracking.models import ActionType, ChangeLog, DataVersion, Historique, LifecycleStage
+from services import alerts, lifecycle
+from ._import_rows import (
+    normalize_row, normalize_chunk, fingerprint, parse_date, bo_from_affectation, map_etat, map_affectation,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +58,57 @@ class Command(BaseCommand):
             default='utf-8',
             help='CSV file encoding (default: utf-8)'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Preload existing rows and write with bulk_create/bulk_update (a few queries per batch)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk_create/bulk_update batch in --bulk mode (default: 1000)'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Read the file lazily and commit every --chunk-size rows (implies --bulk)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows per committed chunk in --stream mode (default: 5000)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted --stream import of the same file (implies --stream)'
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='PostgreSQL: COPY rows into an unlogged staging table and merge set-based '
+                 '(falls back to --bulk on other databases)'
+        )
+        parser.add_argument(
+            '--diff',
+            action='store_true',
+            help='Compare row fingerprints with the database, write only new/changed rows, '
+                 'log a MODIFICATION historique per change and count missing serials (implies --bulk)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parse and validate rows in N processes feeding a single DB writer (implies --stream)'
+        )
+        parser.add_argument(
+            '--error-report',
+            type=str,
+            help='Write rejected rows with their error to this CSV file '
+                 '(default with --dry-run: <csv_file>.errors.csv)'
+        )
     
     def handle(self, *args, **options):
         csv_path = Path(options['csv_file'])
@@ -47,16 +118,37 @@ class Command(BaseCommand):
         
         dry_run = options['dry_run']
         encoding = options['encoding']
+        self.workers = options['workers']
+        stream = options['stream'] or options['resume'] or self.workers > 1
+        self.diff = options['diff']
+        copy = options['copy']
+        if copy and connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING("--copy requires PostgreSQL, falling back to --bulk"))
+            copy = False
+        elif copy and self.diff:
+            self.stdout.write(self.style.WARNING("--diff is not supported by --copy, falling back to --bulk"))
+            copy = False
+        bulk = options['bulk'] or stream or options['copy'] or self.diff
+        self.batch_size = options['batch_size']
+        self.error_report = options['error_report'] or (f"{csv_path}.errors.csv" if dry_run else None)
+        self._error_file = None
+        self.source_name = csv_path.name
+        self.seen_existing = set()  # serials already in the DB before this run
+        self.created = set()
+        self.resumed = False
+        initial_count = Concentrateur.objects.count() if self.diff else 0
         
         self.stdout.write(f"Importing from: {csv_path}")
         if dry_run:
             self.stdout.write(self.style.WARNING("DRY RUN - no changes will be saved"))
         
+        started = time.perf_counter()
         stats = {
             'cartons_created': 0,
             'cartons_existing': 0,
             'concentrateurs_created': 0,
             'concentrateurs_updated': 0,
+            'concentrateurs_unchanged': 0,
             'postes_created': 0,
             'errors': 0,
         }
@@ -66,21 +158,45 @@ class Command(BaseCommand):
                 # CSV uses semicolon separator
                 reader = csv.DictReader(f, delimiter=';')
                 
+                self.fieldnames = reader.fieldnames or []
                 self.stdout.write(f"Columns found: {reader.fieldnames}")
                 
-                rows = list(reader)
-                total_rows = len(rows)
-                self.stdout.write(f"Total rows to process: {total_rows}")
-                
-                if not dry_run:
-                    with transaction.atomic():
-                        self._process_all_rows(rows, stats)
+                if copy and not dry_run:
+                    total_rows = self._import_copy(reader, stats)
+                elif stream:
+                    total_rows = self._import_stream(
+                        reader, csv_path, stats, dry_run, options['chunk_size'], options['resume']
+                    )
                 else:
-                    self._process_all_rows(rows, stats, dry_run=True)
+                    rows = list(reader)
+                    total_rows = len(rows)
+                    self.stdout.write(f"Total rows to process: {total_rows}")
+                    
+                    if bulk:
+                        records = self._normalize_all_rows(rows, stats)
+                        if not dry_run:
+                            with transaction.atomic():
+                                self._apply_bulk(records, stats)
+                                DataVersion.bump()
+                        else:
+                            self._count_dry_run(records, stats)
+                    elif not dry_run:
+                        with transaction.atomic():
+                            self._process_all_rows(rows, stats)
+                            DataVersion.bump()
+                    else:
+                        self._process_all_rows(rows, stats, dry_run=True)
         
         except Exception as e:
             logger.error(f"Import failed: {e}")
             raise CommandError(f"Import failed: {e}")
+        finally:
+            if self._error_file is not None:
+                self._error_file.close()
+        
+        if not dry_run:
+            # Rules are evaluated once for the whole import, not per batch
+            alerts.evaluate()
         
         # Print stats
         self.stdout.write("\n=== Import Summary ===")
@@ -89,30 +205,72 @@ class Command(BaseCommand):
         self.stdout.write(f"Postes created: {stats['postes_created']}")
         self.stdout.write(f"Concentrateurs created: {stats['concentrateurs_created']}")
         self.stdout.write(f"Concentrateurs updated: {stats['concentrateurs_updated']}")
+        if bulk:
+            self.stdout.write(f"Concentrateurs unchanged: {stats['concentrateurs_unchanged']}")
+        if self.diff and not self.resumed:
+            missing = initial_count - len(self.seen_existing)
+            self.stdout.write(f"Concentrateurs missing from file: {missing}")
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Duration: {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/s)"
+        )
         
         if stats['errors'] > 0:
             self.stdout.write(self.style.ERROR(f"Errors: {stats['errors']}"))
+            if self._error_file is not None:
+                self.stdout.write(f"Error report: {self.error_report}")
         else:
             self.stdout.write(self.style.SUCCESS("Import completed successfully!"))
     
     def _process_all_rows(self, rows: list, stats: dict, dry_run: bool = False):
-        """Process all CSV rows."""
-        for row_num, row in enumerate(rows, start=2):
-            try:
-                self._process_row(row, stats, dry_run)
-                
-                # Progress indicator every 500 rows
-                if row_num % 500 == 0:
-                    self.stdout.write(f"  Processed {row_num} rows...")
+        """
+        Process all CSV rows, one update_or_create per row.
+        
+        The previous scope of the rows is preloaded and their ChangeLog
+        entries and initial lifecycle stages are written once per batch
+        of ``--batch-size`` rows, as in _apply_bulk.
+        """
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            previous = {} if dry_run else self._preload_scopes(batch)
+            changes, new_concentrateurs = [], []
+            for row_num, row in enumerate(batch, start=start + 2):
+                try:
+                    self._process_row(row, stats, dry_run, previous, changes, new_concentrateurs)
                     
-            except Exception as e:
-                stats['errors'] += 1
-                logger.error(f"Row {row_num}: {e}")
-                if stats['errors'] <= 10:  # Only show first 10 errors
-                    self.stdout.write(self.style.ERROR(f"Row {row_num}: {e}"))
+                    # Progress indicator every 500 rows
+                    if row_num % 500 == 0:
+                        self.stdout.write(f"  Processed {row_num} rows...")
+                        
+                except Exception as e:
+                    self._report_error(row_num, e, stats, row)
+            if not dry_run:
+                lifecycle.open_initial(new_concentrateurs)
+                ChangeLog.record(changes)
+    
+    def _preload_scopes(self, rows: list) -> dict:
+        """(affectation, carton_id) of the existing concentrateurs of ``rows``, by n_serie."""
+        n_series = [row.get('n_serie_concentrateur', '').strip() for row in rows]
+        scopes = {}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(n_series), 900):
+            for n_serie, affectation, carton_id in Concentrateur.objects.filter(
+                n_serie__in=n_series[i:i + 900]
+            ).values_list('n_serie', 'affectation', 'carton_id'):
+                scopes[n_serie] = (affectation, carton_id)
+        return scopes
     
-    def _process_row(self, row: dict, stats: dict, dry_run: bool = False):
-        """Process a single CSV row."""
+    def _process_row(self, row: dict, stats: dict, dry_run: bool = False,
+                     previous: dict | None = None, changes: list | None = None,
+                     new_concentrateurs: list | None = None):
+        """
+        Process a single CSV row.
+        
+        ``previous`` maps n_serie to the scope before the import; the
+        ChangeLog entries and created concentrateurs are appended to
+        ``changes`` and ``new_concentrateurs`` for the caller to write.
+        """
         # Extract values from CSV columns (exact names from the file)
         num_carton = row.get('num_carton', '').strip()
         operateur = row.get('operateur', '').strip()
@@ -167,7 +325,7 @@ class Command(BaseCommand):
         
         # Create or update concentrateur
         if not dry_run:
-            k, created = Concentrateur.objects.update_or_create(
+            k, is_new = Concentrateur.objects.update_or_create(
                 n_serie=n_serie,
                 defaults={
                     'carton': carton,
@@ -180,73 +338,468 @@ class Command(BaseCommand):
                 }
             )
             
-            if created:
+            if is_new:
+                new_concentrateurs.append(k)
                 stats['concentrateurs_created'] += 1
             else:
                 stats['concentrateurs_updated'] += 1
+            # Previous scope and carton, so offline clients drop the K they lose
+            ancienne_affectation, ancien_carton_id = previous.get(n_serie, ('', None))
+            changes += ChangeLog.entries_for_concentrateur(
+                k, ancienne_affectation, k.affectation, carton_ids=(ancien_carton_id,)
+            )
+            previous[n_serie] = (k.affectation, k.carton_id)
         else:
             stats['concentrateurs_created'] += 1
     
+    def _normalize_row(self, row: dict) -> dict:
+        """Extract and map one CSV row to model values (raises ValueError)."""
+        return normalize_row(row)
+    
+    def _iter_chunks(self, reader, chunk_size: int, offset: int, stats: dict):
+        """
+        Yield ``(rows_read, records)`` per chunk of ``chunk_size`` rows.
+        
+        With ``--workers`` > 1, raw rows are normalized by a process pool.
+        At most two chunks per worker are in flight, so reading pauses
+        while the (single) DB writer consuming this generator catches up.
+        Chunks are yielded in file order and errors are reported here.
+        """
+        first_row = offset + 2
+        if self.workers <= 1:
+            rows = itertools.islice(reader, offset, None)
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                yield len(chunk), self._normalize_all_rows(chunk, stats, first_row)
+                first_row += len(chunk)
+            return
+        
+        # Blank lines are skipped like csv.DictReader does
+        rows = itertools.islice((values for values in reader.reader if values), offset, None)
+        with ProcessPoolExecutor(self.workers, initializer=django.setup) as pool:
+            pending = deque()
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if chunk:
+                    pending.append((len(chunk), pool.submit(normalize_chunk, self.fieldnames, chunk, first_row)))
+                    first_row += len(chunk)
+                if not pending:
+                    return
+                if chunk and len(pending) < 2 * self.workers:
+                    continue
+                rows_read, future = pending.popleft()
+                records, errors = future.result()
+                for row_num, message, values in errors:
+                    self._report_error(row_num, message, stats, values)
+                yield rows_read, records
+    
+    def _import_stream(self, reader, csv_path: Path, stats: dict, dry_run: bool,
+                       chunk_size: int, resume: bool) -> int:
+        """
+        Import the CSV lazily, one committed transaction per chunk.
+        
+        After each chunk the ImportCheckpoint of the file (SHA-256 of its
+        content) records the row offset in the same transaction, so a
+        crash loses at most the chunk in progress and ``--resume`` skips
+        the rows already committed.
+        
+        Returns:
+            Number of rows processed by this run
+        """
+        offset = 0
+        checkpoint = None
+        if not dry_run:
+            checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+                file_hash=self._file_hash(csv_path),
+                defaults={'file_name': csv_path.name}
+            )
+            if resume and checkpoint.completed:
+                self.stdout.write(self.style.WARNING("This file was already fully imported, nothing to resume"))
+                return 0
+            if resume:
+                offset = checkpoint.rows_done
+                self.resumed = offset > 0
+                self.stdout.write(f"Resuming after row {offset}")
+            elif checkpoint.rows_done:
+                self.stdout.write(self.style.WARNING(
+                    f"A previous run stopped after {checkpoint.rows_done} rows, starting over "
+                    f"(use --resume to continue it)"
+                ))
+                checkpoint.rows_done = 0
+                checkpoint.completed = False
+                checkpoint.save(update_fields=['rows_done', 'completed', 'updated_at'])
+        
+        processed = 0
+        for rows_read, records in self._iter_chunks(reader, chunk_size, offset, stats):
+            processed += rows_read
+            if dry_run:
+                self._count_dry_run(records, stats)
+                continue
+            
+            with transaction.atomic():
+                self._apply_bulk(records, stats)
+                checkpoint.rows_done = offset + processed
+                checkpoint.save(update_fields=['rows_done', 'updated_at'])
+                DataVersion.bump()
+            self.stdout.write(f"  Committed {offset + processed} rows...")
+        
+        if checkpoint is not None:
+            checkpoint.completed = True
+            checkpoint.save(update_fields=['completed', 'updated_at'])
+        return processed
+    
+    COPY_COLUMNS = [
+        'row_num', 'n_serie', 'num_carton', 'operateur', 'affectation', 'etat',
+        'poste_code', 'bo', 'date_affectation', 'date_pose',
+    ]
+    
+    def _import_copy(self, reader, stats: dict) -> int:
+        """
+        PostgreSQL fast path: COPY + set-based merge, in one transaction.
+        
+        Normalized rows are streamed with ``COPY FROM STDIN`` into an
+        unlogged staging table, then merged with three INSERT ... ON
+        CONFLICT statements (cartons, postes, concentrateurs). Only
+        concentrateurs whose values differ are updated, and the matching
+        ChangeLog entries and the initial lifecycle stage of the created
+        ones are written by the same statement.
+        
+        Returns:
+            Number of CSV rows read
+        """
+        staging = connection.ops.quote_name(f'inventory_import_staging_{os.getpid()}')
+        total_rows = 0
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE UNLOGGED TABLE {staging} (
+                    row_num bigint NOT NULL,
+                    n_serie varchar(50) NOT NULL,
+                    num_carton varchar(50),
+                    operateur varchar(100) NOT NULL,
+                    affectation varchar(20) NOT NULL,
+                    etat varchar(20) NOT NULL,
+                    poste_code varchar(50),
+                    bo varchar(20),
+                    date_affectation date,
+                    date_pose date
+                )
+            """)
+            copy_sql = f"COPY {staging} ({', '.join(self.COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+            
+            for rows_read, records in self._iter_chunks(reader, self.batch_size * 10, 0, stats):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row_num, r in enumerate(records, start=total_rows + 2):
+                    # Unquoted empty fields are read as NULL by COPY ... csv
+                    writer.writerow([
+                        row_num, r['n_serie'], r['num_carton'], r['operateur'], r['affectation'],
+                        r['etat'], r['poste_code'], r['bo'] or '',
+                        r['date_affectation'] or '', r['date_pose'] or '',
+                    ])
+                self._copy_from(cursor, copy_sql, buffer)
+                total_rows += rows_read
+                self.stdout.write(f"  Copied {total_rows} rows...")
+            
+            cursor.execute(f"ANALYZE {staging}")
+            self._merge_staging(cursor, staging, stats)
+            cursor.execute(f"DROP TABLE {staging}")
+            DataVersion.bump()
+        
+        return total_rows
+    
+    def _copy_from(self, cursor, sql: str, buffer: io.StringIO):
+        """Feed ``buffer`` to ``COPY ... FROM STDIN`` (psycopg2 or psycopg 3)."""
+        buffer.seek(0)
+        if hasattr(cursor.cursor, 'copy_expert'):
+            cursor.cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    
+    def _merge_staging(self, cursor, staging: str, stats: dict):
+        """Merge the staging table into cartons, postes and concentrateurs."""
+        carton_table = connection.ops.quote_name(Carton._meta.db_table)
+        poste_table = connection.ops.quote_name(Poste._meta.db_table)
+        k_table = connection.ops.quote_name(Concentrateur._meta.db_table)
+        log_table = connection.ops.quote_name(ChangeLog._meta.db_table)
+        stage_table = connection.ops.quote_name(LifecycleStage._meta.db_table)
+        now = timezone.now()
+        params = {'now': now, 'today': now.date(), 'bos': list(lifecycle.BOS)}
+        
+        # Later rows win for duplicated keys, as in the ORM paths
+        cursor.execute(f"""
+            WITH ins AS (
+                INSERT INTO {carton_table} (num_carton, operateur, created_at, is_reconditionne)
+                SELECT DISTINCT ON (num_carton) num_carton, operateur, %(now)s, false
+                FROM {staging}
+                WHERE num_carton IS NOT NULL
+                ORDER BY num_carton, row_num DESC
+                ON CONFLICT (num_carton) DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM ins),
+                   (SELECT count(DISTINCT num_carton) FROM {staging})
+        """, params)
+        created, distinct = cursor.fetchone()
+        stats['cartons_created'] += created
+        stats['cartons_existing'] += distinct - created
+        
+        cursor.execute(f"""
+            INSERT INTO {poste_table} (code, nom, base_operationnelle, actif)
+            SELECT DISTINCT ON (poste_code) poste_code, poste_code, bo, true
+            FROM {staging}
+            WHERE poste_code IS NOT NULL AND bo IS NOT NULL
+            ORDER BY poste_code, row_num DESC
+            ON CONFLICT (code) DO NOTHING
+        """)
+        stats['postes_created'] += cursor.rowcount
+        
+        fields = ['carton_id', 'operateur', 'affectation', 'etat', 'poste_pose_id', 'date_affectation', 'date_pose']
+        cursor.execute(f"""
+            WITH src AS (
+                SELECT DISTINCT ON (s.n_serie)
+                       s.n_serie, c.id AS carton_id, s.operateur, s.affectation, s.etat,
+                       p.id AS poste_pose_id, s.date_affectation, s.date_pose
+                FROM {staging} s
+                LEFT JOIN {carton_table} c ON c.num_carton = s.num_carton
+                LEFT JOIN {poste_table} p ON p.code = s.poste_code AND s.bo IS NOT NULL
+                ORDER BY s.n_serie, s.row_num DESC
+            ),
+            old AS (
+                SELECT k.id, k.affectation FROM {k_table} k JOIN src USING (n_serie)
+            ),
+            upsert AS (
+                INSERT INTO {k_table} (n_serie, {', '.join(fields)}, date_dernier_etat, created_at, updated_at)
+                SELECT n_serie, {', '.join(fields)}, %(today)s, %(now)s, %(now)s FROM src
+                ON CONFLICT (n_serie) DO UPDATE SET
+                    {', '.join(f'{f} = EXCLUDED.{f}' for f in fields)},
+                    date_dernier_etat = EXCLUDED.date_dernier_etat,
+                    updated_at = EXCLUDED.updated_at
+                WHERE ({', '.join(f'{k_table}.{f}' for f in fields)})
+                      IS DISTINCT FROM ({', '.join(f'EXCLUDED.{f}' for f in fields)})
+                RETURNING id, carton_id, affectation, etat, poste_pose_id, (xmax = 0) AS inserted
+            ),
+            stages AS (
+                -- Initial stage of the created K, as lifecycle.open_initial()
+                INSERT INTO {stage_table} (concentrateur_id, etat, affectation, poste, bo, entered_at)
+                SELECT u.id, u.etat, u.affectation,
+                       CASE WHEN u.etat = '{Etat.POSE}' THEN coalesce(p.code, '') ELSE '' END,
+                       CASE WHEN u.affectation = ANY(%(bos)s) THEN u.affectation ELSE '' END,
+                       %(now)s
+                FROM upsert u
+                LEFT JOIN {poste_table} p ON p.id = u.poste_pose_id
+                WHERE u.inserted
+            ),
+            log AS (
+                INSERT INTO {log_table} (model, object_id, scope, timestamp)
+                SELECT DISTINCT e.model, e.object_id, e.scope, %(now)s
+                FROM upsert u
+                LEFT JOIN old o ON o.id = u.id
+                CROSS JOIN LATERAL (VALUES
+                    ('{ChangeLog.CONCENTRATEUR}', u.id, u.affectation),
+                    ('{ChangeLog.CONCENTRATEUR}', u.id, o.affectation),
+                    ('{ChangeLog.CARTON}', u.carton_id, u.affectation),
+                    ('{ChangeLog.CARTON}', u.carton_id, o.affectation)
+                ) AS e(model, object_id, scope)
+                WHERE e.object_id IS NOT NULL AND e.scope IS NOT NULL AND e.scope <> ''
+            )
+            SELECT count(*) FILTER (WHERE inserted),
+                   count(*) FILTER (WHERE NOT inserted),
+                   (SELECT count(*) FROM src)
+            FROM upsert
+        """, params)
+        created, updated, distinct = cursor.fetchone()
+        stats['concentrateurs_created'] += created
+        stats['concentrateurs_updated'] += updated
+        stats['concentrateurs_unchanged'] += distinct - created - updated
+    
+    def _file_hash(self, path: Path) -> str:
+        """SHA-256 of the file content, read in 1 MB blocks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while block := f.read(1024 * 1024):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _normalize_all_rows(self, rows, stats: dict, first_row: int = 2) -> list[dict]:
+        """Normalize rows, counting and reporting errors like _process_all_rows."""
+        records = []
+        for row_num, row in enumerate(rows, start=first_row):
+            try:
+                records.append(self._normalize_row(row))
+            except Exception as e:
+                self._report_error(row_num, e, stats, row)
+        return records
+    
+    def _report_error(self, row_num: int, error, stats: dict, row=None):
+        stats['errors'] += 1
+        logger.error(f"Row {row_num}: {error}")
+        if stats['errors'] <= 10:  # Only show first 10 errors
+            self.stdout.write(self.style.ERROR(f"Row {row_num}: {error}"))
+        
+        if self.error_report:
+            if self._error_file is None:
+                self._error_file = open(self.error_report, 'w', encoding='utf-8', newline='')
+                self._error_writer = csv.writer(self._error_file, delimiter=';')
+                self._error_writer.writerow(['row', 'error', *self.fieldnames])
+            values = list(row.values()) if isinstance(row, dict) else list(row or [])
+            self._error_writer.writerow([row_num, error, *values])
+    
+    def _count_dry_run(self, records: list[dict], stats: dict):
+        """Fill the summary counts of a dry run without writing anything."""
+        if not self.diff:
+            stats['concentrateurs_created'] += len(records)
+            return
+        records = self._diff_records(records, stats)
+        changed = sum(1 for r in records if r['n_serie'] in self.seen_existing)
+        stats['concentrateurs_updated'] += changed
+        stats['concentrateurs_created'] += len(records) - changed
+    
+    def _diff_records(self, records: list[dict], stats: dict) -> list[dict]:
+        """
+        Drop the rows whose fingerprint matches the database.
+        
+        The DB side is read with a single ``values_list`` per 900 serials
+        (no model instances) and hashed like the incoming rows. Matching
+        rows are counted as unchanged; new and changed rows are returned.
+        """
+        records = list({r['n_serie']: r for r in records}.values())
+        n_series = [r['n_serie'] for r in records]
+        current = {}
+        for i in range(0, len(n_series), 900):
+            queryset = Concentrateur.objects.filter(n_serie__in=n_series[i:i + 900]).values_list(
+                'n_serie', 'carton__num_carton', 'operateur', 'affectation', 'etat',
+                'poste_pose__code', 'date_affectation', 'date_pose'
+            )
+            for n_serie, *values in queryset:
+                current[n_serie] = fingerprint(*values)
+        self.seen_existing.update(n_serie for n_serie in current if n_serie not in self.created)
+        
+        changed = [r for r in records if current.get(r['n_serie']) != r['fingerprint']]
+        stats['concentrateurs_unchanged'] += len(records) - len(changed)
+        return changed
+    
+    def _apply_bulk(self, records: list[dict], stats: dict):
+        """
+        Write a batch of normalized rows with a handful of queries.
+        
+        Existing cartons, postes and concentrateurs are preloaded into
+        dicts keyed by their natural key; missing ones are inserted with
+        bulk_create and only the concentrateurs whose values differ are
+        written back with bulk_update. Later rows win when a n_serie
+        appears twice (as with update_or_create).
+        
+        With ``--diff``, unchanged rows are filtered out by fingerprint
+        first and each updated concentrateur gets a MODIFICATION entry.
+        """
+        if self.diff:
+            records = self._diff_records(records, stats)
+        records = list({r['n_serie']: r for r in records}.values())
+        
+        # Cartons
+        wanted = {r['num_carton']: r['operateur'] for r in records if r['num_carton']}
+        cartons = self._preload(Carton, 'num_carton', wanted)
+        stats['cartons_existing'] += len(cartons)
+        new_cartons = Carton.objects.bulk_create(
+            [Carton(num_carton=num, operateur=op) for num, op in wanted.items() if num not in cartons],
+            batch_size=self.batch_size
+        )
+        cartons.update({c.num_carton: c for c in new_cartons})
+        stats['cartons_created'] += len(new_cartons)
+        
+        # Postes (only when the BO can be derived from the affectation)
+        wanted = {r['poste_code']: r['bo'] for r in records if r['poste_code'] and r['bo']}
+        postes = self._preload(Poste, 'code', wanted)
+        new_postes = Poste.objects.bulk_create(
+            [Poste(code=code, nom=code, base_operationnelle=bo) for code, bo in wanted.items() if code not in postes],
+            batch_size=self.batch_size
+        )
+        postes.update({p.code: p for p in new_postes})
+        stats['postes_created'] += len(new_postes)
+        
+        # Concentrateurs
+        existing = self._preload(Concentrateur, 'n_serie', [r['n_serie'] for r in records])
+        to_create, changes, historique = [], [], []
+        to_update = defaultdict(list)  # changed field names -> instances
+        for r in records:
+            values = {
+                'carton_id': cartons[r['num_carton']].pk if r['num_carton'] else None,
+                'operateur': r['operateur'],
+                'affectation': r['affectation'],
+                'etat': r['etat'],
+                'poste_pose_id': postes[r['poste_code']].pk if r['poste_code'] in postes else None,
+                'date_affectation': r['date_affectation'],
+                'date_pose': r['date_pose'],
+            }
+            k = existing.get(r['n_serie'])
+            if k is None:
+                to_create.append(Concentrateur(n_serie=r['n_serie'], **values))
+                continue
+            changed = tuple(field for field, value in values.items() if getattr(k, field) != value)
+            if not changed:
+                stats['concentrateurs_unchanged'] += 1
+                continue
+            changes += ChangeLog.entries_for_concentrateur(k, k.affectation, r['affectation'])
+            if self.diff:
+                historique.append(Historique(
+                    concentrateur=k,
+                    action=ActionType.MODIFICATION,
+                    ancien_etat=k.etat,
+                    nouvel_etat=values['etat'],
+                    ancienne_affectation=k.affectation,
+                    nouvelle_affectation=values['affectation'],
+                    poste=r['poste_code'] if values['poste_pose_id'] else '',
+                    commentaire=f"Import {self.source_name} : "
+                                f"{', '.join(field.removesuffix('_id') for field in changed)}"
+                ))
+            for field in changed:
+                setattr(k, field, values[field])
+            to_update[changed].append(k)
+        
+        Concentrateur.objects.bulk_create(to_create, batch_size=self.batch_size)
+        lifecycle.open_initial(to_create)
+        if self.diff:
+            self.created.update(k.n_serie for k in to_create)
+        for k in to_create:
+            changes += ChangeLog.entries_for_concentrateur(k, k.affectation)
+        stats['concentrateurs_created'] += len(to_create)
+        
+        # One bulk_update per set of changed columns keeps the CASE
+        # expressions small; auto_now columns get a plain UPDATE instead.
+        now = timezone.now()
+        for fields, objs in to_update.items():
+            Concentrateur.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+            for i in range(0, len(objs), self.batch_size):
+                Concentrateur.objects.filter(pk__in=[k.pk for k in objs[i:i + self.batch_size]]).update(
+                    updated_at=now, date_dernier_etat=now.date()
+                )
+            stats['concentrateurs_updated'] += len(objs)
+        
+        lifecycle.record(Historique.objects.bulk_create(historique, batch_size=self.batch_size))
+        ChangeLog.record(changes)
+    
+    def _preload(self, model, key_field: str, keys) -> dict:
+        """Existing instances of ``model`` whose ``key_field`` is in keys, by key."""
+        keys = list(keys)
+        found = {}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 900):
+            for obj in model.objects.filter(**{f'{key_field}__in': keys[i:i + 900]}):
+                found[getattr(obj, key_field)] = obj
+        return found
+    
     def _parse_date(self, value: str):
         """Parse date in DD/MM/YYYY format."""
-        if not value:
-            return None
-        try:
-            return datetime.strptime(value, '%d/%m/%Y').date()
-        except ValueError:
-            return None
+        return parse_date(value)
     
     def _get_bo_from_affectation(self, value: str) -> str | None:
         """Get BO name from affectation for poste creation."""
-        value_lower = value.lower().strip() if value else ''
-        if 'nord' in value_lower:
-            return 'BO Nord'
-        elif 'centre' in value_lower:
-            return 'BO Centre'
-        elif 'sud' in value_lower:
-            return 'BO Sud'
-        return None
+        return bo_from_affectation(value)
     
     def _map_etat(self, value: str) -> str:
         """Map CSV état value to model enum."""
-        value_lower = value.lower().strip() if value else ''
-        
-        mapping = {
-            'en_livraison': Etat.EN_LIVRAISON,
-            'en livraison': Etat.EN_LIVRAISON,
-            'livraison': Etat.EN_LIVRAISON,
-            'en_stock': Etat.EN_STOCK,
-            'en stock': Etat.EN_STOCK,
-            'stock': Etat.EN_STOCK,
-            'pose': Etat.POSE,
-            'posé': Etat.POSE,
-            'a_tester': Etat.A_TESTER,
-            'à tester': Etat.A_TESTER,
-            'a tester': Etat.A_TESTER,
-            'tester': Etat.A_TESTER,
-            'hs': Etat.HS,
-            'hors service': Etat.HS,
-        }
-        
-        return mapping.get(value_lower, Etat.EN_LIVRAISON)
+        return map_etat(value)
     
     def _map_affectation(self, value: str) -> str:
         """Map CSV affectation value to model enum."""
-        value_lower = value.lower().strip() if value else ''
-        
-        mapping = {
-            'magasin': Affectation.MAGASIN,
-            'bo nord': Affectation.BO_NORD,
-            'bo_nord': Affectation.BO_NORD,
-            'nord': Affectation.BO_NORD,
-            'bo centre': Affectation.BO_CENTRE,
-            'bo_centre': Affectation.BO_CENTRE,
-            'centre': Affectation.BO_CENTRE,
-            'bo sud': Affectation.BO_SUD,
-            'bo_sud': Affectation.BO_SUD,
-            'sud': Affectation.BO_SUD,
-            'labo': Affectation.LABO,
-            'laboratoire': Affectation.LABO,
-        }
-        
-        return mapping.get(value_lower, Affectation.MAGASIN)
+        return map_affectation(value)
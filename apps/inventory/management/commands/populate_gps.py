@@ -1,33 +1,89 @@
+"""
+Management command to backfill missing GPS coordinates from the affectation.
+
+Usage:
+    python manage.py populate_gps
+    python manage.py populate_gps --seed 42 --batch-size 1000
+"""
+import numpy as np
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
 from apps.inventory.models import Concentrateur
-import random
+from apps.tracking.models import DataVersion
+
+# Zone centers (approximate)
+ZONE_CENTERS = {
+    "BO Nord": (42.6973, 9.4500),   # Bastia area
+    "BO Sud": (41.9192, 8.7386),    # Ajaccio area
+    "BO Centre": (42.3094, 9.1490), # Corte area
+    "Magasin": (42.5500, 9.4000),   # Near Bastia
+    "Labo": (42.6000, 9.3000),      # Near Bastia
+}
+
+# Random jitter (approx 10-20km radius): 0.1 degree lat is ~11km
+JITTER = 0.10
+
 
 class Command(BaseCommand):
     help = 'Populate missing GPS coordinates for concentrators based on their affectation'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for reproducible coordinates'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per UPDATE statement (default: 500)'
+        )
+
     def handle(self, *args, **options):
-        # Zone centers (approximate)
-        ZONE_CENTERS = {
-            "BO Nord": (42.6973, 9.4500),   # Bastia area
-            "BO Sud": (41.9192, 8.7386),    # Ajaccio area
-            "BO Centre": (42.3094, 9.1490), # Corte area
-            "Magasin": (42.5500, 9.4000),   # Near Bastia
-            "Labo": (42.6000, 9.3000),      # Near Bastia
-        }
-
-        qs = Concentrateur.objects.exclude(affectation='')
-        count = 0
-        
-        for c in qs:
-            # Only update if missing (or force update if you want to regenerate all)
-            if c.latitude is None or c.longitude is None:
-                center = ZONE_CENTERS.get(c.affectation)
-                if center:
-                    # Add random jitter (approx 10-20km radius)
-                    # 0.1 degree lat is ~11km
-                    c.latitude = center[0] + random.uniform(-0.10, 0.10)
-                    c.longitude = center[1] + random.uniform(-0.10, 0.10)
-                    c.save()
-                    count += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully updated {count} concentrators with GPS coordinates'))
+        rows = list(
+            Concentrateur.objects
+            .filter(affectation__in=ZONE_CENTERS)
+            .filter(Q(latitude__isnull=True) | Q(longitude__isnull=True))
+            .order_by('id')
+            .values_list('id', 'affectation')
+        )
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('Successfully updated 0 concentrators with GPS coordinates'))
+            return
+
+        ids, affectations = zip(*rows)
+        zones = list(ZONE_CENTERS)
+        centers = np.array([ZONE_CENTERS[zone] for zone in zones])
+        zone_index = np.fromiter(map({zone: i for i, zone in enumerate(zones)}.get, affectations), dtype=np.intp)
+
+        rng = np.random.default_rng(options['seed'])
+        coords = centers[zone_index] + rng.uniform(-JITTER, JITTER, size=(len(ids), 2))
+
+        with transaction.atomic():
+            self._write_coordinates(ids, coords.tolist(), options['batch_size'])
+            DataVersion.bump()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {len(ids)} concentrators with GPS coordinates'))
+
+    def _write_coordinates(self, ids, coords, batch_size: int):
+        """
+        Write latitude/longitude only, ``batch_size`` rows per statement.
+
+        ``UPDATE ... FROM (VALUES ...)`` (PostgreSQL, SQLite >= 3.33) rather
+        than bulk_update(), whose per-row CASE/WHEN expressions cost ~0.5 ms
+        each to build. No save() either, so updated_at and
+        date_dernier_etat keep their values.
+        """
+        table = connection.ops.quote_name(Concentrateur._meta.db_table)
+        with connection.cursor() as cursor:
+            for i in range(0, len(ids), batch_size):
+                batch = list(zip(ids[i:i + batch_size], coords[i:i + batch_size]))
+                cursor.execute(
+                    f"UPDATE {table} SET latitude = v.column2, longitude = v.column3 "
+                    f"FROM (VALUES {', '.join(['(%s, %s, %s)'] * len(batch))}) AS v "
+                    f"WHERE {table}.id = v.column1",
+                    [value for pk, (lat, lng) in batch for value in (pk, lat, lng)]
+                )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_concentrateur_latitude_concentrateur_longitude'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concentrateur',
+            index=models.Index(fields=['updated_at'], name='inventory_c_updated_4253e3_idx'),
+        ),
+    ]
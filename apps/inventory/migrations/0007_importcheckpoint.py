@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_concentrateur_inventory_c_updated_4253e3_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_hash', models.CharField(max_length=64, unique=True, verbose_name='Empreinte SHA-256')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Fichier')),
+                ('rows_done', models.PositiveBigIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('completed', models.BooleanField(default=False, verbose_name='Terminé')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Début')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': "Point de reprise d'import",
+                'verbose_name_plural': "Points de reprise d'import",
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
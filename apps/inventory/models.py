@@ -185,7 +185,51 @@ class Concentrateur(models.Model):
             models.Index(fields=['etat', 'affectation']),
             models.Index(fields=['operateur']),
             models.Index(fields=['carton', 'etat']),
+            models.Index(fields=['updated_at']),
         ]
     
     def __str__(self) -> str:
         return f"{self.n_serie} ({self.get_etat_display()})"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a chunked ``import_csv --stream`` run.
+    
+    Saved in the same transaction as each committed chunk, so
+    ``--resume`` restarts exactly after the last committed row.
+    """
+    file_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Empreinte SHA-256"
+    )
+    file_name = models.CharField(
+        max_length=255,
+        verbose_name="Fichier"
+    )
+    rows_done = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Lignes traitées"
+    )
+    completed = models.BooleanField(
+        default=False,
+        verbose_name="Terminé"
+    )
+    started_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Début"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière mise à jour"
+    )
+    
+    class Meta:
+        verbose_name = "Point de reprise d'import"
+        verbose_name_plural = "Points de reprise d'import"
+        ordering = ['-updated_at']
+    
+    def __str__(self) -> str:
+        status = "terminé" if self.completed else f"{self.rows_done} lignes"
+        return f"{self.file_name} ({status})"
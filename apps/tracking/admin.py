@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Historique
+from services.alerts import evaluate
+from .models import Alert, AlertRule, Historique, HistoriqueArchive, InventorySnapshot, LifecycleStage, StockLevel
 
 
 @admin.register(Historique)
@@ -18,3 +19,88 @@ class HistoriqueAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         # Historique should not be modified
         return False
+
+
+@admin.register(HistoriqueArchive)
+class HistoriqueArchiveAdmin(admin.ModelAdmin):
+    """Read-only view of the archived months (moved by archive_historique)."""
+    list_display = ('concentrateur', 'action', 'user', 'ancien_etat', 'nouvel_etat', 'timestamp')
+    list_filter = ('month', 'action')
+    search_fields = ('concentrateur__n_serie', 'user__username', 'commentaire')
+    raw_id_fields = ('concentrateur', 'user')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    """Daily snapshots taken by snapshot_inventory (data not shown)."""
+    list_display = ('day', 'taken_at', 'concentrateurs')
+    exclude = ('data',)
+    date_hierarchy = 'day'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LifecycleStage)
+class LifecycleStageAdmin(admin.ModelAdmin):
+    """Read-only: kept by the transitions and rebuild_lifecycle."""
+    list_display = ('concentrateur', 'etat', 'affectation', 'bo', 'user', 'entered_at', 'left_at', 'duration')
+    list_filter = ('etat', 'affectation', 'bo')
+    search_fields = ('concentrateur__n_serie', 'user__username')
+    raw_id_fields = ('concentrateur', 'user')
+    date_hierarchy = 'entered_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    """Read-only: rolled up by rollup_stock_levels."""
+    list_display = ('day', 'affectation', 'etat', 'operateur', 'count', 'entered')
+    list_filter = ('affectation', 'etat', 'operateur')
+    date_hierarchy = 'day'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    """Alert rules; saving one re-evaluates it at once."""
+    list_display = ('name', 'kind', 'affectation', 'operateur', 'etat', 'threshold', 'severity', 'active')
+    list_filter = ('kind', 'severity', 'active')
+    list_editable = ('threshold', 'active')
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        evaluate([obj])
+
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    """Read-only: opened and closed by services/alerts.py."""
+    list_display = ('rule', 'message', 'value', 'opened_at', 'closed_at')
+    list_filter = ('rule__name', 'rule__severity')
+    date_hierarchy = 'opened_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,30 @@
+"""
+FilterSets for the Historique exports.
+"""
+import django_filters
+
+from .models import Historique, HistoriqueArchive
+
+
+class HistoriqueFilter(django_filters.FilterSet):
+    """Filter the audit trail by action, concentrateur, user and period."""
+    n_serie = django_filters.CharFilter(field_name='concentrateur__n_serie')
+    since = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    until = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lt')
+    
+    class Meta:
+        model = Historique
+        fields = ['action', 'user', 'n_serie', 'since', 'until']
+
+
+def historique_filtersets(data) -> list[HistoriqueFilter]:
+    """
+    The same filters on the archive and on the hot table, oldest first.
+    
+    Archived rows all predate the hot ones, so exporting the two
+    querysets one after the other keeps the timestamp order.
+    """
+    return [
+        HistoriqueFilter(data, queryset=HistoriqueArchive.objects.order_by('timestamp', 'id')),
+        HistoriqueFilter(data, queryset=Historique.objects.order_by('timestamp', 'id')),
+    ]
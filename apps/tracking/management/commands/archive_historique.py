@@ -0,0 +1,95 @@
+"""
+Management command moving cold months of Historique to HistoriqueArchive.
+
+Months before the hot window (``HISTORIQUE_HOT_MONTHS``, current month
+included) are copied with one ``INSERT ... SELECT`` and deleted from the
+hot table, one transaction per month. Rows keep their id and timestamp.
+
+Usage:
+    python manage.py archive_historique
+    python manage.py archive_historique --hot-months 3 --dry-run
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.tracking.models import Historique, HistoriqueArchive
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(month: date) -> datetime:
+    """Aware local midnight on ``month``."""
+    return timezone.make_aware(datetime(month.year, month.month, 1))
+
+
+class Command(BaseCommand):
+    help = 'Move Historique months older than the hot window to HistoriqueArchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hot-months',
+            type=int,
+            default=settings.HISTORIQUE_HOT_MONTHS,
+            help=f'Months kept in Historique, current month included (default: {settings.HISTORIQUE_HOT_MONTHS})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the months that would be archived'
+        )
+
+    def handle(self, *args, **options):
+        # The dashboard reads the last 60 days from the hot table only
+        if options['hot_months'] < 3:
+            raise CommandError("--hot-months must be at least 3")
+
+        current = timezone.localdate().replace(day=1)
+        cutoff = add_months(current, 1 - options['hot_months'])
+        oldest = Historique.objects.filter(timestamp__lt=month_start(cutoff)).aggregate(oldest=Min('timestamp'))['oldest']
+        if oldest is None:
+            self.stdout.write(self.style.SUCCESS(f"Nothing to archive before {cutoff:%Y-%m}"))
+            return
+
+        month = timezone.localtime(oldest).date().replace(day=1)
+        total = 0
+        while month < cutoff:
+            start, end = month_start(month), month_start(add_months(month, 1))
+            if options['dry_run']:
+                moved = Historique.objects.filter(timestamp__gte=start, timestamp__lt=end).count()
+            else:
+                moved = self._archive_month(month, start, end)
+            if moved:
+                self.stdout.write(f"{month:%Y-%m}: {moved} rows")
+            total += moved
+            month = add_months(month, 1)
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} historique rows before {cutoff:%Y-%m}"))
+
+    @transaction.atomic
+    def _archive_month(self, month: date, start: datetime, end: datetime) -> int:
+        qn = connection.ops.quote_name
+        columns = [field.column for field in HistoriqueArchive._meta.concrete_fields if field.name != 'month']
+        column_list = ', '.join(qn(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(HistoriqueArchive._meta.db_table)} ({column_list}, {qn('month')}) "
+                f"SELECT {column_list}, %s FROM {qn(Historique._meta.db_table)} "
+                f"WHERE {qn('timestamp')} >= %s AND {qn('timestamp')} < %s",
+                [
+                    connection.ops.adapt_datefield_value(month),
+                    connection.ops.adapt_datetimefield_value(start),
+                    connection.ops.adapt_datetimefield_value(end),
+                ]
+            )
+        # No cascade nor signal on Historique: a single DELETE
+        deleted, _ = Historique.objects.filter(timestamp__gte=start, timestamp__lt=end).delete()
+        return deleted
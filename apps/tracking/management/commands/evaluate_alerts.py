@@ -0,0 +1,26 @@
+"""
+Management command evaluating every AlertRule (run periodically).
+
+Transitions only evaluate the rules of the scopes they touch; this run
+catches what changes without a transition, such as the age of the Labo
+backlog, and rules edited outside the admin.
+
+Usage:
+    python manage.py evaluate_alerts
+"""
+from django.core.management.base import BaseCommand
+
+from apps.tracking.models import Alert
+from services.alerts import evaluate
+
+
+class Command(BaseCommand):
+    help = 'Evaluate every alert rule, opening and closing alerts'
+
+    def handle(self, *args, **options):
+        result = evaluate()
+        active = Alert.objects.filter(closed_at__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Opened {result['opened']}, refreshed {result['refreshed']}, closed {result['closed']} alerts; "
+            f"{active} active"
+        ))
@@ -0,0 +1,39 @@
+"""
+Management command recomputing LifecycleStage from the Historique.
+
+Transitions keep the table up to date; run this after a bulk import
+without ``--diff``, a generated dataset or a change of the stage rules.
+The table is replaced in one transaction.
+
+Usage:
+    python manage.py rebuild_lifecycle
+    python manage.py rebuild_lifecycle --batch-size 50000
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.bulk import BATCH_SIZE
+from services.lifecycle import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lifecycle stage table from the whole Historique'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Stages per INSERT / COPY batch (default: {BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.perf_counter()
+        count = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} lifecycle stages in {time.perf_counter() - started:.1f}s"
+        ))
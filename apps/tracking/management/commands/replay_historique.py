@@ -0,0 +1,190 @@
+"""
+Management command rebuilding the fleet state from the Historique and
+comparing it with the Concentrateur table.
+
+Every Historique row (archive included) is streamed in timestamp order
+and folded into one in-memory state row per concentrateur (see
+services.snapshots.replay); memory grows with the fleet, not with the
+history. Fields the history never determined are not checked.
+
+Without ``--fix`` only the drifted rows are reported. With ``--fix``
+they are rewritten with bulk updates, each getting a MODIFICATION
+Historique row, in one transaction. Rows whose replayed poste or carton
+no longer exists (deleted or renamed since) are skipped and listed.
+
+Usage:
+    python manage.py replay_historique
+    python manage.py replay_historique --from-snapshot --limit 50
+    python manage.py replay_historique --fix
+"""
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.models import Carton, Concentrateur, Poste, Etat
+from apps.tracking.models import ActionType, ChangeLog, DataVersion, Historique
+from services import alerts, lifecycle
+from services.bulk import BATCH_SIZE
+from services.snapshots import ETAT, AFFECTATION, POSTE, CARTON, live_rows, replay
+
+# Compared state columns and the Concentrateur field each one maps to
+COLUMNS = {ETAT: 'etat', AFFECTATION: 'affectation', POSTE: 'poste_pose', CARTON: 'carton'}
+
+
+class Command(BaseCommand):
+    help = 'Replay the Historique to verify (or repair) the Concentrateur table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite the drifted concentrateurs with the replayed state'
+        )
+        parser.add_argument(
+            '--from-snapshot',
+            action='store_true',
+            help='Start from the latest InventorySnapshot instead of the first Historique row'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Drifted concentrateurs listed (default: 20)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Rows per UPDATE batch with --fix (default: {BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.perf_counter()
+        state = replay(from_snapshot=options['from_snapshot'])
+        if options['from_snapshot'] and state['snapshot'] is None:
+            raise CommandError("No InventorySnapshot to start from, run snapshot_inventory first")
+        self.stdout.write(
+            f"Replayed {state['replayed']} historique rows into {len(state['rows'])} concentrateurs "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        drifts = self._compare(state['rows'])
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS("No drift: the Concentrateur table matches the Historique"))
+            return
+
+        fields = Counter(field for _, changes in drifts.values() for field in changes)
+        self.stdout.write(self.style.WARNING(
+            f"{len(drifts)} drifted concentrateurs ("
+            + ', '.join(f"{field}: {count}" for field, count in fields.most_common()) + ")"
+        ))
+        for live, changes in sorted(drifts.values(), key=lambda drift: drift[0][0])[:options['limit']]:
+            self.stdout.write(f"  {live[0]}: " + ', '.join(
+                f"{field} {current!r} -> {replayed!r}" for field, (current, replayed) in changes.items()
+            ))
+
+        if options['fix']:
+            fixed, skipped = self._fix(drifts, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Rewrote {fixed} concentrateurs"))
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {len(skipped)} concentrateurs whose replayed poste or carton no longer exists"
+                ))
+                for n_serie, missing in sorted(skipped)[:options['limit']]:
+                    self.stdout.write(f"  {n_serie}: {missing}")
+
+    def _compare(self, replayed: dict[int, list]) -> dict[int, tuple]:
+        """``{id: (live row, {field: (live, replayed)})}`` for the drifted concentrateurs."""
+        drifts = {}
+        for pk, live in live_rows().items():
+            row = replayed.get(pk)
+            if row is None:
+                continue
+            changes = {
+                field: (live[column], row[column])
+                for column, field in COLUMNS.items()
+                if row[column] is not None and row[column] != live[column]
+            }
+            if changes:
+                drifts[pk] = (live, changes)
+        return drifts
+
+    @transaction.atomic
+    def _fix(self, drifts: dict[int, tuple], batch_size: int) -> tuple[int, list[tuple[str, str]]]:
+        """
+        Rewrite the drifted concentrateurs.
+
+        Returns:
+            (rewritten count, ``(n_serie, missing poste / carton)`` of the
+            skipped ones)
+        """
+        wanted = [changes for _, changes in drifts.values()]
+        postes = dict(Poste.objects.filter(
+            code__in={c['poste_pose'][1] for c in wanted if c.get('poste_pose', ('', ''))[1]}
+        ).values_list('code', 'id'))
+        cartons = dict(Carton.objects.filter(
+            num_carton__in={c['carton'][1] for c in wanted if c.get('carton', ('', ''))[1]}
+        ).values_list('num_carton', 'id'))
+
+        # An empty replayed value clears the FK; an unknown one must not
+        skipped, ids = [], []
+        for pk, (live, changes) in drifts.items():
+            missing = [
+                f"{label} {changes[field][1]!r}"
+                for field, label, known in (('poste_pose', 'poste', postes), ('carton', 'carton', cartons))
+                if changes.get(field, ('', ''))[1] and changes[field][1] not in known
+            ]
+            if missing:
+                skipped.append((live[0], ', '.join(missing)))
+            else:
+                ids.append(pk)
+
+        now = timezone.now()
+        for i in range(0, len(ids), batch_size):
+            concentrateurs = Concentrateur.objects.in_bulk(ids[i:i + batch_size])
+            historique, changelog, fields = [], [], set()
+            for pk, k in concentrateurs.items():
+                live, changes = drifts[pk]
+                ancien_etat, ancienne_affectation, ancien_carton_id = k.etat, k.affectation, k.carton_id
+                for field, (_, value) in changes.items():
+                    if field == 'poste_pose':
+                        k.poste_pose_id = postes.get(value)
+                        if k.etat != Etat.POSE:
+                            k.date_pose = None
+                            fields.add('date_pose')
+                    elif field == 'carton':
+                        k.carton_id = cartons.get(value)
+                    else:
+                        setattr(k, field, value)
+                    fields.add(field)
+                historique.append(Historique(
+                    concentrateur=k,
+                    action=ActionType.MODIFICATION,
+                    ancien_etat=ancien_etat,
+                    nouvel_etat=k.etat,
+                    ancienne_affectation=ancienne_affectation,
+                    nouvelle_affectation=k.affectation,
+                    poste=changes['poste_pose'][1] if 'poste_pose' in changes else live[POSTE],
+                    commentaire=f"Rejeu de l'historique : {', '.join(changes)}"
+                ))
+                changelog += ChangeLog.entries_for_concentrateur(
+                    k, ancienne_affectation, k.affectation, carton_ids=(ancien_carton_id,)
+                )
+
+            Concentrateur.objects.bulk_update(concentrateurs.values(), sorted(fields))
+            Concentrateur.objects.filter(pk__in=list(concentrateurs)).update(
+                updated_at=now, date_dernier_etat=now.date()
+            )
+            lifecycle.record(Historique.objects.bulk_create(historique))
+            ChangeLog.record(changelog)
+
+        if ids:
+            DataVersion.bump()
+            alerts.evaluate()
+        return len(ids), skipped
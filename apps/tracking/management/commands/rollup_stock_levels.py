@@ -0,0 +1,50 @@
+"""
+Management command rolling up the daily stock levels (run daily, after
+midnight).
+
+Each run adds the days since the last rolled one, up to yesterday.
+``--since`` recomputes from a date, for instance after rebuild_lifecycle.
+
+Usage:
+    python manage.py rollup_stock_levels
+    python manage.py rollup_stock_levels --since 2025-01-01
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from services.stock_levels import rollup
+
+
+class Command(BaseCommand):
+    help = 'Roll the end-of-day stock levels per affectation, etat and operateur up to yesterday'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Recompute the days from this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Last day rolled (default: yesterday)'
+        )
+
+    def handle(self, *args, **options):
+        since, until = (self._date(options[name]) for name in ('since', 'until'))
+        until = until or timezone.localdate() - timedelta(days=1)
+        if since and since > until:
+            raise CommandError("--since is after --until")
+
+        days = rollup(until, since)
+        self.stdout.write(self.style.SUCCESS(f"Rolled {days} days up to {until:%Y-%m-%d}"))
+
+    def _date(self, value):
+        if value is None:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
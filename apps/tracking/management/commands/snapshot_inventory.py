@@ -0,0 +1,47 @@
+"""
+Management command storing today's InventorySnapshot (run daily).
+
+Re-running it on the same day replaces that day's snapshot. Snapshots
+older than ``INVENTORY_SNAPSHOT_KEEP_DAYS`` are pruned, except the first
+one of each month, kept for month-end questions.
+
+Usage:
+    python manage.py snapshot_inventory
+    python manage.py snapshot_inventory --keep-days 30
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.tracking.models import InventorySnapshot
+from services.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Store a compact snapshot of the fleet state for "stock as of" queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=settings.INVENTORY_SNAPSHOT_KEEP_DAYS,
+            help=f'Daily snapshots kept (default: {settings.INVENTORY_SNAPSHOT_KEEP_DAYS}), '
+                 f'monthly ones are never pruned'
+        )
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 1:
+            raise CommandError("--keep-days must be at least 1")
+
+        snapshot = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot of {snapshot.day:%Y-%m-%d}: {snapshot.concentrateurs} concentrateurs, "
+            f"{len(snapshot.data)} bytes"
+        ))
+
+        cutoff = timezone.localdate() - timedelta(days=options['keep_days'])
+        pruned, _ = InventorySnapshot.objects.filter(day__lt=cutoff).exclude(day__day=1).delete()
+        if pruned:
+            self.stdout.write(f"Pruned {pruned} daily snapshots before {cutoff:%Y-%m-%d}")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0002_alter_historique_action'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, unique=True, verbose_name='Périmètre')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernière modification')),
+            ],
+            options={
+                'verbose_name': 'Version des données',
+                'verbose_name_plural': 'Versions des données',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('concentrateur', 'Concentrateur'), ('carton', 'Carton'), ('poste', 'Poste')], max_length=20, verbose_name='Modèle')),
+                ('object_id', models.BigIntegerField(verbose_name='ID objet')),
+                ('scope', models.CharField(max_length=20, verbose_name='Périmètre')),
+                ('timestamp', models.DateTimeField(auto_now_add=True, verbose_name='Date/Heure')),
+            ],
+            options={
+                'verbose_name': 'Journal des changements',
+                'verbose_name_plural': 'Journal des changements',
+                'indexes': [models.Index(fields=['scope', 'id'], name='tracking_ch_scope_35ea63_idx')],
+            },
+        ),
+    ]
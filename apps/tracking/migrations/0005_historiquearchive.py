@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_importcheckpoint'),
+        ('tracking', '0004_changelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueArchive',
+            fields=[
+                ('action', models.CharField(choices=[('reception', 'Réception magasin'), ('commande_bo', 'Commande vers BO'), ('pose', 'Pose sur poste'), ('depose', 'Dépose du poste'), ('test_ok', 'Test OK'), ('test_hs', 'Test HS'), ('reconditionnement', 'Reconditionnement'), ('modification', 'Modification manuelle')], max_length=20, verbose_name='Action')),
+                ('ancien_etat', models.CharField(blank=True, default='', max_length=20, verbose_name='Ancien état')),
+                ('nouvel_etat', models.CharField(blank=True, default='', max_length=20, verbose_name='Nouvel état')),
+                ('ancienne_affectation', models.CharField(blank=True, default='', max_length=20, verbose_name='Ancienne affectation')),
+                ('nouvelle_affectation', models.CharField(blank=True, default='', max_length=20, verbose_name='Nouvelle affectation')),
+                ('poste', models.CharField(blank=True, default='', max_length=100, verbose_name='Poste')),
+                ('commentaire', models.TextField(blank=True, default='', verbose_name='Commentaire')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(verbose_name='Date/Heure')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('concentrateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historique_archive', to='inventory.concentrateur', verbose_name='Concentrateur')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Historique archivé',
+                'verbose_name_plural': 'Historiques archivés',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['concentrateur', '-timestamp'], name='tracking_hi_concent_3a694b_idx'), models.Index(fields=['timestamp'], name='tracking_hi_timesta_4d8030_idx'), models.Index(fields=['month'], name='tracking_hi_month_3687cc_idx')],
+            },
+        ),
+    ]
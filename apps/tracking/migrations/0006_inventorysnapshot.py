@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0005_historiquearchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='Jour')),
+                ('taken_at', models.DateTimeField(db_index=True, verbose_name='Pris le')),
+                ('concentrateurs', models.PositiveIntegerField(default=0, verbose_name='Concentrateurs')),
+                ('data', models.BinaryField(verbose_name='Données')),
+            ],
+            options={
+                'verbose_name': "Instantané d'inventaire",
+                'verbose_name_plural': "Instantanés d'inventaire",
+                'ordering': ['-day'],
+            },
+        ),
+    ]
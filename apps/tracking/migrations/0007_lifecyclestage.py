@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_importcheckpoint'),
+        ('tracking', '0006_inventorysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LifecycleStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etat', models.CharField(max_length=20, verbose_name='État')),
+                ('affectation', models.CharField(blank=True, default='', max_length=20, verbose_name='Affectation')),
+                ('poste', models.CharField(blank=True, default='', max_length=100, verbose_name='Poste')),
+                ('bo', models.CharField(blank=True, default='', help_text="BO du stade, ou BO de l'utilisateur qui y a fait entrer le K", max_length=20, verbose_name='BO')),
+                ('entered_at', models.DateTimeField(verbose_name='Entrée')),
+                ('left_at', models.DateTimeField(blank=True, null=True, verbose_name='Sortie')),
+                ('duration', models.DurationField(blank=True, null=True, verbose_name='Durée')),
+                ('cycle_started_at', models.DateTimeField(blank=True, help_text='Réception qui a ouvert le cycle en cours', null=True, verbose_name='Début du cycle')),
+                ('concentrateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='inventory.concentrateur', verbose_name='Concentrateur')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Stade du cycle de vie',
+                'verbose_name_plural': 'Stades du cycle de vie',
+                'ordering': ['concentrateur', 'entered_at'],
+                'indexes': [models.Index(fields=['concentrateur', 'left_at'], name='tracking_li_concent_a740e3_idx'), models.Index(fields=['etat', 'affectation', 'duration'], name='tracking_li_etat_17b6ad_idx'), models.Index(fields=['left_at'], name='tracking_li_left_at_5ef109_idx'), models.Index(fields=['etat', 'entered_at'], name='tracking_li_etat_49970c_idx'), models.Index(fields=['user', 'left_at'], name='tracking_li_user_id_79eb5c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0007_lifecyclestage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('affectation', models.CharField(blank=True, default='', max_length=20, verbose_name='Affectation')),
+                ('etat', models.CharField(max_length=20, verbose_name='État')),
+                ('operateur', models.CharField(max_length=100, verbose_name='Opérateur')),
+                ('count', models.PositiveIntegerField(verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': 'Niveau de stock',
+                'verbose_name_plural': 'Niveaux de stock',
+                'ordering': ['day', 'affectation', 'etat', 'operateur'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'affectation', 'etat', 'operateur'), name='unique_stock_level')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0008_stocklevel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocklevel',
+            name='entered',
+            field=models.PositiveIntegerField(default=0, verbose_name='Entrées du jour'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0009_stocklevel_entered'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Titre')),
+                ('kind', models.CharField(choices=[('stock_min', 'Stock inférieur au seuil'), ('stock_max', 'Stock supérieur au seuil'), ('backlog_age', 'Plus ancien K en attente depuis plus de N jours')], default='stock_min', max_length=20, verbose_name='Type')),
+                ('threshold', models.PositiveIntegerField(help_text='Nombre de K, ou jours pour un backlog', verbose_name='Seuil')),
+                ('affectation', models.CharField(blank=True, choices=[('Magasin', 'Magasin'), ('BO Nord', 'BO Nord'), ('BO Centre', 'BO Centre'), ('BO Sud', 'BO Sud'), ('Labo', 'Labo')], default='', max_length=20, verbose_name='Affectation')),
+                ('etat', models.CharField(blank=True, choices=[('en_livraison', 'En livraison'), ('en_stock', 'En stock'), ('pose', 'Posé'), ('a_tester', 'À tester'), ('en_attente_recond', 'En attente reconditionnement'), ('HS', 'Hors service')], default='', max_length=20, verbose_name='État')),
+                ('operateur', models.CharField(blank=True, choices=[('Bouygues', 'Bouygues'), ('Orange', 'Orange'), ('SFR', 'SFR')], default='', max_length=100, verbose_name='Opérateur')),
+                ('severity', models.CharField(choices=[('warning', 'Avertissement'), ('info', 'Information')], default='warning', max_length=20, verbose_name='Gravité')),
+                ('active', models.BooleanField(default=True, verbose_name='Active')),
+            ],
+            options={
+                'verbose_name': "Règle d'alerte",
+                'verbose_name_plural': "Règles d'alerte",
+                'ordering': ['name', 'affectation', 'operateur', 'etat'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveIntegerField(verbose_name='Valeur')),
+                ('message', models.CharField(max_length=255, verbose_name='Message')),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ouverte le')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Fermée le')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='tracking.alertrule', verbose_name='Règle')),
+            ],
+            options={
+                'verbose_name': 'Alerte',
+                'verbose_name_plural': 'Alertes',
+                'ordering': ['-opened_at'],
+                'indexes': [models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['opened_at'], name='alert_open_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('rule',), name='unique_open_alert')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.utils import timezone
+
+BOS = ('BO Nord', 'BO Centre', 'BO Sud')
+# Former StockStatsView.THRESHOLD
+STOCK_THRESHOLD = 5
+
+
+def create_default_rules(apps, schema_editor):
+    AlertRule = apps.get_model('tracking', 'AlertRule')
+    Alert = apps.get_model('tracking', 'Alert')
+    Concentrateur = apps.get_model('inventory', 'Concentrateur')
+
+    now = timezone.now()
+    for bo in BOS:
+        rule = AlertRule.objects.create(
+            name='Stock Critique', kind='stock_min', threshold=STOCK_THRESHOLD, affectation=bo
+        )
+        # Open the alerts the dashboard used to compute on every read
+        count = Concentrateur.objects.filter(affectation=bo).count()
+        if count < STOCK_THRESHOLD:
+            Alert.objects.create(rule=rule, value=count, message=f"Stock faible sur {bo} ({count} unités)",
+                                 opened_at=now)
+    AlertRule.objects.create(
+        name='Backlog Labo', kind='backlog_age', threshold=30, affectation='Labo', etat='a_tester', severity='info'
+    )
+
+
+def delete_default_rules(apps, schema_editor):
+    apps.get_model('tracking', 'AlertRule').objects.filter(name__in=('Stock Critique', 'Backlog Labo')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_importcheckpoint'),
+        ('tracking', '0010_alerts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_rules, delete_default_rules),
+    ]
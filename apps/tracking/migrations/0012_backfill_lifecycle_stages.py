@@ -0,0 +1,102 @@
+from itertools import chain
+
+from django.db import migrations
+
+BOS = ('BO Nord', 'BO Centre', 'BO Sud')
+USER_BO = {
+    'bo_nord_commande': 'BO Nord', 'bo_nord_terrain': 'BO Nord',
+    'bo_centre_commande': 'BO Centre', 'bo_centre_terrain': 'BO Centre',
+    'bo_sud_commande': 'BO Sud', 'bo_sud_terrain': 'BO Sud',
+}
+EVENT_FIELDS = (
+    'concentrateur_id', 'action', 'ancien_etat', 'nouvel_etat',
+    'ancienne_affectation', 'nouvelle_affectation', 'poste', 'user_id', 'timestamp',
+)
+BATCH_SIZE = 2000
+
+
+def _stage(k_id, etat, affectation, poste, bo, user_id, entered_at, cycle_started_at):
+    return {
+        'concentrateur_id': k_id, 'etat': etat, 'affectation': affectation, 'poste': poste, 'bo': bo,
+        'user_id': user_id, 'entered_at': entered_at, 'left_at': None, 'duration': None,
+        'cycle_started_at': cycle_started_at,
+    }
+
+
+def backfill_stages(apps, schema_editor):
+    """
+    Build the stages of existing fleets from the Historique, as
+    services.lifecycle.rebuild() does, with the models of this migration.
+    Later fleets are kept up to date by the transitions.
+    """
+    LifecycleStage = apps.get_model('tracking', 'LifecycleStage')
+    Concentrateur = apps.get_model('inventory', 'Concentrateur')
+    if LifecycleStage.objects.exists() or not Concentrateur.objects.exists():
+        return
+    User = apps.get_model('core', 'User')
+    user_bo = {pk: USER_BO.get(profil, '') for pk, profil in User.objects.values_list('id', 'profil')}
+    live = {
+        pk: (created_at, etat, affectation, poste or '')
+        for pk, created_at, etat, affectation, poste in Concentrateur.objects.order_by()
+        .values_list('id', 'created_at', 'etat', 'affectation', 'poste_pose__code').iterator()
+    }
+    # Archived rows all predate the hot ones
+    events = chain.from_iterable(
+        apps.get_model('tracking', name).objects.order_by('timestamp', 'id').values_list(*EVENT_FIELDS).iterator()
+        for name in ('HistoriqueArchive', 'Historique')
+    )
+
+    batch, open_stages = [], {}
+
+    def write(stage):
+        batch.append(LifecycleStage(**stage))
+        if len(batch) >= BATCH_SIZE:
+            LifecycleStage.objects.bulk_create(batch)
+            batch.clear()
+
+    for k_id, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste, user_id, at \
+            in events:
+        if k_id not in live:
+            continue
+        etat_changed = bool(ancien_etat or nouvel_etat)
+        affectation_changed = bool(ancienne_affectation or nouvelle_affectation)
+        previous = open_stages.get(k_id)
+        if previous is None:
+            created_at, etat, affectation, _ = live[k_id]
+            previous = _stage(
+                k_id, ancien_etat if etat_changed else etat,
+                ancienne_affectation if affectation_changed else affectation,
+                poste if action == 'depose' else '', '', None, min(created_at, at), None,
+            )
+        etat = nouvel_etat if etat_changed else previous['etat']
+        affectation = nouvelle_affectation if affectation_changed else previous['affectation']
+        if (etat, affectation) == (previous['etat'], previous['affectation']) and action not in ('pose', 'depose'):
+            open_stages[k_id] = previous
+            continue
+        previous.update(left_at=at, duration=at - previous['entered_at'])
+        write(previous)
+        open_stages[k_id] = _stage(
+            k_id, etat, affectation, poste if etat == 'pose' else '',
+            affectation if affectation in BOS else user_bo.get(user_id) or '', user_id, at,
+            at if action == 'reception' else previous['cycle_started_at'],
+        )
+
+    for k_id, (created_at, etat, affectation, poste) in live.items():
+        write(open_stages.pop(k_id, None) or _stage(
+            k_id, etat, affectation, poste if etat == 'pose' else '',
+            affectation if affectation in BOS else '', None, created_at, None,
+        ))
+    LifecycleStage.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0007_importcheckpoint'),
+        ('tracking', '0011_default_alert_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stages, migrations.RunPython.noop),
+    ]
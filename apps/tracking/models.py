@@ -1,8 +1,15 @@
 """
 Tracking app - Historique (audit trail) for concentrator actions.
 """
+import zlib
+
+import msgpack
 from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.models import Affectation, Etat, Operateur
 
 
 class ActionType(models.TextChoices):
@@ -17,18 +24,8 @@ class ActionType(models.TextChoices):
     MODIFICATION = 'modification', 'Modification manuelle'
 
 
-class Historique(models.Model):
-    """
-    Audit trail for all concentrator state changes.
-    
-    Records who did what, when, and captures before/after states.
-    """
-    concentrateur = models.ForeignKey(
-        'inventory.Concentrateur',
-        on_delete=models.CASCADE,
-        related_name='historique',
-        verbose_name="Concentrateur"
-    )
+class HistoriqueBase(models.Model):
+    """Columns shared by the hot Historique table and its archive."""
     action = models.CharField(
         max_length=20,
         choices=ActionType.choices,
@@ -76,6 +73,29 @@ class Historique(models.Model):
         default='',
         verbose_name="Commentaire"
     )
+    
+    class Meta:
+        abstract = True
+    
+    def __str__(self) -> str:
+        return f"{self.concentrateur.n_serie} - {self.get_action_display()} ({self.timestamp:%d/%m/%Y %H:%M})"
+
+
+class Historique(HistoriqueBase):
+    """
+    Audit trail for all concentrator state changes.
+    
+    Records who did what, when, and captures before/after states.
+    Rows older than the hot window (``HISTORIQUE_HOT_MONTHS``) are moved
+    to HistoriqueArchive by ``manage.py archive_historique``; recent reads
+    (dashboard, exports since a recent date) only touch this table.
+    """
+    concentrateur = models.ForeignKey(
+        'inventory.Concentrateur',
+        on_delete=models.CASCADE,
+        related_name='historique',
+        verbose_name="Concentrateur"
+    )
     timestamp = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Date/Heure"
@@ -91,5 +111,479 @@ class Historique(models.Model):
             models.Index(fields=['user', 'timestamp']),
         ]
     
+    @classmethod
+    def timeline(cls, concentrateur, limit: int | None = None) -> list:
+        """
+        History of one concentrateur, newest first, archives included.
+        
+        Archived rows are all older than the hot ones, so the archive is
+        only read when the hot table has fewer than ``limit`` rows.
+        """
+        rows = list(concentrateur.historique.select_related('user')[:limit])
+        if limit is None or len(rows) < limit:
+            archived = concentrateur.historique_archive.select_related('user')
+            rows += archived[:limit - len(rows)] if limit is not None else archived
+        return rows
+
+
+class HistoriqueArchive(HistoriqueBase):
+    """
+    Historique rows older than the hot window, moved month by month.
+    
+    Rows keep their original id and timestamp; ``month`` (first day of
+    the month, local time) is the archival unit.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name="ID"
+    )
+    concentrateur = models.ForeignKey(
+        'inventory.Concentrateur',
+        on_delete=models.CASCADE,
+        related_name='historique_archive',
+        verbose_name="Concentrateur"
+    )
+    timestamp = models.DateTimeField(
+        verbose_name="Date/Heure"
+    )
+    month = models.DateField(
+        verbose_name="Mois"
+    )
+    
+    class Meta:
+        verbose_name = "Historique archivé"
+        verbose_name_plural = "Historiques archivés"
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['concentrateur', '-timestamp']),
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['month']),
+        ]
+
+
+class LifecycleStage(models.Model):
+    """
+    One visit of a concentrateur to a lifecycle stage (état + affectation).
+    
+    Opened and closed by the transitions (services/lifecycle.py), so
+    time in stock, in the Labo or on a poste and the cycle time are
+    plain aggregates on indexed columns; ``rebuild_lifecycle`` recomputes
+    the whole table from the Historique. ``left_at`` and ``duration`` are
+    empty for the current stage of each K.
+    """
+    concentrateur = models.ForeignKey(
+        'inventory.Concentrateur',
+        on_delete=models.CASCADE,
+        related_name='stages',
+        verbose_name="Concentrateur"
+    )
+    etat = models.CharField(
+        max_length=20,
+        verbose_name="État"
+    )
+    affectation = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name="Affectation"
+    )
+    poste = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="Poste"
+    )
+    bo = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name="BO",
+        help_text="BO du stade, ou BO de l'utilisateur qui y a fait entrer le K"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Utilisateur"
+    )
+    entered_at = models.DateTimeField(
+        verbose_name="Entrée"
+    )
+    left_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Sortie"
+    )
+    duration = models.DurationField(
+        null=True,
+        blank=True,
+        verbose_name="Durée"
+    )
+    cycle_started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Début du cycle",
+        help_text="Réception qui a ouvert le cycle en cours"
+    )
+    
+    class Meta:
+        verbose_name = "Stade du cycle de vie"
+        verbose_name_plural = "Stades du cycle de vie"
+        ordering = ['concentrateur', 'entered_at']
+        indexes = [
+            models.Index(fields=['concentrateur', 'left_at']),
+            models.Index(fields=['etat', 'affectation', 'duration']),
+            models.Index(fields=['left_at']),
+            models.Index(fields=['etat', 'entered_at']),
+            models.Index(fields=['user', 'left_at']),
+        ]
+    
     def __str__(self) -> str:
-        return f"{self.concentrateur.n_serie} - {self.get_action_display()} ({self.timestamp:%d/%m/%Y %H:%M})"
+        return f"{self.concentrateur_id} {self.etat}/{self.affectation or '-'} ({self.entered_at:%d/%m/%Y})"
+
+
+class StockLevel(models.Model):
+    """
+    End-of-day concentrateur count per affectation, état and opérateur.
+    
+    Rolled up day after day by ``manage.py rollup_stock_levels``: each
+    day is the previous one plus the LifecycleStage entries and exits of
+    that day (services/stock_levels.py). Every non-empty combination is
+    written for every day, so a date range is a single indexed read.
+    ``entered`` is the daily flow into the combination (poses per BO and
+    opérateur are the consumption series of services/forecasting.py).
+    """
+    day = models.DateField(
+        verbose_name="Jour"
+    )
+    affectation = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name="Affectation"
+    )
+    etat = models.CharField(
+        max_length=20,
+        verbose_name="État"
+    )
+    operateur = models.CharField(
+        max_length=100,
+        verbose_name="Opérateur"
+    )
+    count = models.PositiveIntegerField(
+        verbose_name="Nombre"
+    )
+    entered = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Entrées du jour"
+    )
+    
+    class Meta:
+        verbose_name = "Niveau de stock"
+        verbose_name_plural = "Niveaux de stock"
+        ordering = ['day', 'affectation', 'etat', 'operateur']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'affectation', 'etat', 'operateur'], name='unique_stock_level'
+            ),
+        ]
+    
+    def __str__(self) -> str:
+        return f"{self.day:%d/%m/%Y} {self.affectation or '-'} {self.etat} {self.operateur}: {self.count}"
+
+
+
+class AlertRule(models.Model):
+    """
+    Configurable alert on the stock of a scope (affectation, état,
+    opérateur; blank means any).
+    
+    Evaluated by the transitions touching its scope and by
+    ``manage.py evaluate_alerts`` (services/alerts.py); while the rule is
+    breached it has one open Alert.
+    """
+    
+    class Kind(models.TextChoices):
+        STOCK_MIN = 'stock_min', 'Stock inférieur au seuil'
+        STOCK_MAX = 'stock_max', 'Stock supérieur au seuil'
+        BACKLOG_AGE = 'backlog_age', 'Plus ancien K en attente depuis plus de N jours'
+    
+    class Severity(models.TextChoices):
+        WARNING = 'warning', 'Avertissement'
+        INFO = 'info', 'Information'
+    
+    name = models.CharField(
+        max_length=100,
+        verbose_name="Titre"
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=Kind.choices,
+        default=Kind.STOCK_MIN,
+        verbose_name="Type"
+    )
+    threshold = models.PositiveIntegerField(
+        verbose_name="Seuil",
+        help_text="Nombre de K, ou jours pour un backlog"
+    )
+    affectation = models.CharField(
+        max_length=20,
+        choices=Affectation.choices,
+        blank=True,
+        default='',
+        verbose_name="Affectation"
+    )
+    etat = models.CharField(
+        max_length=20,
+        choices=Etat.choices,
+        blank=True,
+        default='',
+        verbose_name="État"
+    )
+    operateur = models.CharField(
+        max_length=100,
+        choices=Operateur.choices,
+        blank=True,
+        default='',
+        verbose_name="Opérateur"
+    )
+    severity = models.CharField(
+        max_length=20,
+        choices=Severity.choices,
+        default=Severity.WARNING,
+        verbose_name="Gravité"
+    )
+    active = models.BooleanField(
+        default=True,
+        verbose_name="Active"
+    )
+    
+    class Meta:
+        verbose_name = "Règle d'alerte"
+        verbose_name_plural = "Règles d'alerte"
+        ordering = ['name', 'affectation', 'operateur', 'etat']
+    
+    def __str__(self) -> str:
+        return f"{self.name} ({self.scope}, seuil {self.threshold})"
+    
+    @property
+    def scope(self) -> str:
+        parts = (self.affectation, self.operateur, self.get_etat_display() if self.etat else '')
+        return ' / '.join(part for part in parts if part) or 'parc'
+
+
+class Alert(models.Model):
+    """
+    A breach of an AlertRule, open from ``opened_at`` until ``closed_at``.
+    
+    Only the open alerts are read by the dashboard (partial index), so
+    reading them costs O(active alerts) whatever the history.
+    """
+    rule = models.ForeignKey(
+        AlertRule,
+        on_delete=models.CASCADE,
+        related_name='alerts',
+        verbose_name="Règle"
+    )
+    value = models.PositiveIntegerField(
+        verbose_name="Valeur"
+    )
+    message = models.CharField(
+        max_length=255,
+        verbose_name="Message"
+    )
+    opened_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Ouverte le"
+    )
+    closed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Fermée le"
+    )
+    
+    class Meta:
+        verbose_name = "Alerte"
+        verbose_name_plural = "Alertes"
+        ordering = ['-opened_at']
+        indexes = [
+            models.Index(fields=['opened_at'], condition=models.Q(closed_at__isnull=True), name='alert_open_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rule'], condition=models.Q(closed_at__isnull=True), name='unique_open_alert'
+            ),
+        ]
+    
+    def __str__(self) -> str:
+        return f"{self.rule.name}: {self.message}"
+
+
+class InventorySnapshot(models.Model):
+    """
+    Compact daily copy of the fleet state, base of "stock as of" queries.
+    
+    One row per day (``manage.py snapshot_inventory``): the columns
+    (id, n_serie, état, affectation, poste code, carton number) of every
+    concentrateur, packed with msgpack and zlib. Historique rows up to
+    ``taken_at`` are reflected in it; see services/snapshots.py.
+    """
+    COLUMNS = ('id', 'n_serie', 'etat', 'affectation', 'poste', 'carton')
+    
+    day = models.DateField(
+        unique=True,
+        verbose_name="Jour"
+    )
+    taken_at = models.DateTimeField(
+        db_index=True,
+        verbose_name="Pris le"
+    )
+    concentrateurs = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Concentrateurs"
+    )
+    data = models.BinaryField(
+        verbose_name="Données"
+    )
+    
+    class Meta:
+        verbose_name = "Instantané d'inventaire"
+        verbose_name_plural = "Instantanés d'inventaire"
+        ordering = ['-day']
+    
+    def __str__(self) -> str:
+        return f"{self.day:%d/%m/%Y} ({self.concentrateurs} K)"
+    
+    @staticmethod
+    def pack(rows: dict[int, list]) -> bytes:
+        """Encode ``{id: [n_serie, etat, affectation, poste, carton]}`` column-wise."""
+        columns = [list(rows), *(list(column) for column in zip(*rows.values()))] if rows else []
+        return zlib.compress(msgpack.packb(columns, use_bin_type=True))
+    
+    def unpack(self) -> dict[int, list]:
+        columns = msgpack.unpackb(zlib.decompress(self.data), raw=False)
+        if not columns:
+            return {}
+        return {k: list(row) for k, *row in zip(*columns)}
+
+
+class DataVersion(models.Model):
+    """
+    Monotonic counter bumped on every inventory change.
+    
+    Used as a cheap change marker for HTTP caching (ETag / Last-Modified):
+    reading it is a single-row lookup, unlike re-running a list query.
+    """
+    INVENTORY = 'inventory'
+    STOCK_LEVELS = 'stock_levels'
+    
+    scope = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name="Périmètre"
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Version"
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Dernière modification"
+    )
+    
+    class Meta:
+        verbose_name = "Version des données"
+        verbose_name_plural = "Versions des données"
+    
+    def __str__(self) -> str:
+        return f"{self.scope} v{self.version}"
+    
+    @classmethod
+    def bump(cls, scope: str = INVENTORY) -> None:
+        """Increment the version of ``scope`` (created on first bump)."""
+        updated = cls.objects.filter(scope=scope).update(
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            obj, created = cls.objects.get_or_create(scope=scope, defaults={'version': 1})
+            if not created:
+                cls.bump(scope)
+    
+    @classmethod
+    def current(cls, scope: str = INVENTORY) -> 'DataVersion':
+        """Current version of ``scope`` (unsaved version 0 if never bumped)."""
+        return cls.objects.filter(scope=scope).first() or cls(scope=scope, updated_at=None)
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of inventory rows touched per scope (affectation / BO).
+    
+    The auto-increment id is the sync cursor used by offline clients
+    (ids follow inserts, not commits: services/sync.py re-reads a safety
+    window behind it). A row is logged under every scope it enters *or
+    leaves*, so a client of that scope learns about the change and can
+    either refresh the row or drop it (tombstone).
+    """
+    CONCENTRATEUR = 'concentrateur'
+    CARTON = 'carton'
+    POSTE = 'poste'
+    MODEL_CHOICES = [
+        (CONCENTRATEUR, 'Concentrateur'),
+        (CARTON, 'Carton'),
+        (POSTE, 'Poste'),
+    ]
+    
+    model = models.CharField(
+        max_length=20,
+        choices=MODEL_CHOICES,
+        verbose_name="Modèle"
+    )
+    object_id = models.BigIntegerField(verbose_name="ID objet")
+    scope = models.CharField(
+        max_length=20,
+        verbose_name="Périmètre"
+    )
+    timestamp = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date/Heure"
+    )
+    
+    class Meta:
+        verbose_name = "Journal des changements"
+        verbose_name_plural = "Journal des changements"
+        indexes = [
+            models.Index(fields=['scope', 'id']),
+        ]
+    
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.model} {self.object_id} ({self.scope})"
+    
+    @classmethod
+    def entries_for(cls, model: str, object_id: int | None, *scopes: str) -> list['ChangeLog']:
+        """Unsaved entries for one object in each non-empty scope."""
+        if object_id is None:
+            return []
+        return [cls(model=model, object_id=object_id, scope=scope) for scope in dict.fromkeys(scopes) if scope]
+    
+    @classmethod
+    def entries_for_concentrateur(cls, k, *scopes: str, carton_ids: tuple = ()) -> list['ChangeLog']:
+        """
+        Entries for a concentrateur and its carton(s) in each scope.
+        
+        A carton is visible to a BO through its concentrateurs, so it is
+        logged alongside them; pass ``carton_ids`` when the K was detached.
+        """
+        entries = cls.entries_for(cls.CONCENTRATEUR, k.pk, *scopes)
+        for carton_id in dict.fromkeys((k.carton_id, *carton_ids)):
+            entries += cls.entries_for(cls.CARTON, carton_id, *scopes)
+        return entries
+    
+    @classmethod
+    def record(cls, entries: list['ChangeLog']) -> None:
+        """Persist entries in one INSERT, dropping duplicates."""
+        unique = {(e.model, e.object_id, e.scope): e for e in entries}
+        if unique:
+            cls.objects.bulk_create(unique.values())
@@ -0,0 +1,58 @@
+"""
+Keep DataVersion and ChangeLog in sync with changes made outside
+ConcentrateurService.
+
+Transitions bump the version themselves (once per action); cartons and
+postes are also edited from the admin, so their saves bump it here.
+Deletions are logged in ChangeLog so that sync clients get a tombstone.
+"""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from apps.inventory.models import Carton, Concentrateur, Poste
+from .models import DataVersion, ChangeLog
+
+
+@receiver(post_save, sender=Carton)
+@receiver(post_save, sender=Poste)
+@receiver(post_delete, sender=Carton)
+@receiver(post_delete, sender=Poste)
+@receiver(post_delete, sender=Concentrateur)
+def bump_data_version(sender, **kwargs):
+    DataVersion.bump()
+
+
+@receiver(pre_save, sender=Poste)
+def remember_poste_bo(sender, instance, **kwargs):
+    instance._previous_bo = (
+        Poste.objects.filter(pk=instance.pk).values_list('base_operationnelle', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Poste)
+@receiver(post_delete, sender=Poste)
+def log_poste_change(sender, instance, **kwargs):
+    ChangeLog.record(ChangeLog.entries_for(
+        ChangeLog.POSTE, instance.pk,
+        getattr(instance, '_previous_bo', None), instance.base_operationnelle
+    ))
+
+
+@receiver(post_delete, sender=Concentrateur)
+def log_concentrateur_delete(sender, instance, **kwargs):
+    ChangeLog.record(ChangeLog.entries_for_concentrateur(instance, instance.affectation))
+
+
+@receiver(pre_delete, sender=Carton)
+def remember_carton_concentrateurs(sender, instance, **kwargs):
+    # Detached (SET_NULL) before post_delete: read the scopes while they are linked
+    instance._concentrateurs = list(instance.concentrateurs.only('pk', 'carton_id', 'affectation'))
+
+
+@receiver(post_delete, sender=Carton)
+def log_carton_delete(sender, instance, **kwargs):
+    changes = []
+    for k in getattr(instance, '_concentrateurs', ()):
+        changes += ChangeLog.entries_for_concentrateur(k, k.affectation)
+    ChangeLog.record(changes)
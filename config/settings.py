@@ -45,11 +45,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -134,6 +136,23 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # orjson first so it stays the default; MessagePack is opt-in via Accept
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'TEST_REQUEST_RENDERER_CLASSES': [
+        'rest_framework.renderers.MultiPartRenderer',
+        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
@@ -157,6 +176,40 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Historique rows older than this many months (current month included)
+# are moved to HistoriqueArchive by manage.py archive_historique
+HISTORIQUE_HOT_MONTHS = int(os.getenv('HISTORIQUE_HOT_MONTHS', '6'))
+
+# Daily inventory snapshots (manage.py snapshot_inventory) older than this
+# many days are pruned, except the first snapshot of each month
+INVENTORY_SNAPSHOT_KEEP_DAYS = int(os.getenv('INVENTORY_SNAPSHOT_KEEP_DAYS', '90'))
+
+# Offline sync (see services/sync.py): ChangeLog ids are allocated at insert,
+# not at commit, so each delta re-reads the entries logged this many
+# seconds before the cursor to catch those committed late
+SYNC_SAFETY_SECONDS = int(os.getenv('SYNC_SAFETY_SECONDS', '60'))
+
+# Carton replenishment (see services/forecasting.py): days between an
+# order and the cartons reaching the BO, and days of poses an order covers
+REPLENISHMENT_LEAD_DAYS = int(os.getenv('REPLENISHMENT_LEAD_DAYS', '7'))
+REPLENISHMENT_COVER_DAYS = int(os.getenv('REPLENISHMENT_COVER_DAYS', '28'))
+
+# Request profiling (see services/profiling.py): off unless PROFILE_REQUESTS=True,
+# except for staff users sending the X-Profile: 1 header
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'False').lower() == 'true'
+PROFILE_THRESHOLD_MS = float(os.getenv('PROFILE_THRESHOLD_MS', '2000'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', BASE_DIR / 'profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# Slow-query capture (see services/slow_queries.py): off unless SLOW_QUERY_MS > 0.
+# Query parameters are only logged with SLOW_QUERY_LOG_PARAMS=True; the log is
+# rotated (one .1 backup) past SLOW_QUERY_LOG_MAX_BYTES
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_LOG = Path(os.getenv('SLOW_QUERY_LOG', BASE_DIR / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_PARAMS = os.getenv('SLOW_QUERY_LOG_PARAMS', 'False').lower() == 'true'
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -166,14 +219,28 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'structured': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+        },
     },
     'loggers': {
+        # One JSON line per request (apps.core.middleware)
+        'apps.core.middleware': {
+            'handlers': ['requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'apps': {
             'handlers': ['console'],
             'level': 'DEBUG' if DEBUG else 'INFO',
@@ -5,8 +5,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from apps.core.views import ProfileListView, ProfileDetailView
+
 urlpatterns = [
-    # Admin
+    # Admin (request profiles first: admin/ would catch them)
+    path('admin/profiles/', admin.site.admin_view(ProfileListView.as_view()), name='admin-profiles'),
+    path('admin/profiles/<str:profile_id>/', admin.site.admin_view(ProfileDetailView.as_view()),
+         name='admin-profile-detail'),
     path('admin/', admin.site.urls),
     
     # Authentication
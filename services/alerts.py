@@ -0,0 +1,158 @@
+"""
+Incremental alert engine (AlertRule / Alert).
+
+Transitions call ``on_transition()`` with the Historique rows they just
+wrote: only the active rules whose scope (affectation, état, opérateur)
+was touched are evaluated, with one grouped count and at most one
+grouped backlog query whatever their number. A breached rule without an
+open Alert opens one, an open Alert whose rule is satisfied again is
+closed, and open alerts whose value moved are refreshed.
+
+``evaluate()`` checks every rule: ``manage.py evaluate_alerts`` runs it
+periodically, since a backlog ages without any transition, and after
+bulk imports.
+"""
+from datetime import datetime
+from typing import Any, Iterable
+
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from apps.inventory.models import Concentrateur
+from apps.tracking.models import Alert, AlertRule, LifecycleStage
+
+SCOPE = ('affectation', 'etat', 'operateur')
+
+
+def _message(rule: AlertRule, value: int) -> str:
+    if rule.kind == AlertRule.Kind.BACKLOG_AGE:
+        return f"Backlog {rule.scope} : le plus ancien K attend depuis {value} jours"
+    if rule.kind == AlertRule.Kind.STOCK_MAX:
+        return f"Stock élevé sur {rule.scope} ({value} unités)"
+    return f"Stock faible sur {rule.scope} ({value} unités)"
+
+
+def _matches(rule: AlertRule, affectation: str, etat: str, operateur: str) -> bool:
+    return all(not wanted or wanted == actual for wanted, actual in zip(
+        (rule.affectation, rule.etat, rule.operateur), (affectation, etat, operateur)
+    ))
+
+
+def _values(rules: list[AlertRule], now: datetime) -> dict[int, int]:
+    """Current value of each rule: K count, or age in days of the oldest K in scope."""
+    values = {}
+    counted = [rule for rule in rules if rule.kind != AlertRule.Kind.BACKLOG_AGE]
+    if counted:
+        affectations = {rule.affectation for rule in counted}
+        queryset = Concentrateur.objects.order_by()
+        if '' not in affectations:
+            queryset = queryset.filter(affectation__in=affectations)
+        groups = list(queryset.values_list(*SCOPE).annotate(n=Count('id')))
+        for rule in counted:
+            values[rule.pk] = sum(n for *scope, n in groups if _matches(rule, *scope))
+
+    backlogs = [rule for rule in rules if rule.kind == AlertRule.Kind.BACKLOG_AGE]
+    if backlogs:
+        etats = {rule.etat for rule in backlogs}
+        queryset = LifecycleStage.objects.filter(left_at__isnull=True).order_by()
+        if '' not in etats:
+            queryset = queryset.filter(etat__in=etats)
+        groups = list(queryset.values_list('affectation', 'etat', 'concentrateur__operateur')
+                      .annotate(oldest=Min('entered_at')))
+        for rule in backlogs:
+            oldest = min((oldest for *scope, oldest in groups if _matches(rule, *scope)), default=None)
+            values[rule.pk] = (now - oldest).days if oldest else 0
+    return values
+
+
+def _breached(rule: AlertRule, value: int) -> bool:
+    if not rule.active:
+        return False
+    if rule.kind == AlertRule.Kind.STOCK_MIN:
+        return value < rule.threshold
+    return value > rule.threshold
+
+
+def evaluate(rules: Iterable[AlertRule] | None = None) -> dict[str, int]:
+    """
+    Evaluate ``rules`` (default: all) and open, refresh or close their
+    alerts.
+
+    Returns:
+        Number of alerts ``opened``, ``refreshed`` and ``closed``
+    """
+    queryset = AlertRule.objects.all() if rules is None else AlertRule.objects.filter(
+        pk__in=[rule.pk for rule in rules]
+    )
+    return _apply(list(_with_open_alert(queryset)))
+
+
+def on_transition(historiques: list) -> dict[str, int]:
+    """
+    Evaluate the active rules (and those with an open alert) whose scope
+    the transitions recorded in ``historiques`` touched.
+    """
+    if not historiques:
+        return {'opened': 0, 'refreshed': 0, 'closed': 0}
+    affectations, etats, operateurs = set(), set(), set()
+    for h in historiques:
+        k = h.concentrateur
+        # Before and after values when the row records the change, else the current one
+        affectations |= {h.ancienne_affectation, h.nouvelle_affectation} \
+            if h.ancienne_affectation or h.nouvelle_affectation else {k.affectation}
+        etats |= {h.ancien_etat, h.nouvel_etat} if h.ancien_etat or h.nouvel_etat else {k.etat}
+        operateurs.add(k.operateur)
+    queryset = AlertRule.objects.filter(
+        Q(affectation='') | Q(affectation__in=affectations),
+        Q(etat='') | Q(etat__in=etats),
+        Q(operateur='') | Q(operateur__in=operateurs),
+    )
+    return _apply([rule for rule in _with_open_alert(queryset) if rule.active or rule.open_alert])
+
+
+def _with_open_alert(queryset):
+    open_alerts = Alert.objects.filter(rule=OuterRef('pk'), closed_at__isnull=True)
+    return queryset.annotate(
+        open_alert=Subquery(open_alerts.values('pk')[:1]),
+        open_value=Subquery(open_alerts.values('value')[:1]),
+    )
+
+
+def _apply(rules: list[AlertRule]) -> dict[str, int]:
+    now = timezone.now()
+    values = _values([rule for rule in rules if rule.active], now) if rules else {}
+    opened, refreshed, closed = [], [], []
+    for rule in rules:
+        value = values.get(rule.pk, 0)
+        breached = _breached(rule, value)
+        if breached and rule.open_alert is None:
+            opened.append(Alert(rule=rule, value=value, message=_message(rule, value), opened_at=now))
+        elif breached and value != rule.open_value:
+            refreshed.append(Alert(pk=rule.open_alert, value=value, message=_message(rule, value)))
+        elif not breached and rule.open_alert is not None:
+            closed.append(rule.open_alert)
+
+    if closed:
+        Alert.objects.filter(pk__in=closed).update(closed_at=now)
+    if refreshed:
+        Alert.objects.bulk_update(refreshed, ['value', 'message'])
+    if opened:
+        # A concurrent transition may have opened the same alert since the
+        # read: unique_open_alert keeps one, and the transition must not fail
+        Alert.objects.bulk_create(opened, ignore_conflicts=True)
+    return {'opened': len(opened), 'refreshed': len(refreshed), 'closed': len(closed)}
+
+
+def active_alerts() -> list[dict[str, Any]]:
+    """Open alerts in the dashboard format, oldest first."""
+    return [
+        {
+            'type': alert.rule.severity,
+            'title': alert.rule.name,
+            'message': alert.message,
+            'location': alert.rule.affectation,
+            'value': alert.value,
+            'opened_at': alert.opened_at,
+        }
+        for alert in Alert.objects.filter(closed_at__isnull=True).select_related('rule').order_by('opened_at')
+    ]
@@ -0,0 +1,92 @@
+"""
+Raw bulk inserts for generated or back-filled rows.
+
+Unlike ``bulk_create()``, values are written exactly as given: no model
+instances, no ``auto_now`` / ``auto_now_add`` override (so historical
+timestamps survive) and no signals. PostgreSQL gets ``COPY FROM STDIN``,
+other backends a batched ``executemany``.
+"""
+import csv
+import functools
+import io
+import itertools
+from collections.abc import Iterable
+
+from django.db import connection, models
+from django.utils.duration import duration_microseconds
+
+BATCH_SIZE = 10000
+
+
+def _interval(value) -> str:
+    return f'{duration_microseconds(value)} microseconds'
+
+
+def _converters(model, fields: list[str]) -> list:
+    """Per-column DB adapters for date/datetime/duration values (None elsewhere)."""
+    converters = []
+    for name in fields:
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateTimeField):
+            converters.append(connection.ops.adapt_datetimefield_value)
+        elif isinstance(field, models.DateField):
+            converters.append(connection.ops.adapt_datefield_value)
+        elif isinstance(field, models.DurationField):
+            # COPY reads interval text, the other backends the field's own encoding
+            converters.append(
+                _interval if connection.vendor == 'postgresql'
+                else functools.partial(field.get_db_prep_value, connection=connection)
+            )
+        else:
+            converters.append(None)
+    return converters
+
+
+def _copy(cursor, table: str, columns: list[str], batch: list[tuple]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    if hasattr(cursor.cursor, 'copy_expert'):
+        cursor.cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def insert_rows(model, fields: list[str], rows: Iterable[tuple], batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert ``rows`` (tuples ordered like ``fields``) into ``model``'s table.
+    
+    Foreign keys are given by id under the field name (``'carton'``).
+    
+    Returns:
+        Number of rows inserted
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [qn(model._meta.get_field(name).column) for name in fields]
+    converters = _converters(model, fields)
+    needs_conversion = any(converters)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    
+    rows = iter(rows)
+    total = 0
+    with connection.cursor() as cursor:
+        while batch := list(itertools.islice(rows, batch_size)):
+            if needs_conversion:
+                batch = [
+                    tuple(
+                        convert(value) if convert and value is not None else value
+                        for convert, value in zip(converters, row)
+                    )
+                    for row in batch
+                ]
+            if connection.vendor == 'postgresql':
+                _copy(cursor, table, columns, batch)
+            else:
+                cursor.executemany(sql, batch)
+            total += len(batch)
+    return total
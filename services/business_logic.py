@@ -5,6 +5,8 @@ All state changes must go through this service to ensure:
 1. Proper permission checks
 2. Atomic transactions
 3. Audit trail creation
+4. Lifecycle stage bookkeeping (services/lifecycle.py)
+5. Alert rules evaluation for the touched scopes (services/alerts.py)
 """
 import logging
 from typing import Any
@@ -13,8 +15,10 @@ from django.db import transaction
 from django.utils import timezone
 
 from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
-from apps.tracking.models import Historique, ActionType
+from apps.tracking.models import Historique, ActionType, DataVersion, ChangeLog
 from apps.core.models import User
+from services import alerts, lifecycle
+from services.query_budget import query_budget
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +41,7 @@ class ConcentrateurService:
     
     # === PROFIL MAGASIN ===
     @classmethod
+    @query_budget(11)
     @transaction.atomic
     def reception_carton(cls, num_carton: str, user: User) -> dict[str, Any]:
         """
@@ -55,31 +60,41 @@ class ConcentrateurService:
         if not (user.is_magasin or user.is_admin_profile):
             raise PermissionError("Action réservée au profil Magasin")
         
-        concentrateurs = Concentrateur.objects.filter(
+        concentrateurs = list(Concentrateur.objects.filter(
             carton__num_carton=num_carton,
             etat=Etat.EN_LIVRAISON
-        ).select_for_update()
+        ).select_for_update())
         
-        if not concentrateurs.exists():
+        if not concentrateurs:
             raise TransitionError(f"Aucun concentrateur en livraison trouvé pour le carton {num_carton}")
         
+        # One UPDATE and one INSERT whatever the carton size
+        Concentrateur.objects.filter(pk__in=[k.pk for k in concentrateurs]).update(
+            etat=Etat.EN_STOCK,
+            affectation=Affectation.MAGASIN,
+            date_dernier_etat=timezone.localdate(),
+            updated_at=timezone.now()
+        )
+        
         updated = []
+        changes = []
+        historiques = []
         for k in concentrateurs:
-            ancien_etat = k.etat
-            ancienne_affectation = k.affectation
-            k.etat = Etat.EN_STOCK
-            k.affectation = Affectation.MAGASIN
-            k.save()
-            
-            cls._create_historique(
+            changes += ChangeLog.entries_for_concentrateur(k, k.affectation, Affectation.MAGASIN)
+            historiques.append(cls._build_historique(
                 k, user, ActionType.RECEPTION,
-                ancien_etat=ancien_etat,
+                ancien_etat=k.etat,
                 nouvel_etat=Etat.EN_STOCK,
-                ancienne_affectation=ancienne_affectation,
+                ancienne_affectation=k.affectation,
                 nouvelle_affectation=Affectation.MAGASIN
-            )
+            ))
             updated.append(k.n_serie)
         
+        historiques = Historique.objects.bulk_create(historiques)
+        lifecycle.record(historiques)
+        alerts.on_transition(historiques)
+        ChangeLog.record(changes)
+        DataVersion.bump()
         logger.info(f"Réception carton {num_carton}: {len(updated)} concentrateurs par {user.username}")
         
         return {
@@ -90,6 +105,7 @@ class ConcentrateurService:
 
     # === PROFIL BO COMMANDE ===
     @classmethod
+    @query_budget(14)
     @transaction.atomic
     def commander_cartons(cls, operateur: str, nb_cartons: int, user: User) -> dict[str, Any]:
         """
@@ -124,35 +140,49 @@ class ConcentrateurService:
             ))
         ).filter(nb_k_dispo__gte=4).order_by('-created_at')[:nb_cartons]
         
-        result = {'cartons': [], 'total_k': 0}
+        cartons = list(cartons_dispo)
+        concentrateurs = list(Concentrateur.objects.filter(
+            carton__in=cartons,
+            affectation=Affectation.MAGASIN,
+            etat=Etat.EN_STOCK
+        ).select_for_update())
+        
+        # One UPDATE and one INSERT whatever the number of cartons
+        today = timezone.localdate()
+        Concentrateur.objects.filter(pk__in=[k.pk for k in concentrateurs]).update(
+            affectation=bo,
+            date_affectation=today,
+            date_dernier_etat=today,
+            updated_at=timezone.now()
+        )
         
-        for carton in cartons_dispo:
-            k_list = carton.concentrateurs.filter(
-                affectation=Affectation.MAGASIN,
-                etat=Etat.EN_STOCK
-            ).select_for_update()
-            
-            for k in k_list:
-                ancienne_affectation = k.affectation
-                k.affectation = bo
-                k.date_affectation = timezone.now().date()
-                k.save()
-                
-                cls._create_historique(
-                    k, user, ActionType.COMMANDE_BO,
-                    ancienne_affectation=ancienne_affectation,
-                    nouvelle_affectation=bo
-                )
-            
-            result['cartons'].append(carton.num_carton)
-            result['total_k'] += k_list.count()
+        changes = []
+        historiques = []
+        for k in concentrateurs:
+            changes += ChangeLog.entries_for_concentrateur(k, k.affectation, bo)
+            historiques.append(cls._build_historique(
+                k, user, ActionType.COMMANDE_BO,
+                ancienne_affectation=k.affectation,
+                nouvelle_affectation=bo
+            ))
+        historiques = Historique.objects.bulk_create(historiques)
+        lifecycle.record(historiques)
+        alerts.on_transition(historiques)
+        
+        result = {
+            'cartons': [carton.num_carton for carton in cartons],
+            'total_k': len(concentrateurs)
+        }
         
+        ChangeLog.record(changes)
+        DataVersion.bump()
         logger.info(f"Commande {nb_cartons} cartons {operateur} → {bo} par {user.username}: {result['total_k']} K")
         
         return result
 
     # === PROFIL BO TERRAIN (POSE) ===
     @classmethod
+    @query_budget(15)
     @transaction.atomic
     def poser_concentrateur(cls, n_serie: str, poste_id: int, user: User) -> dict[str, Any]:
         """
@@ -213,13 +243,17 @@ class ConcentrateurService:
         k.date_pose = timezone.now().date()
         k.save()
         
-        cls._create_historique(
+        historique = cls._create_historique(
             k, user, ActionType.POSE,
             ancien_etat=ancien_etat,
             nouvel_etat=Etat.POSE,
             poste=poste.code
         )
+        lifecycle.record([historique])
+        alerts.on_transition([historique])
         
+        ChangeLog.record(ChangeLog.entries_for_concentrateur(k, k.affectation))
+        DataVersion.bump()
         logger.info(f"Pose {n_serie} sur {poste.code} par {user.username}")
         
         return {
@@ -230,6 +264,7 @@ class ConcentrateurService:
 
     # === PROFIL BO TERRAIN (DEPOSE) ===
     @classmethod
+    @query_budget(15)
     @transaction.atomic
     def deposer_concentrateur(cls, poste_id: int, n_serie: str, user: User) -> dict[str, Any]:
         """
@@ -276,7 +311,7 @@ class ConcentrateurService:
         k.date_pose = None
         k.save()
         
-        cls._create_historique(
+        historique = cls._create_historique(
             k, user, ActionType.DEPOSE,
             ancien_etat=ancien_etat,
             nouvel_etat=Etat.A_TESTER,
@@ -284,7 +319,11 @@ class ConcentrateurService:
             nouvelle_affectation=Affectation.LABO,
             poste=poste_code
         )
+        lifecycle.record([historique])
+        alerts.on_transition([historique])
         
+        ChangeLog.record(ChangeLog.entries_for_concentrateur(k, ancienne_affectation, k.affectation))
+        DataVersion.bump()
         logger.info(f"Dépose {n_serie} de {poste_code} → Labo par {user.username}")
         
         return {
@@ -295,6 +334,7 @@ class ConcentrateurService:
 
     # === PROFIL LABO ===
     @classmethod
+    @query_budget(29)
     @transaction.atomic
     def tester_concentrateur(cls, n_serie: str, resultat_ok: bool, user: User) -> dict[str, Any]:
         """
@@ -331,6 +371,7 @@ class ConcentrateurService:
         
         ancien_etat = k.etat
         ancienne_affectation = k.affectation
+        ancien_carton_id = k.carton_id
         operateur = k.operateur
         
         if resultat_ok:
@@ -345,14 +386,20 @@ class ConcentrateurService:
         
         k.save()
         
-        cls._create_historique(
+        historique = cls._create_historique(
             k, user, action,
             ancien_etat=ancien_etat,
             nouvel_etat=k.etat,
             ancienne_affectation=ancienne_affectation,
             nouvelle_affectation=k.affectation
         )
+        lifecycle.record([historique])
+        alerts.on_transition([historique])
         
+        ChangeLog.record(ChangeLog.entries_for_concentrateur(
+            k, ancienne_affectation, k.affectation, carton_ids=(ancien_carton_id,)
+        ))
+        DataVersion.bump()
         result_str = 'OK' if resultat_ok else 'HS'
         logger.info(f"Test {n_serie}: {result_str} par {user.username}")
         
@@ -427,20 +474,26 @@ class ConcentrateurService:
         
         # Assigner les 4 K au carton et passer en livraison
         n_series = []
+        changes = []
+        historiques = []
         for k in concentrateurs:
             ancien_etat = k.etat
             k.carton = carton
             k.etat = Etat.EN_LIVRAISON
             k.save()
             n_series.append(k.n_serie)
+            changes += ChangeLog.entries_for_concentrateur(k, k.affectation)
             
-            cls._create_historique(
+            historiques.append(cls._create_historique(
                 k, user, ActionType.RECONDITIONNEMENT,
                 ancien_etat=ancien_etat,
                 nouvel_etat=Etat.EN_LIVRAISON,
                 commentaire=f"Assigné au carton reconditionné {num_carton}"
-            )
+            ))
         
+        lifecycle.record(historiques)
+        alerts.on_transition(historiques)
+        ChangeLog.record(changes)
         logger.info(f"Carton reconditionné créé: {num_carton} avec {len(n_series)} K par système")
         
         return {
@@ -452,7 +505,7 @@ class ConcentrateurService:
 
     # === HELPERS ===
     @classmethod
-    def _create_historique(
+    def _build_historique(
         cls,
         k: Concentrateur,
         user: User,
@@ -464,8 +517,8 @@ class ConcentrateurService:
         poste: str = '',
         commentaire: str = ''
     ) -> Historique:
-        """Create an audit trail entry for a concentrator action."""
-        return Historique.objects.create(
+        """Unsaved audit trail entry, for ``bulk_create()``."""
+        return Historique(
             concentrateur=k,
             action=action,
             user=user,
@@ -476,3 +529,10 @@ class ConcentrateurService:
             poste=poste,
             commentaire=commentaire
         )
+    
+    @classmethod
+    def _create_historique(cls, k: Concentrateur, user: User, action: str, **fields) -> Historique:
+        """Create an audit trail entry for a concentrator action."""
+        historique = cls._build_historique(k, user, action, **fields)
+        historique.save()
+        return historique
@@ -0,0 +1,102 @@
+"""
+Streaming CSV / NDJSON exports of the inventory and the audit trail.
+
+Rows are fetched with ``QuerySet.iterator()`` (server-side cursor on
+PostgreSQL) and emitted in chunks, so memory stays flat whatever the
+table size. The concentrateur CSV uses the ``;``-separated layout of
+BDD_defi_EDF.csv: re-importing it with ``import_csv`` changes nothing.
+"""
+import csv
+import io
+import itertools
+from collections.abc import Callable, Iterator
+from datetime import date
+
+import orjson
+
+CHUNK_SIZE = 2000
+
+FORMATS = ('csv', 'ndjson')
+
+
+def _fr_date(value: date | None) -> str:
+    return value.strftime('%d/%m/%Y') if value else ''
+
+
+def _iso(value) -> str:
+    return value.isoformat() if value else ''
+
+
+# (column header, values() lookup, CSV formatter)
+CONCENTRATEUR_COLUMNS: list[tuple[str, str, Callable | None]] = [
+    ('num_carton', 'carton__num_carton', None),
+    ('operateur', 'operateur', None),
+    ('n_serie_concentrateur', 'n_serie', None),
+    ('affectation', 'affectation', None),
+    ('etat', 'etat', None),
+    ('poste_pose', 'poste_pose__code', None),
+    ('date_affectation', 'date_affectation', _fr_date),
+    ('date_pose', 'date_pose', _fr_date),
+    ('date_dernier_etat', 'date_dernier_etat', _fr_date),
+]
+
+HISTORIQUE_COLUMNS: list[tuple[str, str, Callable | None]] = [
+    ('timestamp', 'timestamp', _iso),
+    ('n_serie_concentrateur', 'concentrateur__n_serie', None),
+    ('action', 'action', None),
+    ('utilisateur', 'user__username', None),
+    ('ancien_etat', 'ancien_etat', None),
+    ('nouvel_etat', 'nouvel_etat', None),
+    ('ancienne_affectation', 'ancienne_affectation', None),
+    ('nouvelle_affectation', 'nouvelle_affectation', None),
+    ('poste', 'poste', None),
+    ('commentaire', 'commentaire', None),
+]
+
+
+def _iter_rows(queryset, columns, chunk_size: int) -> Iterator[tuple]:
+    """Rows of ``queryset``, or of each queryset of a list one after the other."""
+    lookups = [lookup for _, lookup, _ in columns]
+    querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+    return itertools.chain.from_iterable(
+        qs.values_list(*lookups).iterator(chunk_size=chunk_size) for qs in querysets
+    )
+
+
+def iter_csv(queryset, columns, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield the export as CSV text, one chunk of ``chunk_size`` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    formatters = [fmt for _, _, fmt in columns]
+    
+    writer.writerow([header for header, _, _ in columns])
+    for index, row in enumerate(_iter_rows(queryset, columns, chunk_size), start=1):
+        writer.writerow([
+            fmt(value) if fmt else ('' if value is None else value)
+            for fmt, value in zip(formatters, row)
+        ])
+        if index % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(queryset, columns, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the export as newline-delimited JSON (one object per row)."""
+    headers = [header for header, _, _ in columns]
+    lines = []
+    for row in _iter_rows(queryset, columns, chunk_size):
+        lines.append(orjson.dumps(dict(zip(headers, row))))
+        if len(lines) == chunk_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def iter_export(queryset, columns, fmt: str, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Dispatch to the CSV or NDJSON generator."""
+    if fmt == 'ndjson':
+        return iter_ndjson(queryset, columns, chunk_size)
+    return iter_csv(queryset, columns, chunk_size)
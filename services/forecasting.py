@@ -0,0 +1,188 @@
+"""
+Demand forecasting and carton replenishment per BO and opérateur.
+
+The consumption of a (BO, opérateur) pair is its daily number of poses,
+read from the StockLevel rollup (``entered`` of the ``pose`` rows) over
+the last HISTORY_DAYS. All the series are fitted at once with NumPy: an
+additive weekly-seasonal exponential smoothing (ETS(A,N,A)) run over a
+(smoothing constant × series) array, keeping per series the constant
+with the smallest one-step-ahead squared error.
+
+Forecasts only change when the rollup does: they are cached under the
+``stock_levels`` DataVersion. ``replenishment()`` combines them with the
+live BO stock for the order recommendation.
+"""
+import math
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from apps.inventory.models import Carton, Concentrateur, Affectation, Etat
+from apps.tracking.models import DataVersion, StockLevel
+
+BOS = (Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD)
+HISTORY_DAYS = 91
+SEASON = 7
+ALPHAS = np.linspace(0.05, 0.5, 10)
+GAMMA = 0.1
+# One-sided 95 % service level for the safety stock
+SERVICE_Z = 1.65
+# Concentrateurs per carton (commande and reconditionnement rule)
+K_PER_CARTON = 4
+CACHE_SECONDS = 24 * 3600
+
+
+def consumption(until: date, days: int = HISTORY_DAYS) -> tuple[list[tuple], np.ndarray]:
+    """
+    Daily poses per (BO, opérateur) over the ``days`` ending at ``until``.
+
+    Returns:
+        (keys, matrix): one row of ``matrix`` per key, one column per day
+    """
+    start = until - timedelta(days=days - 1)
+    rows = StockLevel.objects.filter(
+        day__gte=start, day__lte=until, etat=Etat.POSE, affectation__in=BOS, entered__gt=0
+    ).values_list('affectation', 'operateur', 'day', 'entered')
+    keys, index, cells = [], {}, []
+    for bo, operateur, day, entered in rows:
+        if (bo, operateur) not in index:
+            index[(bo, operateur)] = len(keys)
+            keys.append((bo, operateur))
+        cells.append((index[(bo, operateur)], (day - start).days, entered))
+    matrix = np.zeros((len(keys), days))
+    if cells:
+        series, column, values = np.array(cells).T
+        matrix[series, column] = values
+    return keys, matrix
+
+
+def fit(y: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Fit ETS(A,N,A) to every row of ``y`` (series × days) at once.
+
+    Each smoothing constant of ALPHAS is run over all the series in the
+    same array operations; the first season only initialises the state
+    and is not scored.
+
+    Returns:
+        Dict of per-series arrays: ``level``, ``season`` (SEASON values,
+        aligned on the day following the last one), ``alpha`` and
+        ``sigma`` (one-step-ahead error standard deviation)
+    """
+    n, days = y.shape
+    if days < 2 * SEASON:
+        raise ValueError(f"At least {2 * SEASON} days are needed to fit a weekly season")
+    alphas = ALPHAS[:, None]
+    level = np.broadcast_to(y[:, :SEASON].mean(axis=1), (len(ALPHAS), n)).copy()
+    season = np.broadcast_to(y[:, :SEASON] - level[0][:, None], (len(ALPHAS), n, SEASON)).copy()
+    sse = np.zeros((len(ALPHAS), n))
+    for t in range(SEASON, days):
+        phase = t % SEASON
+        error = y[:, t] - (level + season[:, :, phase])
+        sse += error ** 2
+        level += alphas * error
+        season[:, :, phase] += GAMMA * (1 - alphas) * error
+
+    best = sse.argmin(axis=0)
+    series = np.arange(n)
+    return {
+        'level': level[best, series],
+        # Rotate so that column 0 is the phase of the next day
+        'season': np.roll(season[best, series], -(days % SEASON), axis=1),
+        'alpha': ALPHAS[best],
+        'sigma': np.sqrt(sse[best, series] / (days - SEASON)),
+    }
+
+
+def predict(model: dict[str, np.ndarray], horizon: int) -> np.ndarray:
+    """Daily forecasts (series × ``horizon``), never negative."""
+    phases = np.arange(horizon) % SEASON
+    return np.clip(model['level'][:, None] + model['season'][:, phases], 0, None)
+
+
+def forecasts(until: date, horizon: int) -> dict[str, Any]:
+    """
+    Fitted models and ``horizon`` days of forecasts for every series,
+    from the rollup ending at ``until``; cached until the next rollup.
+    """
+    version = DataVersion.current(DataVersion.STOCK_LEVELS)
+    stamp = version.updated_at.timestamp() if version.updated_at else 0
+    key = f'forecasting:{version.version}:{stamp}:{until.isoformat()}:{horizon}'
+    result = cache.get(key)
+    if result is None:
+        keys, y = consumption(until)
+        model = fit(y) if keys else {name: np.zeros(0) for name in ('level', 'alpha', 'sigma')}
+        result = {
+            'until': until,
+            'keys': keys,
+            'history': y.sum(axis=1),
+            'forecast': predict(model, horizon) if keys else np.zeros((0, horizon)),
+            'alpha': model['alpha'],
+            'sigma': model['sigma'],
+        }
+        cache.set(key, result, CACHE_SECONDS)
+    return result
+
+
+def replenishment(today: date, bo: str | None = None) -> list[dict[str, Any]]:
+    """
+    Order recommendation per (BO, opérateur): days until the BO stock
+    runs out at the forecast pace, the last day to order given the
+    REPLENISHMENT_LEAD_DAYS, and the cartons to order to cover
+    REPLENISHMENT_COVER_DAYS more plus a safety stock.
+    """
+    lead, cover = settings.REPLENISHMENT_LEAD_DAYS, settings.REPLENISHMENT_COVER_DAYS
+    horizon = lead + cover
+    result = forecasts(today - timedelta(days=1), horizon)
+    keys = sorted(result['keys'])
+    if bo is not None:
+        keys = [key for key in keys if key[0] == bo]
+    if not keys:
+        return []
+
+    stock = {
+        (row['affectation'], row['operateur']): row['n']
+        for row in Concentrateur.objects.filter(etat=Etat.EN_STOCK, affectation__in=BOS)
+        .values('affectation', 'operateur').annotate(n=Count('id')).order_by()
+    }
+    available = dict(
+        Carton.objects.annotate(dispo=Count('concentrateurs', filter=Q(
+            concentrateurs__affectation=Affectation.MAGASIN, concentrateurs__etat=Etat.EN_STOCK
+        ))).filter(dispo__gte=K_PER_CARTON).order_by().values('operateur')
+        .annotate(n=Count('id')).values_list('operateur', 'n')
+    )
+
+    index = {key: i for i, key in enumerate(result['keys'])}
+    rows = [index[key] for key in keys]
+    forecast = result['forecast'][rows]
+    on_hand = np.array([stock.get(key, 0) for key in keys])
+    demand = forecast.cumsum(axis=1)
+    runs_out = demand > on_hand[:, None]
+    days_left = np.where(runs_out.any(axis=1), runs_out.argmax(axis=1), -1)
+    safety = SERVICE_Z * result['sigma'][rows] * math.sqrt(lead)
+    needed = np.ceil((demand[:, -1] + safety - on_hand) / K_PER_CARTON).clip(0).astype(int)
+
+    recommendations = []
+    for i, (key_bo, operateur) in enumerate(keys):
+        order_by = None
+        if days_left[i] >= 0:
+            order_by = today + timedelta(days=max(0, int(days_left[i]) - lead))
+        elif demand[i, lead - 1] + safety[i] > on_hand[i]:
+            # The safety stock is reached within the lead time
+            order_by = today
+        recommendations.append({
+            'bo': key_bo,
+            'operateur': operateur,
+            'stock': int(on_hand[i]),
+            'daily_forecast': round(float(forecast[i].mean()), 2),
+            'poses_history': int(result['history'][rows[i]]),
+            'days_remaining': int(days_left[i]) if days_left[i] >= 0 else None,
+            'order_by': order_by,
+            'cartons': int(needed[i]) if order_by else 0,
+            'cartons_available': available.get(operateur, 0),
+        })
+    return recommendations
@@ -0,0 +1,260 @@
+"""
+Lifecycle stage visits (LifecycleStage), the fact table behind the
+cycle-time KPIs.
+
+A stage is an (état, affectation) pair, plus the poste while posé. Each
+transition closes the open stage of the K and opens the next one:
+``record()`` is called by ConcentrateurService with the Historique rows
+it just wrote, ``rebuild()`` recomputes the table from the whole
+Historique (``manage.py rebuild_lifecycle``). The stage a K was in
+before its first recorded transition starts at its ``created_at``:
+the imports open it with ``open_initial()`` when they create the K.
+"""
+from datetime import datetime, timedelta
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Window
+from django.db.models.functions import RowNumber
+
+from apps.core.models import User
+from apps.inventory.models import Concentrateur, Poste, Affectation, Etat
+from apps.tracking.models import ActionType, LifecycleStage
+from services.bulk import BATCH_SIZE, insert_rows
+from services.snapshots import CHUNK_SIZE, iter_events
+
+BOS = (Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD)
+PERCENTILES = (50, 90)
+
+# Model attributes of a stage, and the same as insert_rows() field names
+STAGE_FIELDS = (
+    'concentrateur_id', 'etat', 'affectation', 'poste', 'bo', 'user_id',
+    'entered_at', 'left_at', 'duration', 'cycle_started_at',
+)
+INSERT_FIELDS = [field.removesuffix('_id') for field in STAGE_FIELDS]
+
+REBUILD_FIELDS = (
+    'concentrateur_id', 'action', 'ancien_etat', 'nouvel_etat',
+    'ancienne_affectation', 'nouvelle_affectation', 'poste', 'user_id', 'timestamp',
+)
+
+
+def _initial(event: tuple, etat: str, affectation: str, entered_at: datetime) -> dict[str, Any]:
+    """Stage left by the first recorded ``event`` of a K; live values fill what it does not say."""
+    k_id, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste = event[:7]
+    return {
+        'concentrateur_id': k_id,
+        'etat': ancien_etat if ancien_etat or nouvel_etat else etat,
+        'affectation': ancienne_affectation if ancienne_affectation or nouvelle_affectation else affectation,
+        'poste': poste if action == ActionType.DEPOSE else '',
+        'bo': '',
+        'user_id': None,
+        'entered_at': entered_at,
+        'left_at': None,
+        'duration': None,
+        'cycle_started_at': None,
+    }
+
+
+def _enter(previous: dict, event: tuple, user_bo: str, at: datetime) -> dict[str, Any] | None:
+    """Stage entered through ``event`` from ``previous``, or None if it stays put."""
+    k_id, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste, user_id = event[:8]
+    etat = nouvel_etat if ancien_etat or nouvel_etat else previous['etat']
+    affectation = nouvelle_affectation if ancienne_affectation or nouvelle_affectation else previous['affectation']
+    if (etat, affectation) == (previous['etat'], previous['affectation']) \
+            and action not in (ActionType.POSE, ActionType.DEPOSE):
+        return None
+    return {
+        'concentrateur_id': k_id,
+        'etat': etat,
+        'affectation': affectation,
+        'poste': poste if etat == Etat.POSE else '',
+        'bo': affectation if affectation in BOS else user_bo or '',
+        'user_id': user_id,
+        'entered_at': at,
+        'left_at': None,
+        'duration': None,
+        'cycle_started_at': at if action == ActionType.RECEPTION else previous['cycle_started_at'],
+    }
+
+
+def open_initial(concentrateurs: list) -> list[LifecycleStage]:
+    """
+    Open the first stage of newly created K, at their ``created_at``.
+
+    Without it the first ``record()`` of a K inserts that stage
+    backdated, into days the StockLevel rollup has already counted.
+    """
+    codes = {}
+    posted = {k.poste_pose_id for k in concentrateurs if k.etat == Etat.POSE and k.poste_pose_id}
+    if posted:
+        codes = dict(Poste.objects.filter(pk__in=posted).values_list('id', 'code'))
+    return LifecycleStage.objects.bulk_create([
+        LifecycleStage(
+            concentrateur_id=k.pk,
+            etat=k.etat,
+            affectation=k.affectation,
+            poste=codes.get(k.poste_pose_id, '') if k.etat == Etat.POSE else '',
+            bo=k.affectation if k.affectation in BOS else '',
+            entered_at=k.created_at,
+        )
+        for k in concentrateurs
+    ])
+
+
+def record(historiques: list) -> list[LifecycleStage]:
+    """
+    Move the K of ``historiques`` (saved Historique rows, at most one per
+    K, with ``concentrateur`` set) to their next stage: one SELECT, one
+    UPDATE and one INSERT whatever their number.
+    """
+    if not historiques:
+        return []
+    current = {
+        stage.concentrateur_id: stage
+        for stage in LifecycleStage.objects.filter(
+            concentrateur_id__in=[h.concentrateur_id for h in historiques], left_at__isnull=True
+        )
+    }
+    closed, stages = [], []
+    for h in historiques:
+        at = h.timestamp
+        event = (
+            h.concentrateur_id, h.action, h.ancien_etat, h.nouvel_etat,
+            h.ancienne_affectation, h.nouvelle_affectation, h.poste, h.user_id,
+        )
+        stage = current.get(h.concentrateur_id)
+        if stage is not None:
+            previous = {field: getattr(stage, field) for field in STAGE_FIELDS}
+        else:
+            k = h.concentrateur
+            previous = _initial(event, k.etat, k.affectation, min(k.created_at, at))
+        following = _enter(previous, event, h.user.base_operationnelle if h.user else '', at)
+        if following is None:
+            continue
+        if stage is None:
+            stage = LifecycleStage(**previous)
+            stages.append(stage)
+        else:
+            closed.append(stage)
+        stage.left_at = at
+        stage.duration = at - stage.entered_at
+        stages.append(LifecycleStage(**following))
+
+    LifecycleStage.objects.bulk_update(closed, ['left_at', 'duration'])
+    return LifecycleStage.objects.bulk_create(stages)
+
+
+def rebuild(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Recompute the whole table from the Historique (archive included).
+
+    Events are streamed in timestamp order and only the open stage of
+    each K is kept in memory; closed stages are written as they come
+    with raw bulk inserts.
+
+    Returns:
+        Number of stages written
+    """
+    # base_operationnelle is derived from the profil
+    user_bo = {pk: User(profil=profil).base_operationnelle for pk, profil in User.objects.values_list('id', 'profil')}
+    live = {
+        pk: (created_at, etat, affectation, poste or '')
+        for pk, created_at, etat, affectation, poste in Concentrateur.objects.order_by()
+        .values_list('id', 'created_at', 'etat', 'affectation', 'poste_pose__code').iterator(chunk_size=CHUNK_SIZE)
+    }
+
+    def stages():
+        open_stages = {}
+        for event in iter_events(fields=REBUILD_FIELDS):
+            k_id, timestamp = event[0], event[-1]
+            previous = open_stages.get(k_id)
+            if previous is None:
+                if k_id not in live:
+                    continue
+                created_at, etat, affectation, _ = live[k_id]
+                previous = _initial(event, etat, affectation, min(created_at, timestamp))
+            following = _enter(previous, event, user_bo.get(event[7]), timestamp)
+            if following is None:
+                continue
+            previous.update(left_at=timestamp, duration=timestamp - previous['entered_at'])
+            yield tuple(previous[field] for field in STAGE_FIELDS)
+            open_stages[k_id] = following
+
+        for k_id, (created_at, etat, affectation, poste) in live.items():
+            stage = open_stages.pop(k_id, None) or {
+                'concentrateur_id': k_id, 'etat': etat, 'affectation': affectation,
+                'poste': poste if etat == Etat.POSE else '', 'bo': affectation if affectation in BOS else '',
+                'user_id': None, 'entered_at': created_at, 'left_at': None, 'duration': None,
+                'cycle_started_at': None,
+            }
+            yield tuple(stage[field] for field in STAGE_FIELDS)
+
+    with transaction.atomic():
+        LifecycleStage.objects.all().delete()
+        return insert_rows(LifecycleStage, INSERT_FIELDS, stages(), batch_size)
+
+
+# === KPIs ===
+
+def _hours(duration: timedelta | None) -> float | None:
+    return None if duration is None else round(duration.total_seconds() / 3600, 1)
+
+
+def _percentiles(queryset, percentile: int) -> dict[tuple, timedelta]:
+    """
+    Nearest-rank ``percentile`` of ``duration`` per (état, affectation),
+    in one query: the rows whose rank within their stage is
+    ``ceil(visits * percentile / 100)``.
+    """
+    stage = [F('etat'), F('affectation')]
+    position = F('visits') * percentile / 100.0
+    ranked = queryset.order_by().annotate(
+        rank=Window(RowNumber(), partition_by=stage, order_by=F('duration').asc()),
+        visits=Window(Count('id'), partition_by=stage),
+    ).filter(rank__gte=position, rank__lt=position + 1)
+    return {(etat, affectation): duration for etat, affectation, duration in
+            ranked.values_list('etat', 'affectation', 'duration')}
+
+
+def stage_stats(since: datetime) -> list[dict[str, Any]]:
+    """Visits, mean and percentile durations (hours) per stage, for stages left since ``since``."""
+    closed = LifecycleStage.objects.filter(left_at__gte=since)
+    groups = closed.values('etat', 'affectation').annotate(visits=Count('id'), mean=Avg('duration'))\
+        .order_by('etat', 'affectation')
+    percentiles = {percentile: _percentiles(closed, percentile) for percentile in PERCENTILES}
+    return [
+        {
+            'etat': group['etat'],
+            'affectation': group['affectation'],
+            'visits': group['visits'],
+            'mean_hours': _hours(group['mean']),
+            **{
+                f'p{percentile}_hours': _hours(values.get((group['etat'], group['affectation'])))
+                for percentile, values in percentiles.items()
+            },
+        }
+        for group in groups
+    ]
+
+
+def operator_stats(since: datetime) -> list[dict[str, Any]]:
+    """Stages entered per user and BO since ``since``, with their mean duration (hours)."""
+    rows = LifecycleStage.objects.filter(entered_at__gte=since, user__isnull=False)\
+        .values('user__username', 'bo').annotate(visits=Count('id'), mean=Avg('duration'))\
+        .order_by('user__username', 'bo')
+    return [
+        {'user': row['user__username'], 'bo': row['bo'], 'visits': row['visits'], 'mean_hours': _hours(row['mean'])}
+        for row in rows
+    ]
+
+
+def cycle_time(since: datetime) -> dict[str, Any]:
+    """Réception to pose, in days, over the poses since ``since``."""
+    poses = LifecycleStage.objects.filter(etat=Etat.POSE, entered_at__gte=since, cycle_started_at__isnull=False)\
+        .annotate(cycle=ExpressionWrapper(F('entered_at') - F('cycle_started_at'), output_field=DurationField()))
+    stats = poses.aggregate(count=Count('id'), mean=Avg('cycle'))
+    days = {'count': stats['count'], 'mean_days': None}
+    if stats['mean'] is not None:
+        days['mean_days'] = round(stats['mean'].total_seconds() / 86400, 1)
+    return days
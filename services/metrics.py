@@ -0,0 +1,154 @@
+"""
+Per-view request metrics, exported in the Prometheus text format.
+
+Filled by ``apps.core.middleware.RequestMetricsMiddleware`` and served by
+``GET /api/v1/metrics/`` (admin profile only). Counters live in the
+worker process: with several workers, each scrape sees one of them.
+"""
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+    
+    def __init__(self, name: str, documentation: str, buckets: tuple, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self._series = {}
+    
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series['buckets'][index] += 1
+        series['sum'] += value
+        series['count'] += 1
+    
+    def expose(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le=bound)} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le="+Inf")} {series["count"]}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+    
+    def inc(self, labels: tuple, amount: int = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def expose(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class SerializationTimer:
+    """
+    Sums the time spent building serializer ``.data`` during one request.
+    
+    The middleware enters it around the view; ``api.serializers.TimedSerializerMixin``
+    reports to the active timer (the time includes the lazy queries it triggers).
+    """
+    
+    _current = ContextVar('serialization_timer', default=None)
+    
+    def __init__(self):
+        self.seconds = 0.0
+    
+    def __enter__(self):
+        self._token = self._current.set(self)
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._current.reset(self._token)
+    
+    @classmethod
+    def add(cls, seconds: float):
+        timer = cls._current.get()
+        if timer is not None:
+            timer.seconds += seconds
+
+
+class RequestMetrics:
+    """All request metrics, guarded by one lock (observations are cheap)."""
+    
+    LABELS = ('view', 'method')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.requests = Counter('edf_requests_total', 'Requests by view, method and status.',
+                                ('view', 'method', 'status'))
+        self.duration = Histogram('edf_request_duration_seconds', 'Wall time per request.',
+                                  DURATION_BUCKETS, self.LABELS)
+        self.db_time = Histogram('edf_request_db_seconds', 'Time spent in SQL queries per request.',
+                                 DURATION_BUCKETS, self.LABELS)
+        self.queries = Histogram('edf_request_queries', 'SQL queries per request.',
+                                 QUERY_BUCKETS, self.LABELS)
+        self.serialization_time = Histogram('edf_request_serialization_seconds',
+                                            'Serializer .data time per request.',
+                                            DURATION_BUCKETS, self.LABELS)
+        self.render_time = Histogram('edf_request_render_seconds', 'Response rendering time per request.',
+                                     DURATION_BUCKETS, self.LABELS)
+        self.size = Histogram('edf_response_size_bytes', 'Response body size (streamed responses excluded).',
+                              SIZE_BUCKETS, self.LABELS)
+    
+    def observe(self, view: str, method: str, status: int, duration: float, db_time: float,
+                queries: int, serialization_time: float, render_time: float, size: int | None):
+        labels = (view, method)
+        with self._lock:
+            self.requests.inc((view, method, str(status)))
+            self.duration.observe(labels, duration)
+            self.db_time.observe(labels, db_time)
+            self.queries.observe(labels, queries)
+            self.serialization_time.observe(labels, serialization_time)
+            self.render_time.observe(labels, render_time)
+            if size is not None:
+                self.size.observe(labels, size)
+    
+    def expose(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.db_time, self.queries,
+                           self.serialization_time, self.render_time, self.size):
+                lines += metric.expose()
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,144 @@
+"""
+Request profiles kept in a bounded on-disk ring buffer.
+
+``apps.core.middleware.ProfilingMiddleware`` saves a profile when a
+request is slower than ``PROFILE_THRESHOLD_MS`` (stack samples), when it
+is drawn by ``PROFILE_SAMPLE_RATE`` or forced by a staff user with the
+``X-Profile: 1`` header (cProfile). Every profile carries the SQL the
+request ran with its timings. Browsable at ``/admin/profiles/``.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+# Seconds between two stack samples
+SAMPLE_INTERVAL = 0.005
+# Statements kept per profile
+MAX_SQL = 500
+
+
+class SQLRecorder:
+    """``connection.execute_wrapper`` hook keeping each statement and its duration."""
+    
+    def __init__(self):
+        self.statements = []
+        self.total = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += 1
+            if len(self.statements) < MAX_SQL:
+                self.statements.append({
+                    'sql': sql,
+                    'ms': round((time.perf_counter() - start) * 1000, 3),
+                    'many': many,
+                })
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread from a helper thread.
+    
+    Cheap enough to run on every request, so that a request found slow
+    afterwards still has a profile. Stacks are kept in the collapsed
+    ``frame;frame;frame count`` format read by flame graph tools.
+    """
+    
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # co_qualname is Python 3.11+ (the image runs 3.10)
+                name = getattr(code, 'co_qualname', code.co_name)
+                stack.append(f'{os.path.basename(code.co_filename)}:{name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+    
+    def report(self, limit: int = 200) -> str:
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common(limit))
+
+
+class ProfileStore:
+    """
+    One JSON file per profile; the oldest are deleted beyond ``keep``.
+    
+    File names start with a nanosecond timestamp, so they sort by age,
+    and end with a random suffix, so workers never collide.
+    """
+    
+    def __init__(self, directory, keep: int):
+        self.directory = Path(directory)
+        self.keep = keep
+    
+    @classmethod
+    def from_settings(cls) -> 'ProfileStore':
+        return cls(settings.PROFILE_DIR, settings.PROFILE_KEEP)
+    
+    def _files(self) -> list[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob('*.json'), reverse=True)
+    
+    def save(self, entry: dict) -> str:
+        """Write ``entry`` and prune the buffer. Returns the profile id."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+        path = self.directory / f'{profile_id}.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'id': profile_id, **entry}, default=str), encoding='utf-8')
+        os.replace(tmp, path)
+        
+        for old in self._files()[self.keep:]:
+            old.unlink(missing_ok=True)
+        return profile_id
+    
+    def entries(self) -> list[dict]:
+        """Newest first, without the profile and SQL bodies."""
+        entries = []
+        for path in self._files():
+            entry = self._read(path)
+            if entry is not None:
+                entry.pop('profile', None)
+                entry['sql_count'] = len(entry.pop('sql', []))
+                entries.append(entry)
+        return entries
+    
+    def get(self, profile_id: str) -> dict | None:
+        # Ids come from URLs: never let them leave the directory
+        if not profile_id.replace('-', '').isalnum():
+            return None
+        return self._read(self.directory / f'{profile_id}.json')
+    
+    def _read(self, path: Path) -> dict | None:
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            # Pruned by another worker in the meantime
+            return None
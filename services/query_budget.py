@@ -0,0 +1,39 @@
+"""
+SQL query budgets for API views and service methods.
+
+A budget is the maximum number of queries one call may run, whatever
+the size of the inventory. ``tests/test_query_budgets.py`` runs every
+endpoint and service method on two dataset sizes and fails when a count
+exceeds its budget or grows with the data (an N+1).
+
+Usage:
+    @query_budget(6)
+    class CartonViewSet(...):          # list / retrieve
+        @action(detail=False)
+        @query_budget(4)
+        def disponibles(self, request): ...
+
+    @classmethod
+    @query_budget(8)
+    @transaction.atomic
+    def reception_carton(cls, ...): ...
+"""
+
+QUERY_BUDGETS: dict[str, int] = {}
+
+
+def query_budget(max_queries: int):
+    """Declare the query budget of a view class, view method or service method."""
+    def decorator(obj):
+        obj.query_budget = max_queries
+        QUERY_BUDGETS[f'{obj.__module__}.{obj.__qualname__}'] = max_queries
+        return obj
+    return decorator
+
+
+def budget_for(view_class, handler=None) -> int | None:
+    """Budget of ``handler`` (a method of ``view_class``), else of the class."""
+    budget = getattr(handler, 'query_budget', None)
+    if budget is None:
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
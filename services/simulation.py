@@ -0,0 +1,160 @@
+"""
+Monte Carlo stock-out simulator for the BO order rounds.
+
+Daily rates are estimated over the last ``window`` days: receptions,
+déposes, Labo tests and their OK share, and reconditionnements from the
+Historique; poses per BO from LifecycleStage (the Historique does not
+record the BO of a pose); BO orders from the commande_bo rows. Every
+trajectory then steps the current stock through the flow, one day at a
+time, all trajectories and BOs in the same NumPy arrays:
+
+    livraisons -> Magasin -> (commandes) -> BO -> pose
+    dépose -> Labo backlog -> test OK -> Magasin  /  test HS -> out
+
+Orders are immediate, as in ConcentrateurService.commander_cartons, and
+served in BO order while the Magasin has stock. A BO runs out the first
+day its poses exceed its stock.
+
+Results depend on the parameters and the current fleet: they are cached
+under the inventory DataVersion.
+"""
+import time
+from datetime import timedelta
+from typing import Any
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.inventory.models import Concentrateur, Affectation, Etat
+from apps.tracking.models import ActionType, DataVersion, Historique, LifecycleStage
+from services.forecasting import K_PER_CARTON
+
+BOS = (Affectation.BO_NORD, Affectation.BO_CENTRE, Affectation.BO_SUD)
+QUANTILES = (10, 50, 90)
+CACHE_SECONDS = 3600
+
+
+def estimate_rates(window: int) -> dict[str, Any]:
+    """Daily rates over the last ``window`` days and the current stocks, in three queries."""
+    since = timezone.now() - timedelta(days=window)
+    actions, commandes = {}, {bo: 0 for bo in BOS}
+    for action, affectation, n in Historique.objects.filter(timestamp__gte=since)\
+            .values_list('action', 'nouvelle_affectation').annotate(n=Count('id')).order_by():
+        actions[action] = actions.get(action, 0) + n
+        if action == ActionType.COMMANDE_BO and affectation in commandes:
+            commandes[affectation] += n
+    poses = dict(
+        LifecycleStage.objects.filter(etat=Etat.POSE, affectation__in=BOS, entered_at__gte=since)
+        .values_list('affectation').annotate(n=Count('id')).order_by()
+    )
+    stock = {
+        (etat, affectation): n for etat, affectation, n in Concentrateur.objects.order_by()
+        .values_list('etat', 'affectation').annotate(n=Count('id'))
+    }
+
+    tested = actions.get(ActionType.TEST_OK, 0) + actions.get(ActionType.TEST_HS, 0)
+    return {
+        'window': window,
+        'poses': [poses.get(bo, 0) / window for bo in BOS],
+        # Cartons ordered per day (a carton moves K_PER_CARTON K)
+        'commandes': [commandes[bo] / K_PER_CARTON / window for bo in BOS],
+        # Reconditioned cartons are received again: only count new deliveries
+        'livraisons': max(0, actions.get(ActionType.RECEPTION, 0) - actions.get(ActionType.RECONDITIONNEMENT, 0))
+        / window,
+        'deposes': actions.get(ActionType.DEPOSE, 0) / window,
+        'tests': tested / window,
+        'ok_ratio': actions.get(ActionType.TEST_OK, 0) / tested if tested else 0.0,
+        'stock_bo': [stock.get((Etat.EN_STOCK, bo), 0) for bo in BOS],
+        'stock_magasin': stock.get((Etat.EN_STOCK, Affectation.MAGASIN), 0),
+        'labo_backlog': stock.get((Etat.A_TESTER, Affectation.LABO), 0),
+    }
+
+
+def simulate(rates: dict[str, Any], weeks: int, trajectories: int, orders: bool = True,
+             ok_ratio: float | None = None, seed: int = 0) -> dict[str, Any]:
+    """
+    Run ``trajectories`` over ``weeks`` from ``rates`` (see estimate_rates).
+
+    ``orders`` keeps the BOs ordering at their observed pace (off: what
+    the current BO stock alone covers); ``ok_ratio`` overrides the Labo
+    OK share.
+
+    Returns:
+        Dict with ``days`` and, per BO, the stock-out probability within
+        each week and the quantiles of the final stock.
+    """
+    rng = np.random.default_rng(seed)
+    days, n_bo = weeks * 7, len(BOS)
+    ok_ratio = rates['ok_ratio'] if ok_ratio is None else ok_ratio
+    pose_rates = np.array(rates['poses'])
+    commande_rates = np.array(rates['commandes'])
+
+    bo_stock = np.tile(np.array(rates['stock_bo'], dtype=np.int64), (trajectories, 1))
+    magasin = np.full(trajectories, rates['stock_magasin'], dtype=np.int64)
+    labo = np.full(trajectories, rates['labo_backlog'], dtype=np.int64)
+    stockout_day = np.full((trajectories, n_bo), days, dtype=np.int64)
+
+    for day in range(days):
+        magasin += rng.poisson(rates['livraisons'], trajectories)
+
+        tested = np.minimum(rng.poisson(rates['tests'], trajectories), labo)
+        labo += rng.poisson(rates['deposes'], trajectories) - tested
+        magasin += rng.binomial(tested, ok_ratio)
+
+        if orders:
+            wanted = rng.poisson(commande_rates, (trajectories, n_bo)) * K_PER_CARTON
+            served = np.minimum(wanted.cumsum(axis=1), magasin[:, None])
+            granted = np.diff(served, axis=1, prepend=0)
+            bo_stock += granted
+            magasin -= served[:, -1]
+
+        demand = rng.poisson(pose_rates, (trajectories, n_bo))
+        out = (demand > bo_stock) & (stockout_day == days)
+        stockout_day[out] = day
+        bo_stock -= np.minimum(demand, bo_stock)
+
+    week_ends = np.arange(1, weeks + 1) * 7
+    by_week = (stockout_day[:, :, None] < week_ends).mean(axis=0)
+    final = np.percentile(bo_stock, QUANTILES, axis=0)
+    return {
+        'days': days,
+        'bos': [
+            {
+                'bo': bo,
+                'stock': int(rates['stock_bo'][i]),
+                'poses_per_day': round(float(pose_rates[i]), 2),
+                'stockout_probability': round(float(by_week[i, -1]), 4),
+                'weekly_probability': [round(float(p), 4) for p in by_week[i]],
+                'final_stock': {f'p{q}': float(final[j, i]) for j, q in enumerate(QUANTILES)},
+            }
+            for i, bo in enumerate(BOS)
+        ],
+    }
+
+
+def stockout_risk(weeks: int, trajectories: int, window: int, orders: bool = True,
+                  ok_ratio: float | None = None, seed: int = 0) -> dict[str, Any]:
+    """
+    Estimate the rates and simulate, cached by parameters until the next
+    inventory change.
+    """
+    params = {'weeks': weeks, 'trajectories': trajectories, 'window': window,
+              'orders': orders, 'ok_ratio': ok_ratio, 'seed': seed}
+    version = DataVersion.current()
+    stamp = version.updated_at.timestamp() if version.updated_at else 0
+    key = 'simulation:' + ':'.join(f'{value}' for value in (version.version, stamp, *params.values()))
+    result = cache.get(key)
+    if result is None:
+        started = time.perf_counter()
+        rates = estimate_rates(window)
+        result = {
+            'params': params,
+            'rates': {name: dict(zip(BOS, value)) if isinstance(value, list) else value
+                      for name, value in rates.items()},
+            **simulate(rates, weeks, trajectories, orders, ok_ratio, seed),
+        }
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        cache.set(key, result, CACHE_SECONDS)
+    return result
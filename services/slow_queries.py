@@ -0,0 +1,142 @@
+"""
+Slow-query capture.
+
+A ``connection.execute_wrapper`` hook installed on every new connection
+(see CoreConfig.ready). Statements slower than ``SLOW_QUERY_MS`` (off
+by default) are appended as JSON lines to ``SLOW_QUERY_LOG`` with their
+call site and fingerprint, and their parameters with
+``SLOW_QUERY_LOG_PARAMS``. The first occurrence of a fingerprint in a
+process also gets an EXPLAIN plan (``EXPLAIN QUERY PLAN`` on SQLite).
+Past ``SLOW_QUERY_LOG_MAX_BYTES`` the log is moved to ``<name>.1``.
+``manage.py slow_query_report`` aggregates the log.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Parameters kept per entry, and characters per parameter
+MAX_PARAMS = 50
+MAX_PARAM_LENGTH = 200
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql: str) -> str:
+    """SQL with literals and IN-list lengths erased, for grouping."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.blake2b(normalize(sql).encode(), digest_size=8).hexdigest()
+
+
+def _call_site() -> str | None:
+    """Innermost frame of project code (not Django, DRF or this module)."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(base) and 'site-packages' not in filename and filename != __file__:
+            return f'{Path(filename).relative_to(base)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def _shorten(value):
+    value = value if isinstance(value, (int, float, bool, type(None))) else str(value)
+    if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+        return value[:MAX_PARAM_LENGTH] + '…'
+    return value
+
+
+class SlowQueryLogger:
+    """Execute wrapper timing each statement (one instance per connection)."""
+    
+    _write_lock = threading.Lock()
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.explained = set()
+        self._local = threading.local()
+    
+    def __call__(self, execute, sql, params, many, context):
+        threshold = settings.SLOW_QUERY_MS
+        if not threshold or getattr(self._local, 'active', False):
+            return execute(sql, params, many, context)
+        
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= threshold:
+            self._local.active = True
+            try:
+                self._record(sql, params, many, duration_ms)
+            except Exception:
+                # Instrumentation must never break the request
+                logger.exception("Slow query capture failed")
+            finally:
+                self._local.active = False
+        return result
+    
+    def _record(self, sql: str, params, many: bool, duration_ms: float):
+        digest = fingerprint(sql)
+        entry = {
+            'time': timezone.now().isoformat(timespec='seconds'),
+            'ms': round(duration_ms, 2),
+            'fingerprint': digest,
+            'alias': self.connection.alias,
+            'sql': sql,
+            'params': None if many or params is None or not settings.SLOW_QUERY_LOG_PARAMS
+            else [_shorten(p) for p in list(params)[:MAX_PARAMS]],
+            'many': many,
+            'call_site': _call_site(),
+        }
+        if digest not in self.explained and not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH'):
+            self.explained.add(digest)
+            entry['plan'] = self._explain(sql, params)
+        
+        logger.warning("Slow query %s (%.1f ms) at %s", digest, duration_ms, entry['call_site'])
+        line = json.dumps(entry, default=str)
+        path = Path(settings.SLOW_QUERY_LOG)
+        with self._write_lock:
+            if path.exists() and path.stat().st_size >= settings.SLOW_QUERY_LOG_MAX_BYTES:
+                path.replace(path.with_name(path.name + '.1'))
+            with open(path, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
+    
+    def _explain(self, sql: str, params) -> str | None:
+        prefix = self.connection.ops.explain_query_prefix()
+        try:
+            # Savepoint: a failed EXPLAIN must not abort the caller's transaction
+            with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'EXPLAIN failed: {e}'
+
+
+def install(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver.
+
+    The logger goes to the bottom of the wrapper stack: the connection may
+    open inside a ``with connection.execute_wrapper(...)`` block (the
+    request middlewares), whose exit pops the last wrapper.
+    """
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, SlowQueryLogger(connection))
@@ -0,0 +1,175 @@
+"""
+Fleet state at a past instant ("stock as of T").
+
+``manage.py snapshot_inventory`` stores one InventorySnapshot per day.
+``state_as_of(at)`` starts from the latest snapshot taken at or before
+``at`` and folds the Historique rows (archive included) logged between
+the two, streamed in timestamp order into plain dicts: no model instance
+and no per-row query. Concentrateurs created after that snapshot are
+taken from the live table and rewound with the rows logged after ``at``.
+
+Folding rules, from the columns each transition fills in:
+- état / affectation: set to the new value when the row records a change
+  (a before or after value is present), so ``test_hs`` clears the
+  affectation while ``pose`` leaves it alone;
+- poste: set by ``pose`` (and ``modification``), cleared by ``depose``
+  and by the test;
+- carton: cleared by ``test_ok``, set by ``reconditionnement`` from its
+  commentaire. A carton detached after ``at`` cannot be restored when
+  rewinding, the Historique does not record it.
+"""
+import re
+from datetime import datetime
+from typing import Any
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.models import Concentrateur
+from apps.tracking.models import ActionType, Historique, HistoriqueArchive, InventorySnapshot
+
+CHUNK_SIZE = 10000
+
+# Positions in a state row
+N_SERIE, ETAT, AFFECTATION, POSTE, CARTON = range(5)
+
+EVENT_FIELDS = (
+    'concentrateur_id', 'action', 'ancien_etat', 'nouvel_etat',
+    'ancienne_affectation', 'nouvelle_affectation', 'poste', 'commentaire',
+)
+LIVE_FIELDS = ('id', 'n_serie', 'etat', 'affectation', 'poste_pose__code', 'carton__num_carton')
+
+# Commentaire written by ConcentrateurService._creer_carton_reconditionne_auto
+_RECOND_CARTON = re.compile(r'carton reconditionné (\S+)')
+
+
+def live_rows(queryset=None) -> dict[int, list]:
+    """``{id: [n_serie, etat, affectation, poste, carton]}`` from the live table."""
+    queryset = Concentrateur.objects.all() if queryset is None else queryset
+    return {
+        pk: [n_serie, etat, affectation, poste or '', carton or '']
+        for pk, n_serie, etat, affectation, poste, carton
+        in queryset.order_by().values_list(*LIVE_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+    }
+
+
+def iter_events(reverse: bool = False, fields: tuple = EVENT_FIELDS, **filters):
+    """
+    Historique rows as ``fields`` tuples, archive and hot table chained:
+    archived rows all predate the hot ones.
+    """
+    order = ('-timestamp', '-id') if reverse else ('timestamp', 'id')
+    models = (Historique, HistoriqueArchive) if reverse else (HistoriqueArchive, Historique)
+    for model in models:
+        yield from model.objects.filter(**filters).order_by(*order).values_list(*fields)\
+            .iterator(chunk_size=CHUNK_SIZE)
+
+
+def apply_event(row: list, event: tuple) -> None:
+    """Move ``row`` forward through ``event`` (in place)."""
+    _, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste, commentaire = event
+    if ancien_etat or nouvel_etat:
+        row[ETAT] = nouvel_etat
+    if ancienne_affectation or nouvelle_affectation:
+        row[AFFECTATION] = nouvelle_affectation
+    if action in (ActionType.POSE, ActionType.MODIFICATION):
+        row[POSTE] = poste
+    elif action in (ActionType.DEPOSE, ActionType.TEST_OK, ActionType.TEST_HS):
+        row[POSTE] = ''
+    if action == ActionType.TEST_OK:
+        row[CARTON] = ''
+    elif action == ActionType.RECONDITIONNEMENT:
+        match = _RECOND_CARTON.search(commentaire)
+        row[CARTON] = match.group(1) if match else row[CARTON]
+
+
+def revert_event(row: list, event: tuple) -> None:
+    """Move ``row`` back to before ``event`` (in place)."""
+    _, action, ancien_etat, nouvel_etat, ancienne_affectation, nouvelle_affectation, poste, _ = event
+    if ancien_etat or nouvel_etat:
+        row[ETAT] = ancien_etat
+    if ancienne_affectation or nouvelle_affectation:
+        row[AFFECTATION] = ancienne_affectation
+    if action == ActionType.POSE:
+        row[POSTE] = ''
+    elif action == ActionType.DEPOSE:
+        row[POSTE] = poste
+    if action == ActionType.RECONDITIONNEMENT:
+        row[CARTON] = ''
+
+
+def take_snapshot(day=None) -> InventorySnapshot:
+    """Store the current fleet state as the snapshot of ``day`` (default today)."""
+    with transaction.atomic():
+        taken_at = timezone.now()
+        rows = live_rows()
+    snapshot, _ = InventorySnapshot.objects.update_or_create(
+        day=day or timezone.localdate(),
+        defaults={'taken_at': taken_at, 'concentrateurs': len(rows), 'data': InventorySnapshot.pack(rows)}
+    )
+    return snapshot
+
+
+def state_as_of(at: datetime) -> dict[str, Any]:
+    """
+    Fleet state at ``at``.
+
+    Returns:
+        Dict with ``snapshot`` (the InventorySnapshot used, or None),
+        ``replayed`` (Historique rows folded) and ``rows``:
+        ``{id: [n_serie, etat, affectation, poste, carton]}``.
+    """
+    snapshot = InventorySnapshot.objects.filter(taken_at__lte=at).order_by('-taken_at').first()
+    rows = snapshot.unpack() if snapshot else {}
+    replayed = 0
+
+    if snapshot is not None:
+        for event in iter_events(timestamp__gt=snapshot.taken_at, timestamp__lte=at):
+            row = rows.get(event[0])
+            if row is not None:
+                apply_event(row, event)
+                replayed += 1
+
+    # Created after the snapshot (or no snapshot yet): rewind from the live state
+    created = {'created_at__lte': at}
+    if snapshot is not None:
+        created['created_at__gt'] = snapshot.taken_at
+    recent = live_rows(Concentrateur.objects.filter(**created))
+    if recent:
+        later = {'timestamp__gt': at, 'concentrateur__created_at__lte': at}
+        if snapshot is not None:
+            later['concentrateur__created_at__gt'] = snapshot.taken_at
+        for event in iter_events(reverse=True, **later):
+            row = recent.get(event[0])
+            if row is not None:
+                revert_event(row, event)
+                replayed += 1
+        rows.update(recent)
+
+    return {'snapshot': snapshot, 'replayed': replayed, 'rows': rows}
+
+
+def replay(from_snapshot: bool = False) -> dict[str, Any]:
+    """
+    Fleet state implied by the Historique alone, for drift checks.
+
+    Streams every row in timestamp order (server-side cursors where the
+    backend has them) into one state row per concentrateur. Columns no
+    row ever determined stay None: the K was never moved on that axis
+    and the audit trail says nothing about it. ``from_snapshot`` starts
+    from the latest InventorySnapshot instead of the first row.
+
+    Returns:
+        Dict with ``snapshot``, ``replayed`` and ``rows`` as state_as_of().
+    """
+    snapshot = InventorySnapshot.objects.order_by('-taken_at').first() if from_snapshot else None
+    rows = snapshot.unpack() if snapshot else {}
+    filters = {'timestamp__gt': snapshot.taken_at} if snapshot else {}
+    replayed = 0
+    for event in iter_events(**filters):
+        row = rows.get(event[0])
+        if row is None:
+            row = rows[event[0]] = [None] * 5
+        apply_event(row, event)
+        replayed += 1
+    return {'snapshot': snapshot, 'replayed': replayed, 'rows': rows}
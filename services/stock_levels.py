@@ -0,0 +1,122 @@
+"""
+Daily stock-level time series (StockLevel).
+
+The end-of-day count of a (affectation, état, opérateur) combination
+is the previous day's count plus the LifecycleStage rows entered that
+day minus those left that day: two grouped queries per day, whatever
+the fleet size. Stages are used rather than raw Historique rows because
+each stage carries both the état and the affectation, while a commande
+or a pose only records the axis it changes.
+
+The first rolled day (or any day without a predecessor) is seeded with
+a full count of the stages open at its start. Each rollup bumps the
+``stock_levels`` DataVersion, the cache key of the forecasts built on
+the series.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from apps.tracking.models import DataVersion, LifecycleStage, StockLevel
+
+KEY = ('affectation', 'etat', 'concentrateur__operateur')
+SERIES_DIMENSIONS = ('affectation', 'etat', 'operateur')
+
+
+def day_start(day: date) -> datetime:
+    """Aware local midnight starting ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _counts(queryset) -> Counter:
+    return Counter({
+        (row['affectation'], row['etat'], row['concentrateur__operateur']): row['n']
+        for row in queryset.order_by().values(*KEY).annotate(n=Count('id'))
+    })
+
+
+def levels_at(at: datetime) -> Counter:
+    """Full count of the stages open at ``at``, per key."""
+    return _counts(LifecycleStage.objects.filter(entered_at__lt=at).filter(
+        Q(left_at__isnull=True) | Q(left_at__gte=at)
+    ))
+
+
+def deltas(start: datetime, end: datetime) -> tuple[Counter, Counter]:
+    """(stages entered, stages left) in ``[start, end)``, per key."""
+    return (
+        _counts(LifecycleStage.objects.filter(entered_at__gte=start, entered_at__lt=end)),
+        _counts(LifecycleStage.objects.filter(left_at__gte=start, left_at__lt=end)),
+    )
+
+
+@transaction.atomic
+def rollup(until: date, since: date | None = None) -> int:
+    """
+    Roll the series up to ``until`` included.
+
+    Starts the day after the last rolled day, or at ``since`` (days from
+    ``since`` on are recomputed), or at the first stage on an empty
+    series.
+
+    Returns:
+        Number of days rolled
+    """
+    if since is None:
+        last = StockLevel.objects.aggregate(last=Max('day'))['last']
+        if last is not None:
+            since = last + timedelta(days=1)
+        else:
+            first = LifecycleStage.objects.aggregate(first=Min('entered_at'))['first']
+            if first is None:
+                return 0
+            since = timezone.localtime(first).date()
+    if since > until:
+        return 0
+
+    StockLevel.objects.filter(day__gte=since).delete()
+    levels = Counter({
+        (affectation, etat, operateur): count
+        for affectation, etat, operateur, count in StockLevel.objects.filter(day=since - timedelta(days=1))
+        .values_list('affectation', 'etat', 'operateur', 'count')
+    }) or levels_at(day_start(since))
+
+    day, days = since, 0
+    while day <= until:
+        entered, left = deltas(day_start(day), day_start(day + timedelta(days=1)))
+        levels.update(entered)
+        levels.subtract(left)
+        StockLevel.objects.bulk_create([
+            StockLevel(day=day, affectation=key[0], etat=key[1], operateur=key[2], count=count, entered=entered[key])
+            for key, count in levels.items() if count > 0 or entered[key]
+        ])
+        day += timedelta(days=1)
+        days += 1
+    DataVersion.bump(DataVersion.STOCK_LEVELS)
+    return days
+
+
+def series(start: date, end: date, by: tuple = SERIES_DIMENSIONS, **filters) -> list[dict[str, Any]]:
+    """
+    Daily counts between ``start`` and ``end`` (included), summed over the
+    dimensions not in ``by``, in one read; missing days are zeros.
+
+    Returns:
+        One dict per combination of ``by`` with its ``points``
+        (``[day, count]`` for every day of the range).
+    """
+    rows = StockLevel.objects.filter(day__gte=start, day__lte=end, **filters)\
+        .values('day', *by).annotate(total=Sum('count')).order_by(*by, 'day')
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    grouped = {}
+    for row in rows:
+        key = tuple(row[dimension] for dimension in by)
+        grouped.setdefault(key, {})[row['day']] = row['total']
+    return [
+        {**dict(zip(by, key)), 'points': [[day, counts.get(day, 0)] for day in days]}
+        for key, counts in grouped.items()
+    ]
@@ -0,0 +1,104 @@
+"""
+Delta synchronisation for offline field clients (BO tablets).
+
+Clients keep the ``cursor`` returned by the previous call and ask for
+``changes_since(bo, cursor)`` on reconnect. Only rows logged in
+ChangeLog for that BO after the cursor are reloaded; rows that no longer
+belong to the BO (or were deleted) come back as tombstones (ids only).
+
+The cursor is the last ChangeLog id sent, but ids are allocated when a
+transaction inserts its entries, not when it commits: an entry committed
+late can get an id below a cursor already handed out. Each delta also
+re-reads the entries of the last SYNC_SAFETY_SECONDS before the cursor;
+rows are resent with their current state, so a replay is harmless.
+"""
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db.models import Count, DateTimeField, ExpressionWrapper, Max, Q, Subquery, Value
+
+from apps.inventory.models import Concentrateur, Carton, Poste
+from apps.tracking.models import ChangeLog
+
+DEFAULT_LIMIT = 1000
+
+
+def _scoped_querysets(bo: str) -> dict[str, Any]:
+    """Querysets of the rows visible to ``bo``, per ChangeLog model name."""
+    return {
+        ChangeLog.CONCENTRATEUR: Concentrateur.objects.filter(affectation=bo).select_related('carton', 'poste_pose'),
+        ChangeLog.CARTON: Carton.objects.filter(concentrateurs__affectation=bo).annotate(
+            concentrateurs_count=Count('concentrateurs', filter=Q(concentrateurs__affectation=bo))
+        ),
+        ChangeLog.POSTE: Poste.objects.filter(base_operationnelle=bo, actif=True),
+    }
+
+
+def _serialize(model: str, rows) -> list[dict]:
+    # Imported lazily: the API layer depends on services, not the reverse
+    from api.serializers import ConcentrateurListSerializer, CartonSerializer, PosteSerializer
+    serializer_class = {
+        ChangeLog.CONCENTRATEUR: ConcentrateurListSerializer,
+        ChangeLog.CARTON: CartonSerializer,
+        ChangeLog.POSTE: PosteSerializer,
+    }[model]
+    return serializer_class(rows, many=True).data
+
+
+def _replayed(bo: str, cursor: int):
+    """(model, object_id) logged for ``bo`` up to ``cursor`` within the safety window."""
+    if not cursor or not settings.SYNC_SAFETY_SECONDS:
+        return []
+    cursor_time = ChangeLog.objects.filter(id__lte=cursor).order_by('-id').values('timestamp')[:1]
+    window_start = ExpressionWrapper(
+        Subquery(cursor_time) - Value(timedelta(seconds=settings.SYNC_SAFETY_SECONDS)),
+        output_field=DateTimeField()
+    )
+    return ChangeLog.objects.filter(scope=bo, id__lte=cursor, timestamp__gte=window_start)\
+        .order_by().values_list('model', 'object_id').distinct()
+
+
+def changes_since(bo: str, cursor: int | None = None, limit: int = DEFAULT_LIMIT) -> dict[str, Any]:
+    """
+    Rows of ``bo`` changed after ``cursor``.
+
+    Without a cursor, returns the full current dataset of the BO and the
+    latest cursor (initial sync). Otherwise reads at most ``limit`` log
+    entries; ``has_more`` tells the client to call again immediately.
+
+    Returns:
+        Dict with ``cursor``, ``has_more``, one list of upserted rows per
+        model and ``deleted`` ids per model.
+    """
+    querysets = _scoped_querysets(bo)
+    result = {'cursor': cursor or 0, 'has_more': False, 'full': cursor is None, 'deleted': {}}
+
+    if cursor is None:
+        result['cursor'] = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+        for model, queryset in querysets.items():
+            result[f'{model}s'] = _serialize(model, queryset.distinct())
+            result['deleted'][f'{model}s'] = []
+        return result
+
+    entries = list(
+        ChangeLog.objects.filter(scope=bo, id__gt=cursor)
+        .order_by('id')
+        .values_list('id', 'model', 'object_id')[:limit]
+    )
+    if entries:
+        result['cursor'] = entries[-1][0]
+        result['has_more'] = len(entries) == limit
+
+    changed = {model: set() for model in querysets}
+    for _, model, object_id in entries:
+        changed[model].add(object_id)
+    for model, object_id in _replayed(bo, cursor):
+        changed[model].add(object_id)
+
+    for model, queryset in querysets.items():
+        rows = list(queryset.filter(id__in=changed[model]).distinct()) if changed[model] else []
+        result[f'{model}s'] = _serialize(model, rows)
+        result['deleted'][f'{model}s'] = sorted(changed[model] - {row.id for row in rows})
+
+    return result
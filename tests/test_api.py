@@ -0,0 +1,524 @@
+import io
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+import msgpack
+import numpy as np
+import orjson
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as django_timezone
+from rest_framework.renderers import JSONRenderer
+from api.renderers import ORJSONRenderer
+from apps.core.middleware import logger as request_logger
+from apps.core.models import User
+from apps.inventory.models import Carton, Concentrateur, Etat, Poste
+from apps.tracking.models import ChangeLog
+from services import forecasting
+from services.business_logic import ConcentrateurService
+from services.metrics import SerializationTimer, request_metrics
+from services.profiling import ProfileStore
+from services.snapshots import take_snapshot
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+
+    def test_values_path_for_plain_columns(self, api_client, user_magasin, concentrateur_livraison):
+        """Plain columns only: rows come straight from values(), without JOIN."""
+        api_client.force_authenticate(user_magasin)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get('/api/v1/concentrateurs/', {'fields': 'n_serie,etat,affectation'})
+
+        assert response.status_code == 200
+        assert response.data['results'] == [{
+            'n_serie': 'S12345',
+            'etat': Etat.EN_LIVRAISON,
+            'affectation': '',
+        }]
+        assert not any('JOIN' in q['sql'] for q in ctx.captured_queries)
+
+    def test_values_path_matches_serializer(self, api_client, user_magasin, concentrateur_livraison):
+        """The fast path returns the same payload as the serializer would."""
+        api_client.force_authenticate(user_magasin)
+        fields = 'id,n_serie,operateur,etat,affectation,date_dernier_etat'
+
+        fast = api_client.get('/api/v1/concentrateurs/', {'fields': fields}).json()
+        full = api_client.get('/api/v1/concentrateurs/').json()
+
+        expected = [{name: row[name] for name in fields.split(',')} for row in full['results']]
+        assert fast['results'] == expected
+
+    def test_serializer_fallback_for_computed_fields(self, api_client, user_magasin, concentrateur_livraison):
+        """Computed/relation fields are trimmed by the serializer instead."""
+        api_client.force_authenticate(user_magasin)
+
+        response = api_client.get('/api/v1/concentrateurs/', {'fields': 'n_serie,etat_display,carton'})
+
+        assert response.data['results'] == [{
+            'n_serie': 'S12345',
+            'etat_display': 'En livraison',
+            'carton': 'CARTON001',
+        }]
+
+    def test_unknown_fields_keep_full_payload(self, api_client, user_magasin, poste_bo_nord):
+        api_client.force_authenticate(user_magasin)
+
+        response = api_client.get('/api/v1/postes/', {'fields': 'nope'})
+
+        assert set(response.data['results'][0]) == {'id', 'code', 'nom', 'base_operationnelle', 'actif'}
+
+
+@pytest.mark.django_db
+class TestRenderers:
+
+    def test_orjson_matches_drf_json_renderer(self):
+        """Same bytes as the stock renderer, including DRF's datetime format."""
+        data = {
+            'when': datetime(2025, 1, 5, 10, 30, 12, 345678, tzinfo=dt_timezone.utc),
+            'day': date(2025, 1, 5),
+            'ratio': Decimal('1.5'),
+            'label': 'Posé \u2028',
+            'items': [1, None, True],
+        }
+
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_msgpack_negotiation_is_equivalent(self, api_client, user_magasin, concentrateur_livraison):
+        """Accept: application/msgpack returns the same payload as JSON."""
+        api_client.force_authenticate(user_magasin)
+
+        as_json = api_client.get('/api/v1/dashboard/stats/')
+        as_msgpack = api_client.get('/api/v1/dashboard/stats/', HTTP_ACCEPT='application/msgpack')
+
+        assert as_json['Content-Type'] == 'application/json'
+        assert as_msgpack['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(as_msgpack.content) == orjson.loads(as_json.content)
+
+    def test_msgpack_request_body(self, api_client, user_magasin, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+
+        response = api_client.post(
+            '/api/v1/actions/reception/', {'num_carton': 'CARTON001'}, format='msgpack'
+        )
+
+        assert response.status_code == 200
+        assert response.data['nb_recus'] == 1
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_unchanged_list_returns_304_without_page_query(self, api_client, user_magasin, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+        first = api_client.get('/api/v1/concentrateurs/', {'etat': Etat.EN_LIVRAISON})
+        assert first.status_code == 200 and first['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = api_client.get(
+                '/api/v1/concentrateurs/', {'etat': Etat.EN_LIVRAISON}, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+
+        assert second.status_code == 304
+        assert second['ETag'] == first['ETag']
+        assert len(ctx.captured_queries) == 2  # data version + aggregate marker
+
+    def test_transition_invalidates_etag(self, api_client, user_magasin, carton_livraison, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+        first = api_client.get('/api/v1/cartons/en_livraison/')
+
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+        second = api_client.get('/api/v1/cartons/en_livraison/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        assert second.status_code == 200
+        assert second.data == []
+        assert second['ETag'] != first['ETag']
+
+    def test_poste_change_invalidates_etag(self, api_client, user_magasin, poste_bo_nord):
+        api_client.force_authenticate(user_magasin)
+        first = api_client.get('/api/v1/postes/')
+
+        poste_bo_nord.nom = 'Renommé'
+        poste_bo_nord.save()
+        second = api_client.get('/api/v1/postes/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        assert second.status_code == 200
+        assert second.data['results'][0]['nom'] == 'Renommé'
+
+
+@pytest.mark.django_db
+class TestSyncChanges:
+
+    @pytest.fixture(autouse=True)
+    def exact_deltas(self, settings):
+        # Nothing commits late here: no safety-window replay in the exact delta checks
+        settings.SYNC_SAFETY_SECONDS = 0
+
+    @pytest.fixture
+    def k_bo_nord(self, concentrateur_livraison):
+        concentrateur_livraison.etat = Etat.EN_STOCK
+        concentrateur_livraison.affectation = 'BO Nord'
+        concentrateur_livraison.save()
+        return concentrateur_livraison
+
+    def test_full_then_delta_with_tombstones(self, api_client, user_bo_terrain, k_bo_nord, poste_bo_nord):
+        api_client.force_authenticate(user_bo_terrain)
+
+        full = api_client.get('/api/v1/sync/changes/').data
+        assert full['full'] is True
+        assert [k['n_serie'] for k in full['concentrateurs']] == ['S12345']
+        assert [p['code'] for p in full['postes']] == ['POSTE01']
+
+        ConcentrateurService.poser_concentrateur(k_bo_nord.n_serie, poste_bo_nord.id, user_bo_terrain)
+        delta = api_client.get('/api/v1/sync/changes/', {'since': full['cursor']}).data
+        assert [k['poste_code'] for k in delta['concentrateurs']] == ['POSTE01']
+        assert delta['postes'] == []
+
+        ConcentrateurService.deposer_concentrateur(poste_bo_nord.id, k_bo_nord.n_serie, user_bo_terrain)
+        delta = api_client.get('/api/v1/sync/changes/', {'since': delta['cursor']}).data
+        assert delta['concentrateurs'] == []
+        assert delta['deleted']['concentrateurs'] == [k_bo_nord.id]
+        assert delta['deleted']['cartons'] == [k_bo_nord.carton_id]
+
+        idle = api_client.get('/api/v1/sync/changes/', {'since': delta['cursor']}).data
+        assert idle['cursor'] == delta['cursor']
+        assert idle['concentrateurs'] == [] and idle['deleted']['concentrateurs'] == []
+
+    def test_deleted_rows_are_tombstoned(self, api_client, user_bo_terrain, k_bo_nord):
+        api_client.force_authenticate(user_bo_terrain)
+        other = Concentrateur.objects.create(
+            n_serie='S-OTHER', operateur='Orange', etat=Etat.EN_STOCK, affectation='BO Nord',
+            carton=Carton.objects.create(num_carton='CARTON-OTHER', operateur='Orange')
+        )
+        cursor = api_client.get('/api/v1/sync/changes/').data['cursor']
+
+        k_id, carton_id = k_bo_nord.id, k_bo_nord.carton_id
+        k_bo_nord.delete()
+        delta = api_client.get('/api/v1/sync/changes/', {'since': cursor}).data
+        assert delta['deleted']['concentrateurs'] == [k_id]
+        assert delta['deleted']['cartons'] == [carton_id]
+
+        other.carton.delete()
+        delta = api_client.get('/api/v1/sync/changes/', {'since': delta['cursor']}).data
+        assert [k['carton'] for k in delta['concentrateurs']] == [None]
+        assert delta['deleted']['cartons'] == [other.carton_id]
+
+    def test_entry_committed_behind_the_cursor_is_replayed(self, api_client, user_bo_terrain, k_bo_nord, settings):
+        api_client.force_authenticate(user_bo_terrain)
+        late = ChangeLog(model=ChangeLog.CONCENTRATEUR, object_id=k_bo_nord.id, scope='BO Nord')
+        late.save()
+        ChangeLog.objects.create(model=ChangeLog.POSTE, object_id=0, scope='BO Sud')
+        ChangeLog.objects.filter(id=late.id).delete()  # Its transaction has not committed yet
+        cursor = api_client.get('/api/v1/sync/changes/').data['cursor']
+        late.save(force_insert=True)
+
+        assert api_client.get('/api/v1/sync/changes/', {'since': cursor}).data['concentrateurs'] == []
+        settings.SYNC_SAFETY_SECONDS = 60
+        delta = api_client.get('/api/v1/sync/changes/', {'since': cursor}).data
+        assert delta['cursor'] == cursor
+        assert [k['n_serie'] for k in delta['concentrateurs']] == ['S12345']
+
+    def test_other_bo_changes_are_not_sent(self, api_client, user_bo_terrain, k_bo_nord):
+        api_client.force_authenticate(user_bo_terrain)
+        cursor = api_client.get('/api/v1/sync/changes/').data['cursor']
+
+        Poste.objects.create(code='POSTE-SUD', nom='Sud', base_operationnelle='BO Sud')
+        delta = api_client.get('/api/v1/sync/changes/', {'since': cursor}).data
+
+        assert delta['cursor'] == cursor
+        assert delta['postes'] == []
+
+    def test_requires_bo_profile(self, api_client, user_magasin):
+        api_client.force_authenticate(user_magasin)
+        assert api_client.get('/api/v1/sync/changes/').status_code == 403
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def test_csv_uses_bdd_layout_and_list_filters(self, api_client, user_magasin, concentrateur_livraison):
+        Concentrateur.objects.create(n_serie='S-STOCK', operateur='Orange', etat=Etat.EN_STOCK)
+        api_client.force_authenticate(user_magasin)
+
+        response = api_client.get('/api/v1/concentrateurs/export/', {'etat': Etat.EN_LIVRAISON})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        assert response['Content-Type'] == 'text/csv'
+        assert lines[0] == (
+            'num_carton;operateur;n_serie_concentrateur;affectation;etat;'
+            'poste_pose;date_affectation;date_pose;date_dernier_etat'
+        )
+        assert lines[1].startswith('CARTON001;Bouygues;S12345;;en_livraison;;;;')
+        assert len(lines) == 2
+
+    def test_csv_reimports_without_changes(self, api_client, user_magasin, tmp_path):
+        call_command('generate_dataset', '--cartons', '50', '--postes', '9', '--days', '400', '--seed', '3',
+                     stdout=io.StringIO())
+        assert {Etat.EN_ATTENTE_RECONDITIONNEMENT, Etat.HS} <= set(Concentrateur.objects.values_list('etat', flat=True))
+        api_client.force_authenticate(user_magasin)
+        path = tmp_path / 'export.csv'
+        path.write_bytes(b''.join(api_client.get('/api/v1/concentrateurs/export/').streaming_content))
+        out = io.StringIO()
+
+        call_command('import_csv', str(path), '--diff', '--dry-run', stdout=out)
+
+        assert 'Concentrateurs updated: 0' in out.getvalue()
+        assert f'Concentrateurs unchanged: {Concentrateur.objects.count()}' in out.getvalue()
+
+    def test_ndjson_historique(self, api_client, user_magasin, carton_livraison, concentrateur_livraison):
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+        api_client.force_authenticate(user_magasin)
+
+        response = api_client.get('/api/v1/historique/export/', {'format': 'ndjson', 'action': 'reception'})
+        rows = [orjson.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        assert response['Content-Type'] == 'application/x-ndjson'
+        assert [(r['n_serie_concentrateur'], r['utilisateur'], r['nouvel_etat']) for r in rows] == [
+            ('S12345', 'magasin', Etat.EN_STOCK)
+        ]
+
+    def test_export_command(self, concentrateur_livraison):
+        out = io.StringIO()
+
+        call_command('export_inventory', 'concentrateurs', '--filter', 'operateur=Bouygues', stdout=out)
+
+        assert out.getvalue().splitlines()[1].startswith('CARTON001;Bouygues;S12345;')
+
+
+@pytest.mark.django_db
+class TestFleetAsOf:
+
+    def test_replays_history_since_snapshot(self, api_client, user_magasin, carton_livraison, concentrateur_livraison):
+        take_snapshot()
+        before = django_timezone.now()
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+        api_client.force_authenticate(user_magasin)
+
+        past = api_client.get('/api/v1/dashboard/as-of/', {'at': before.isoformat()}).data
+        today = api_client.get('/api/v1/dashboard/as-of/', {'at': str(django_timezone.localdate()), 'detail': '1'}).data
+
+        assert past['by_etat'] == {Etat.EN_LIVRAISON: 1} and past['replayed'] == 0
+        assert today['replayed'] == 1
+        assert today['by_affectation'] == {'Magasin': 1}
+        assert today['concentrateurs'] == [
+            {'n_serie': 'S12345', 'etat': Etat.EN_STOCK, 'affectation': 'Magasin', 'poste': '', 'carton': 'CARTON001'}
+        ]
+
+    def test_filters_and_invalid_date(self, api_client, user_magasin, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+
+        filtered = api_client.get('/api/v1/dashboard/as-of/', {'at': str(django_timezone.localdate()), 'etat': Etat.POSE})
+
+        assert filtered.data['total'] == 0 and filtered.data['snapshot'] is None
+        assert api_client.get('/api/v1/dashboard/as-of/', {'at': 'hier'}).status_code == 400
+
+
+class TestForecasting:
+
+    def test_fit_recovers_weekly_pattern_of_every_series(self):
+        week = np.array([5, 6, 6, 5, 4, 0, 0])
+        rng = np.random.default_rng(1)
+        y = np.stack([np.tile(week, 13) * scale for scale in (1, 3, 0)]) + rng.normal(0, 0.2, (3, 91))
+
+        predicted = forecasting.predict(forecasting.fit(y), 14)
+
+        assert predicted.shape == (3, 14)
+        assert np.allclose(predicted[0], np.tile(week, 2), atol=1)
+        assert np.allclose(predicted[1], np.tile(week * 3, 2), atol=1.5)
+        assert (predicted >= 0).all() and predicted[2].max() < 1
+
+
+@pytest.mark.django_db
+class TestReplenishment:
+
+    @pytest.fixture
+    def dataset(self):
+        call_command('generate_dataset', '--cartons', '300', '--postes', '60', '--days', '150', '--seed', '3',
+                     stdout=io.StringIO())
+        call_command('rollup_stock_levels', stdout=io.StringIO())
+
+    def test_recommendations_per_bo_and_cache(self, api_client, dataset, user_bo_commande):
+        admin = User.objects.create_user(username='admin', password='password', profil='admin')
+        api_client.force_authenticate(admin)
+
+        with CaptureQueriesContext(connection) as first:
+            recommendations = api_client.get('/api/v1/commande/replenishment/').data['recommendations']
+        with CaptureQueriesContext(connection) as cached:
+            assert api_client.get('/api/v1/commande/replenishment/').data['recommendations'] == recommendations
+
+        assert len(cached) == len(first) - 1
+        assert {r['bo'] for r in recommendations} == {'BO Nord', 'BO Centre', 'BO Sud'}
+        for r in recommendations:
+            assert r['stock'] == Concentrateur.objects.filter(
+                etat=Etat.EN_STOCK, affectation=r['bo'], operateur=r['operateur']
+            ).count()
+            assert r['poses_history'] > 0 and r['daily_forecast'] >= 0
+            assert (r['order_by'] is None) == (r['cartons'] == 0)
+
+        api_client.force_authenticate(user_bo_commande)
+        own = api_client.get('/api/v1/commande/replenishment/', {'bo': 'BO Sud'}).data['recommendations']
+        assert own == [r for r in recommendations if r['bo'] == 'BO Nord']
+
+    def test_reserved_to_bo_commande(self, api_client, user_magasin):
+        api_client.force_authenticate(user_magasin)
+
+        assert api_client.get('/api/v1/commande/replenishment/').status_code == 403
+
+
+@pytest.mark.django_db
+class TestStockoutSimulation:
+
+    @pytest.fixture
+    def admin(self, api_client):
+        admin = User.objects.create_user(username='admin', password='password', profil='admin')
+        api_client.force_authenticate(admin)
+        return admin
+
+    def test_simulates_generated_flow(self, api_client, admin):
+        call_command('generate_dataset', '--cartons', '300', '--postes', '60', '--days', '150', '--seed', '3',
+                     stdout=io.StringIO())
+
+        with CaptureQueriesContext(connection) as first:
+            data = api_client.get('/api/v1/dashboard/stockout-simulation/', {'weeks': 8}).data
+        with CaptureQueriesContext(connection) as cached:
+            assert api_client.get('/api/v1/dashboard/stockout-simulation/', {'weeks': 8}).data == data
+
+        assert len(cached) == 1 < len(first)
+        assert data['params']['trajectories'] == 10000 and data['days'] == 56
+        assert data['elapsed_ms'] < 1000
+        assert 0 < data['rates']['ok_ratio'] < 1
+        for bo in data['bos']:
+            assert bo['stock'] == Concentrateur.objects.filter(etat=Etat.EN_STOCK, affectation=bo['bo']).count()
+            assert bo['weekly_probability'] == sorted(bo['weekly_probability'])
+            assert bo['stockout_probability'] == bo['weekly_probability'][-1]
+
+        # Without orders nor stock, a BO with poses runs out on day one
+        Concentrateur.objects.filter(etat=Etat.EN_STOCK).exclude(affectation='Magasin').update(etat=Etat.HS)
+        dry = api_client.get('/api/v1/dashboard/stockout-simulation/', {'orders': 0, 'weeks': 2, 'seed': 1}).data
+        assert all(bo['weekly_probability'][0] > 0.9 for bo in dry['bos'] if bo['poses_per_day'] > 1)
+
+    def test_invalid_parameters_and_permission(self, api_client, admin, user_magasin):
+        assert api_client.get('/api/v1/dashboard/stockout-simulation/', {'weeks': 0}).status_code == 400
+        assert api_client.get('/api/v1/dashboard/stockout-simulation/', {'ok_ratio': 'x'}).status_code == 400
+
+        api_client.force_authenticate(user_magasin)
+        assert api_client.get('/api/v1/dashboard/stockout-simulation/').status_code == 403
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+
+    @pytest.fixture(autouse=True)
+    def fresh_metrics(self):
+        request_metrics.reset()
+
+    @pytest.fixture
+    def admin(self):
+        return User.objects.create_user(username='admin', password='password', profil='admin')
+
+    def test_histograms_per_view(self, api_client, admin, concentrateur_livraison):
+        api_client.force_authenticate(admin)
+        api_client.get('/api/v1/concentrateurs/')
+
+        response = api_client.get('/api/v1/metrics/')
+        body = response.content.decode()
+
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert 'edf_requests_total{view="concentrateur-list",method="GET",status="200"} 1' in body
+        assert 'edf_request_duration_seconds_count{view="concentrateur-list",method="GET"} 1' in body
+        assert 'edf_request_queries_bucket{view="concentrateur-list",method="GET",le="+Inf"} 1' in body
+        assert '# TYPE edf_response_size_bytes histogram' in body
+        assert 'edf_request_serialization_seconds_count{view="concentrateur-list",method="GET"} 1' in body
+
+    def test_metrics_require_admin_profile(self, api_client, user_magasin):
+        api_client.force_authenticate(user_magasin)
+        assert api_client.get('/api/v1/metrics/').status_code == 403
+
+    def test_structured_log_line(self, api_client, user_magasin, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+
+        with mock.patch.object(request_logger, 'info') as log:
+            api_client.get(f'/api/v1/concentrateurs/{concentrateur_livraison.n_serie}/')
+
+        entry = orjson.loads(log.call_args.args[0])
+        assert entry['view'] == 'concentrateur-detail'
+        assert entry['status'] == 200
+        assert entry['user'] == user_magasin.pk
+        assert entry['queries'] >= 1
+        assert entry['size'] > 0
+        assert set(entry) >= {'duration_ms', 'db_ms', 'serialization_ms', 'render_ms'}
+
+    def test_serializer_time_is_reported(self, api_client, user_magasin, concentrateur_livraison):
+        api_client.force_authenticate(user_magasin)
+
+        with mock.patch.object(request_logger, 'info') as log, \
+                mock.patch.object(SerializationTimer, 'add', wraps=SerializationTimer.add) as add:
+            api_client.get('/api/v1/concentrateurs/')
+
+        entry = orjson.loads(log.call_args.args[0])
+        assert entry['view'] == 'concentrateur-list'
+        assert entry['serialization_ms'] > 0
+        # many=True goes through TimedListSerializer: one measure for the page
+        assert add.call_count == 1
+
+
+@pytest.mark.django_db
+class TestProfiling:
+
+    @pytest.fixture
+    def staff(self):
+        return User.objects.create_user(username='staff', password='password', profil='admin', is_staff=True)
+
+    def store(self, tmp_path):
+        return ProfileStore(tmp_path, 50)
+
+    def test_disabled_by_default(self, api_client, user_magasin, tmp_path, settings):
+        settings.PROFILE_DIR = tmp_path
+        api_client.force_login(user_magasin)
+
+        response = api_client.get('/api/v1/concentrateurs/')
+
+        assert 'X-Profile-Id' not in response
+        assert self.store(tmp_path).entries() == []
+
+    def test_slow_requests_are_sampled_into_ring_buffer(self, api_client, user_magasin, tmp_path, settings):
+        settings.PROFILE_REQUESTS = True
+        settings.PROFILE_THRESHOLD_MS = 0
+        settings.PROFILE_DIR = tmp_path
+        settings.PROFILE_KEEP = 2
+        api_client.force_login(user_magasin)
+
+        ids = [api_client.get('/api/v1/dashboard/stats/')['X-Profile-Id'] for _ in range(3)]
+
+        entries = self.store(tmp_path).entries()
+        assert [entry['id'] for entry in entries] == ids[:0:-1]
+        profile = self.store(tmp_path).get(ids[-1])
+        assert profile['trigger'] == 'slow'
+        assert profile['kind'] == 'stacks'
+        assert profile['view'] == 'dashboard-stats'
+        assert profile['queries'] == len(profile['sql']) > 0
+
+    def test_staff_header_forces_cprofile_and_admin_browses_it(self, client, staff, tmp_path, settings):
+        settings.PROFILE_DIR = tmp_path
+        client.force_login(staff)
+
+        profile_id = client.get('/api/v1/dashboard/stats/', HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        profile = self.store(tmp_path).get(profile_id)
+        assert profile['trigger'] == 'forced'
+        assert 'cumulative' in profile['profile']
+        assert profile_id in client.get('/admin/profiles/').content.decode()
+        detail = client.get(f'/admin/profiles/{profile_id}/')
+        assert detail.status_code == 200
+        assert 'SELECT' in detail.content.decode()
+
+    def test_admin_pages_require_staff(self, client, user_magasin, tmp_path, settings):
+        settings.PROFILE_DIR = tmp_path
+        client.force_login(user_magasin)
+
+        assert client.get('/admin/profiles/').status_code == 302
+        assert self.store(tmp_path).get('../settings') is None
@@ -1,5 +1,16 @@
+import io
+from collections import Counter
+from datetime import timedelta
+from importlib import import_module
+
 import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
 from apps.inventory.models import Etat, Affectation, Concentrateur
+from apps.tracking.models import Alert, AlertRule, Historique, LifecycleStage
+from services import alerts, lifecycle
 from services.business_logic import ConcentrateurService, TransitionError, PermissionError
 
 @pytest.mark.django_db
@@ -122,3 +133,159 @@ class TestConcentrateurService:
         assert concentrateur_livraison.etat == Etat.EN_ATTENTE_RECONDITIONNEMENT
         assert concentrateur_livraison.affectation == Affectation.MAGASIN
         assert concentrateur_livraison.carton is None # Détaché
+
+
+@pytest.mark.django_db
+class TestLifecycleStages:
+
+    STAGE_COLUMNS = ('etat', 'affectation', 'poste', 'bo', 'user_id', 'entered_at', 'left_at', 'cycle_started_at')
+
+    def all_stages(self):
+        return Counter(LifecycleStage.objects.values_list('concentrateur_id', *self.STAGE_COLUMNS))
+
+    def stages(self, k):
+        return list(LifecycleStage.objects.filter(concentrateur=k).order_by('entered_at', 'id')
+                    .values_list(*self.STAGE_COLUMNS))
+
+    def test_transitions_close_and_open_stages(self, user_magasin, user_bo_commande, user_bo_terrain, user_labo,
+                                               carton_livraison, concentrateur_livraison, poste_bo_nord):
+        for i in range(3):
+            Concentrateur.objects.create(n_serie=f'S-{i}', carton=carton_livraison, operateur='Bouygues')
+        k = concentrateur_livraison
+
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+        ConcentrateurService.commander_cartons('Bouygues', 1, user_bo_commande)
+        ConcentrateurService.poser_concentrateur(k.n_serie, poste_bo_nord.id, user_bo_terrain)
+        ConcentrateurService.deposer_concentrateur(poste_bo_nord.id, k.n_serie, user_bo_terrain)
+        ConcentrateurService.tester_concentrateur(k.n_serie, False, user_labo)
+
+        stages = LifecycleStage.objects.filter(concentrateur=k).order_by('entered_at', 'id')
+        assert [(s.etat, s.affectation, s.poste, s.bo) for s in stages] == [
+            (Etat.EN_LIVRAISON, '', '', ''),
+            (Etat.EN_STOCK, Affectation.MAGASIN, '', ''),
+            (Etat.EN_STOCK, Affectation.BO_NORD, '', Affectation.BO_NORD),
+            (Etat.POSE, Affectation.BO_NORD, 'POSTE01', Affectation.BO_NORD),
+            (Etat.A_TESTER, Affectation.LABO, '', Affectation.BO_NORD),
+            (Etat.HS, '', '', ''),
+        ]
+        for stage, following in zip(stages, stages[1:]):
+            assert stage.left_at == following.entered_at
+            assert stage.duration == stage.left_at - stage.entered_at
+        assert stages[5].left_at is None and stages[5].duration is None
+        assert stages[3].cycle_started_at == stages[1].entered_at
+        assert lifecycle.cycle_time(stages[0].entered_at)['count'] == 1
+
+        incremental = self.stages(k)
+        call_command('rebuild_lifecycle', stdout=io.StringIO())
+        assert self.stages(k) == incremental
+        assert LifecycleStage.objects.filter(left_at__isnull=True).count() == Concentrateur.objects.count()
+
+    def test_rebuild_from_generated_history_and_stats(self, api_client, user_magasin):
+        call_command('generate_dataset', '--cartons', '30', '--postes', '9', '--days', '200', '--seed', '4',
+                     stdout=io.StringIO())
+
+        call_command('rebuild_lifecycle', '--batch-size', '100', stdout=io.StringIO())
+
+        open_stages = LifecycleStage.objects.filter(left_at__isnull=True)
+        assert open_stages.count() == Concentrateur.objects.count()
+        assert set(open_stages.values_list('concentrateur_id', 'etat', 'affectation')) == \
+            set(Concentrateur.objects.values_list('id', 'etat', 'affectation'))
+        # One closed stage per transition, plus the stage each K was created in
+        assert LifecycleStage.objects.count() == Historique.objects.count() + Concentrateur.objects.count()
+
+        api_client.force_authenticate(user_magasin)
+        data = api_client.get('/api/v1/dashboard/lifecycle/', {'days': 365}).data
+        stages = {(s['etat'], s['affectation']): s for s in data['stages']}
+        pose = stages[(Etat.POSE, Affectation.BO_NORD)]
+        durations = sorted(
+            LifecycleStage.objects.filter(etat=Etat.POSE, affectation=Affectation.BO_NORD, left_at__isnull=False)
+            .values_list('duration', flat=True)
+        )
+        assert pose['visits'] == len(durations)
+        assert pose['p50_hours'] == round(durations[(len(durations) + 1) // 2 - 1].total_seconds() / 3600, 1)
+        assert pose['p50_hours'] <= pose['p90_hours']
+        assert data['cycle_time']['count'] > 0 and data['cycle_time']['mean_days'] > 0
+        assert api_client.get('/api/v1/dashboard/lifecycle/', {'days': 'x'}).status_code == 400
+
+    def test_upgrade_backfill_feeds_the_cycle_time_kpi(self, api_client, user_magasin):
+        call_command('generate_dataset', '--cartons', '30', '--postes', '9', '--days', '200', '--seed', '4',
+                     stdout=io.StringIO())
+        built = self.all_stages()
+        LifecycleStage.objects.all().delete()  # As before the lifecycle stages existed
+        name = '0012_backfill_lifecycle_stages'
+        migration = import_module(f'apps.tracking.migrations.{name}')
+        state = MigrationExecutor(connection).loader.project_state(('tracking', name))
+
+        migration.backfill_stages(state.apps, None)
+
+        assert self.all_stages() == built
+        api_client.force_authenticate(user_magasin)
+        assert api_client.get('/api/v1/dashboard/stats/').data['kpis']['avg_cycle_time'] > 0
+
+
+@pytest.mark.django_db
+class TestAlerts:
+
+    def open_alerts(self):
+        return {(a.rule.name, a.rule.affectation): a.value
+                for a in Alert.objects.filter(closed_at__isnull=True).select_related('rule')}
+
+    def test_transitions_open_refresh_and_close(self, api_client, user_magasin, user_bo_commande, user_bo_terrain,
+                                                user_labo, carton_livraison, concentrateur_livraison, poste_bo_nord):
+        # Default rules: the former THRESHOLD = 5 per BO, opened by the migration on an empty fleet
+        assert self.open_alerts() == {('Stock Critique', bo): 0 for bo in ('BO Nord', 'BO Centre', 'BO Sud')}
+        for i in range(4):
+            Concentrateur.objects.create(n_serie=f'S-{i}', carton=carton_livraison, operateur='Bouygues')
+        k = concentrateur_livraison
+
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+        ConcentrateurService.commander_cartons('Bouygues', 1, user_bo_commande)
+        assert ('Stock Critique', 'BO Nord') not in self.open_alerts()
+
+        ConcentrateurService.poser_concentrateur(k.n_serie, poste_bo_nord.id, user_bo_terrain)
+        ConcentrateurService.deposer_concentrateur(poste_bo_nord.id, k.n_serie, user_bo_terrain)
+        assert self.open_alerts()[('Stock Critique', 'BO Nord')] == 4
+        assert Alert.objects.filter(rule__affectation='BO Nord').exclude(closed_at=None).count() == 1
+
+        # The Labo backlog ages without transitions: caught by the periodic run
+        LifecycleStage.objects.filter(concentrateur=k, left_at__isnull=True)\
+            .update(entered_at=timezone.now() - timedelta(days=40))
+        call_command('evaluate_alerts', stdout=io.StringIO())
+        assert self.open_alerts()[('Backlog Labo', 'Labo')] == 40
+
+        api_client.force_authenticate(user_magasin)
+        alerts = api_client.get('/api/v1/dashboard/stats/').data['alerts']
+        assert {(a['title'], a['location'], a['type']) for a in alerts} == {
+            ('Stock Critique', 'BO Nord', 'warning'), ('Stock Critique', 'BO Centre', 'warning'),
+            ('Stock Critique', 'BO Sud', 'warning'), ('Backlog Labo', 'Labo', 'info'),
+        }
+
+        ConcentrateurService.tester_concentrateur(k.n_serie, False, user_labo)
+        assert ('Backlog Labo', 'Labo') not in self.open_alerts()
+
+    def test_rule_scopes_and_deactivation(self, user_magasin, carton_livraison, concentrateur_livraison):
+        rule = AlertRule.objects.create(name='Trop de stock', kind=AlertRule.Kind.STOCK_MAX, threshold=0,
+                                        affectation='Magasin', etat=Etat.EN_STOCK, operateur='Orange')
+        watched = AlertRule.objects.create(name='Trop de stock', kind=AlertRule.Kind.STOCK_MAX, threshold=0,
+                                           affectation='Magasin', etat=Etat.EN_STOCK, operateur='Bouygues')
+
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+
+        assert not rule.alerts.exists()
+        alert = watched.alerts.get()
+        assert alert.closed_at is None and alert.message == 'Stock élevé sur Magasin / Bouygues / En stock (1 unités)'
+
+        watched.active = False
+        watched.save()
+        assert alerts.evaluate([watched]) == {'opened': 0, 'refreshed': 0, 'closed': 1}
+
+    def test_concurrently_opened_alert_does_not_fail_the_transition(self, user_magasin, carton_livraison,
+                                                                    concentrateur_livraison):
+        rule = AlertRule.objects.create(name='Trop de stock', kind=AlertRule.Kind.STOCK_MAX, threshold=0,
+                                        affectation='Magasin', etat=Etat.EN_STOCK)
+        stale = list(alerts._with_open_alert(AlertRule.objects.filter(pk=rule.pk)))
+        ConcentrateurService.reception_carton(carton_livraison.num_carton, user_magasin)
+
+        alerts._apply(stale)
+
+        assert rule.alerts.filter(closed_at__isnull=True).count() == 1
@@ -0,0 +1,464 @@
+import io
+import json
+import threading
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.utils import timezone
+from apps.core.middleware import RequestMetricsMiddleware
+from apps.inventory.management.commands.populate_gps import ZONE_CENTERS, JITTER
+from apps.inventory.models import Concentrateur, Carton, Poste, Affectation, Etat
+from apps.tracking.models import ActionType, Historique, HistoriqueArchive, InventorySnapshot, StockLevel
+from services.business_logic import ConcentrateurService
+from services.slow_queries import fingerprint
+from services.snapshots import live_rows, state_as_of
+from services.stock_levels import day_start
+
+
+@pytest.mark.django_db
+class TestPopulateGps:
+
+    @pytest.fixture
+    def fleet(self):
+        return Concentrateur.objects.bulk_create([
+            Concentrateur(n_serie=f'K{i}', operateur='Orange', affectation=zone)
+            for i, zone in enumerate(['BO Nord', 'BO Sud', 'Labo', '', 'BO Nord'])
+        ])
+
+    def coords(self):
+        return dict(Concentrateur.objects.values_list('n_serie', 'latitude'))
+
+    def test_fills_missing_coordinates_only(self, fleet):
+        Concentrateur.objects.filter(n_serie='K4').update(latitude=1.0, longitude=2.0)
+        before = dict(Concentrateur.objects.values_list('n_serie', 'updated_at'))
+        out = io.StringIO()
+
+        call_command('populate_gps', '--seed', '1', stdout=out)
+
+        assert 'updated 3 concentrators' in out.getvalue()
+        for k in Concentrateur.objects.exclude(n_serie__in=['K3', 'K4']):
+            lat, lng = ZONE_CENTERS[k.affectation]
+            assert abs(k.latitude - lat) <= JITTER and abs(k.longitude - lng) <= JITTER
+        assert Concentrateur.objects.get(n_serie='K3').latitude is None
+        assert Concentrateur.objects.get(n_serie='K4').latitude == 1.0
+        assert dict(Concentrateur.objects.values_list('n_serie', 'updated_at')) == before
+
+    def test_seed_is_reproducible(self, fleet):
+        call_command('populate_gps', '--seed', '7', stdout=io.StringIO())
+        first = self.coords()
+        Concentrateur.objects.update(latitude=None, longitude=None)
+
+        call_command('populate_gps', '--seed', '7', '--batch-size', '2', stdout=io.StringIO())
+
+        assert self.coords() == first
+
+
+@pytest.mark.django_db
+class TestGenerateDataset:
+
+    def generate(self, *args):
+        call_command('generate_dataset', '--cartons', '50', '--postes', '9', '--days', '400', *args,
+                     stdout=io.StringIO())
+
+    def test_lifecycles_match_historique(self):
+        self.generate('--seed', '3')
+
+        assert Concentrateur.objects.count() == 200
+        assert Carton.objects.filter(is_reconditionne=False).count() == 50
+        for k in Concentrateur.objects.prefetch_related('historique'):
+            events = sorted(k.historique.all(), key=lambda h: h.timestamp)
+            assert events[0].action == ActionType.RECEPTION
+            last_etat = [h.nouvel_etat for h in events if h.nouvel_etat][-1]
+            assert k.etat == last_etat
+            assert (k.poste_pose_id is not None) == (k.etat == Etat.POSE)
+        oldest = Historique.objects.order_by('timestamp').first().timestamp
+        assert (timezone.now() - oldest).days > 300
+
+    def test_seed_is_reproducible_and_rerun_refused(self):
+        self.generate('--seed', '5')
+        first = list(Concentrateur.objects.order_by('n_serie').values_list('n_serie', 'etat', 'affectation'))
+        Historique.objects.all().delete()
+        Concentrateur.objects.all().delete()
+        Carton.objects.all().delete()
+        Poste.objects.all().delete()
+
+        self.generate('--seed', '5')
+
+        assert list(Concentrateur.objects.order_by('n_serie').values_list('n_serie', 'etat', 'affectation')) == first
+        with pytest.raises(CommandError):
+            self.generate()
+
+    def test_reconditioning_after_generate_numbers_new_cartons(self, user_labo):
+        self.generate('--seed', '3')
+        Concentrateur.objects.filter(operateur='Bouygues', etat=Etat.EN_ATTENTE_RECONDITIONNEMENT).delete()
+        Concentrateur.objects.bulk_create([
+            Concentrateur(n_serie=f'TEST{i:04d}', operateur='Bouygues', etat=Etat.A_TESTER, affectation=Affectation.LABO)
+            for i in range(8)
+        ])
+
+        created = [
+            ConcentrateurService.tester_concentrateur(f'TEST{i:04d}', True, user_labo).get('carton_reconditionne')
+            for i in range(8)
+        ]
+
+        assert [c['num_carton'] for c in created if c] == ['KB71R000001', 'KB71R000002']
+
+
+@pytest.mark.django_db
+class TestSlowQueries:
+
+    @pytest.fixture
+    def log(self, settings, tmp_path):
+        settings.SLOW_QUERY_LOG = tmp_path / 'slow.jsonl'
+        settings.SLOW_QUERY_MS = 1e-6
+        settings.SLOW_QUERY_LOG_PARAMS = True
+        return settings.SLOW_QUERY_LOG
+
+    def entries(self, log):
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+    def test_fingerprint_ignores_literals_and_in_list_length(self):
+        assert fingerprint('SELECT * FROM k WHERE id IN (%s, %s) LIMIT 21') == \
+            fingerprint('SELECT  * FROM k WHERE id IN (%s, %s, %s)\nLIMIT 50')
+        assert fingerprint("SELECT 1 FROM k WHERE etat = 'pose'") != fingerprint('SELECT 1 FROM carton')
+
+    def test_captures_call_site_params_and_plan_once(self, log, concentrateur_livraison):
+        for _ in range(2):
+            list(Concentrateur.objects.filter(carton__num_carton='CARTON001', etat=Etat.EN_LIVRAISON))
+
+        entries = [e for e in self.entries(log) if e['sql'].startswith('SELECT "inventory_concentrateur"')]
+        assert len(entries) == 2
+        assert entries[0]['fingerprint'] == entries[1]['fingerprint']
+        assert entries[0]['call_site'].startswith('tests/test_commands.py:')
+        assert entries[0]['params'] == ['CARTON001', Etat.EN_LIVRAISON]
+        assert 'inventory_carton' in entries[0]['plan'] or 'SEARCH' in entries[0]['plan']
+        assert 'plan' not in entries[1]
+
+    def test_disabled_with_zero_threshold(self, log, settings):
+        settings.SLOW_QUERY_MS = 0
+
+        Concentrateur.objects.count()
+
+        assert not log.exists()
+
+    def test_params_opt_in_and_rotation(self, log, settings, concentrateur_livraison):
+        settings.SLOW_QUERY_LOG_PARAMS = False
+        settings.SLOW_QUERY_LOG_MAX_BYTES = 1
+
+        Concentrateur.objects.filter(n_serie='S12345').count()
+        Concentrateur.objects.filter(n_serie='S12345').count()
+
+        assert all(entry['params'] is None for entry in self.entries(log))
+        assert len(self.entries(log)) == 1
+        assert log.with_name('slow.jsonl.1').exists()
+
+    def test_report_groups_by_fingerprint(self, log, concentrateur_livraison):
+        for _ in range(3):
+            Concentrateur.objects.filter(etat=Etat.POSE).count()
+        out = io.StringIO()
+
+        call_command('slow_query_report', '--sort', 'count', '--clear', stdout=out)
+
+        output = out.getvalue()
+        assert 'distinct statements' in output
+        assert 'x3' in output
+        assert 'plan:' in output
+        assert log.read_text() == ''
+
+    def test_connection_opened_inside_a_request_keeps_one_wrapper(self, log, rf):
+        def get_response(request):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse('ok')
+
+        def requests():
+            middleware = RequestMetricsMiddleware(get_response)
+            try:
+                # The thread's first connection opens inside the middleware's wrapper
+                for _ in range(4):
+                    middleware(rf.get('/'))
+                wrappers.extend(type(wrapper).__name__ for wrapper in connection.execute_wrappers)
+            finally:
+                connection.close()
+
+        wrappers = []
+        thread = threading.Thread(target=requests)
+        thread.start()
+        thread.join()
+
+        assert wrappers == ['SlowQueryLogger']
+
+
+@pytest.mark.django_db
+class TestArchiveHistorique:
+
+    @pytest.fixture
+    def history(self, concentrateur_livraison, user_magasin):
+        """One row per month over the last 8 months, newest first."""
+        now = timezone.now()
+        rows = Historique.objects.bulk_create([
+            Historique(concentrateur=concentrateur_livraison, action=ActionType.MODIFICATION,
+                       user=user_magasin, commentaire=f'M-{age}')
+            for age in range(8)
+        ])
+        for age, row in enumerate(rows):
+            Historique.objects.filter(pk=row.pk).update(timestamp=now - timedelta(days=31 * age))
+        return rows
+
+    def test_moves_cold_months_and_keeps_ids(self, history):
+        out = io.StringIO()
+
+        call_command('archive_historique', '--hot-months', '3', stdout=out)
+
+        archived = HistoriqueArchive.objects.order_by('-timestamp')
+        assert Historique.objects.count() + archived.count() == 8
+        assert Historique.objects.count() in (3, 4)
+        cutoff = min(h.timestamp for h in Historique.objects.all())
+        assert all(a.timestamp < cutoff for a in archived)
+        assert all(a.month == timezone.localtime(a.timestamp).date().replace(day=1) for a in archived)
+        assert {a.id for a in archived} <= {h.id for h in history}
+        assert 'Archived' in out.getvalue()
+
+    def test_timeline_and_export_include_archives(self, history, concentrateur_livraison, api_client, user_magasin):
+        call_command('archive_historique', '--hot-months', '3', stdout=io.StringIO())
+        api_client.force_authenticate(user_magasin)
+
+        timeline = api_client.get(f'/api/v1/concentrateurs/{concentrateur_livraison.n_serie}/historique/').data
+        export = b''.join(api_client.get('/api/v1/historique/export/').streaming_content).decode().splitlines()
+
+        assert [row['commentaire'] for row in timeline] == [f'M-{age}' for age in range(8)]
+        assert [line.split(';')[-1] for line in export[1:]] == [f'M-{age}' for age in reversed(range(8))]
+        assert [h.commentaire for h in Historique.timeline(concentrateur_livraison, limit=5)] == \
+            [f'M-{age}' for age in range(5)]
+
+    def test_dry_run_and_minimum_window(self, history):
+        out = io.StringIO()
+
+        call_command('archive_historique', '--hot-months', '3', '--dry-run', stdout=out)
+
+        assert 'Would archive' in out.getvalue()
+        assert not HistoriqueArchive.objects.exists()
+        with pytest.raises(CommandError):
+            call_command('archive_historique', '--hot-months', '2')
+
+
+@pytest.mark.django_db
+class TestInventorySnapshots:
+
+    @pytest.fixture
+    def dataset(self):
+        call_command('generate_dataset', '--cartons', '40', '--postes', '9', '--days', '300', '--seed', '11',
+                     stdout=io.StringIO())
+
+    def expected(self, at):
+        """(etat, affectation) per K at ``at``, folded from its full history."""
+        state = {
+            pk: [Etat.EN_LIVRAISON, '']
+            for pk in Concentrateur.objects.filter(created_at__lte=at).values_list('id', flat=True)
+        }
+        for h in Historique.objects.filter(timestamp__lte=at).order_by('timestamp', 'id'):
+            if h.ancien_etat or h.nouvel_etat:
+                state[h.concentrateur_id][0] = h.nouvel_etat
+            if h.ancienne_affectation or h.nouvelle_affectation:
+                state[h.concentrateur_id][1] = h.nouvelle_affectation
+        return state
+
+    def test_command_stores_live_state_and_prunes_dailies(self, dataset):
+        today = timezone.localdate()
+        old = [today - timedelta(days=age) for age in (40, 50, 60)]
+        InventorySnapshot.objects.bulk_create([
+            InventorySnapshot(day=day, taken_at=timezone.now() - timedelta(days=400), data=InventorySnapshot.pack({}))
+            for day in old
+        ])
+        out = io.StringIO()
+
+        call_command('snapshot_inventory', '--keep-days', '30', stdout=out)
+
+        snapshot = InventorySnapshot.objects.get(day=today)
+        assert snapshot.concentrateurs == Concentrateur.objects.count()
+        assert snapshot.unpack() == live_rows()
+        assert set(InventorySnapshot.objects.values_list('day', flat=True)) == \
+            {today} | {day for day in old if day.day == 1}
+        assert 'Snapshot of' in out.getvalue()
+
+    def test_replay_from_snapshot_matches_full_history(self, dataset):
+        now = timezone.now()
+        at = now - timedelta(days=100)
+        rewound = state_as_of(at)
+        assert rewound['snapshot'] is None
+        assert {pk: row[1:3] for pk, row in rewound['rows'].items()} == self.expected(at)
+
+        base = now - timedelta(days=150)
+        InventorySnapshot.objects.create(
+            day=base.date(), taken_at=base, data=InventorySnapshot.pack(state_as_of(base)['rows'])
+        )
+        replayed = state_as_of(at)
+
+        assert replayed['snapshot'].taken_at == base
+        assert replayed['replayed'] > 0
+        assert replayed['rows'] == rewound['rows']
+        assert state_as_of(now)['rows'] == live_rows()
+
+
+@pytest.mark.django_db
+class TestReplayHistorique:
+
+    @pytest.fixture
+    def dataset(self):
+        call_command('generate_dataset', '--cartons', '30', '--postes', '9', '--days', '200', '--seed', '8',
+                     stdout=io.StringIO())
+
+    def replay(self, *args):
+        out = io.StringIO()
+        call_command('replay_historique', *args, stdout=out)
+        return out.getvalue()
+
+    def drift(self):
+        """Corrupt three concentrateurs the history knows about; returns their n_serie."""
+        posed = Concentrateur.objects.filter(etat=Etat.POSE).order_by('n_serie').first()
+        tested = Concentrateur.objects.filter(etat=Etat.HS).order_by('n_serie').first()
+        ordered = Historique.objects.filter(action=ActionType.COMMANDE_BO).order_by('id').first().concentrateur
+        Concentrateur.objects.filter(pk=posed.pk).update(poste_pose=None)
+        Concentrateur.objects.filter(pk=tested.pk).update(etat=Etat.EN_STOCK, affectation='Magasin')
+        Concentrateur.objects.filter(pk=ordered.pk).update(affectation='BO Sud' if ordered.affectation != 'BO Sud'
+                                                           else 'BO Nord')
+        return {posed.n_serie: posed, tested.n_serie: tested, ordered.n_serie: ordered}
+
+    def test_generated_history_has_no_drift(self, dataset):
+        assert 'No drift' in self.replay()
+
+    def test_reports_then_fixes_drift(self, dataset):
+        expected = self.drift()
+
+        report = self.replay('--limit', '10')
+
+        assert '3 drifted concentrateurs' in report
+        assert all(n_serie in report for n_serie in expected)
+        assert Historique.objects.filter(action=ActionType.MODIFICATION).count() == 0
+
+        fixed = self.replay('--fix')
+
+        assert 'Rewrote 3 concentrateurs' in fixed
+        for n_serie, before in expected.items():
+            k = Concentrateur.objects.get(n_serie=n_serie)
+            assert (k.etat, k.affectation, k.poste_pose_id) == (before.etat, before.affectation, before.poste_pose_id)
+        assert Historique.objects.filter(action=ActionType.MODIFICATION).count() == 3
+        assert 'No drift' in self.replay()
+
+    def test_fix_skips_postes_that_no_longer_exist(self, dataset):
+        expected = self.drift()
+        posed = Concentrateur.objects.filter(etat=Etat.POSE).exclude(n_serie__in=expected).order_by('n_serie').first()
+        poste = posed.poste_pose
+        on_poste = Concentrateur.objects.filter(poste_pose=poste).exclude(n_serie__in=expected).count()
+        Poste.objects.filter(pk=poste.pk).update(code='RENOMME')
+
+        fixed = self.replay('--fix', '--limit', '100')
+
+        assert 'Rewrote 3 concentrateurs' in fixed
+        assert f'Skipped {on_poste} concentrateurs' in fixed
+        assert f"{posed.n_serie}: poste {poste.code!r}" in fixed
+        assert Concentrateur.objects.filter(poste_pose=poste).exclude(n_serie__in=expected).count() == on_poste
+
+    def test_from_snapshot(self, dataset):
+        with pytest.raises(CommandError):
+            self.replay('--from-snapshot')
+        call_command('snapshot_inventory', stdout=io.StringIO())
+        self.drift()
+
+        assert '3 drifted concentrateurs' in self.replay('--from-snapshot')
+
+
+@pytest.mark.django_db
+class TestRollupStockLevels:
+
+    @pytest.fixture
+    def dataset(self):
+        call_command('generate_dataset', '--cartons', '30', '--postes', '9', '--days', '120', '--seed', '5',
+                     stdout=io.StringIO())
+
+    def levels(self):
+        return list(StockLevel.objects.values_list('day', 'affectation', 'etat', 'operateur', 'count'))
+
+    def rollup(self, *args):
+        out = io.StringIO()
+        call_command('rollup_stock_levels', *args, stdout=out)
+        return out.getvalue()
+
+    def test_incremental_matches_history(self, dataset):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        middle = yesterday - timedelta(days=60)
+
+        self.rollup('--until', str(middle))
+        assert 'Rolled 0 days' in self.rollup('--until', str(middle))
+        self.rollup()
+        incremental = self.levels()
+
+        first = StockLevel.objects.order_by('day').first().day
+        self.rollup('--since', str(first))
+        assert self.levels() == incremental
+        assert StockLevel.objects.latest('day').day == yesterday
+
+        # End of a past day, as replayed from the Historique
+        operateurs = dict(Concentrateur.objects.values_list('id', 'operateur'))
+        for day in (middle, yesterday):
+            expected = {}
+            for pk, row in state_as_of(day_start(day + timedelta(days=1)) - timedelta(microseconds=1))['rows'].items():
+                key = (row[2], row[1], operateurs[pk])
+                expected[key] = expected.get(key, 0) + 1
+            assert {
+                (affectation, etat, operateur): count
+                for _, affectation, etat, operateur, count in StockLevel.objects.filter(day=day, count__gt=0)
+                .values_list('day', 'affectation', 'etat', 'operateur', 'count')
+            } == expected
+
+    def test_api_series(self, dataset, api_client, user_magasin):
+        self.rollup()
+        yesterday = timezone.localdate() - timedelta(days=1)
+        start = yesterday - timedelta(days=364)
+        api_client.force_authenticate(user_magasin)
+
+        data = api_client.get('/api/v1/dashboard/stock-levels/', {
+            'start': str(start), 'end': str(yesterday), 'by': 'affectation', 'etat': Etat.EN_STOCK,
+        }).data
+
+        assert all(len(series['points']) == 365 for series in data['series'])
+        totals = {series['affectation']: series['points'][-1] for series in data['series']}
+        in_stock = StockLevel.objects.filter(day=yesterday, etat=Etat.EN_STOCK)
+        assert totals == {
+            affectation: [yesterday, sum(in_stock.filter(affectation=affectation).values_list('count', flat=True))]
+            for affectation in in_stock.values_list('affectation', flat=True)
+        }
+        assert api_client.get('/api/v1/dashboard/stock-levels/', {'by': 'poste'}).status_code == 400
+        assert api_client.get('/api/v1/dashboard/stock-levels/', {'start': str(yesterday), 'end': str(start)})\
+            .status_code == 400
+        assert api_client.get('/api/v1/dashboard/stock-levels/', {'start': '2025-02-30'}).status_code == 400
+
+    @pytest.mark.parametrize('mode', [(), ('--bulk',)])
+    def test_imported_k_are_counted_from_their_import(self, mode, tmp_path, monkeypatch, user_magasin):
+        header = 'num_carton;operateur;n_serie_concentrateur;affectation;etat;poste_pose;' \
+                 'date_affectation;date_pose;date_dernier_etat\n'
+        imports = [
+            (10, ';Bouygues;K-OLD;Magasin;en_stock;;;;\n'),
+            (3, ''.join(f'CB010;Bouygues;K-{i};;en_livraison;;;;\n' for i in range(4))),
+        ]
+        now = timezone.now()
+        for days_ago, rows in imports:
+            path = tmp_path / f'import_{days_ago}.csv'
+            path.write_text(header + rows, encoding='utf-8')
+            monkeypatch.setattr(timezone, 'now', lambda days_ago=days_ago: now - timedelta(days=days_ago))
+            call_command('import_csv', str(path), *mode, stdout=io.StringIO())
+        monkeypatch.undo()
+
+        self.rollup('--until', str(timezone.localdate() - timedelta(days=1)))
+        ConcentrateurService.reception_carton('CB010', user_magasin)
+        self.rollup('--until', str(timezone.localdate()))
+
+        levels = StockLevel.objects.filter(day=timezone.localdate()).exclude(count=0)
+        assert {row[:3]: row[3] for row in levels.values_list('affectation', 'etat', 'operateur', 'count')} \
+            == dict(Counter(Concentrateur.objects.values_list('affectation', 'etat', 'operateur'))) \
+            == {('Magasin', Etat.EN_STOCK, 'Bouygues'): 5}
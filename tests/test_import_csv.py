@@ -0,0 +1,263 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from apps.inventory.management.commands.import_csv import Command as ImportCommand
+from apps.inventory.models import Etat, Affectation, Concentrateur, Carton, Poste, ImportCheckpoint
+from apps.tracking.models import ActionType, ChangeLog, Historique, LifecycleStage
+
+CSV_HEADER = 'num_carton;operateur;n_serie_concentrateur;affectation;etat;poste_pose;date_affectation;date_pose;date_dernier_etat\n'
+CSV_ROWS = [
+    'CB001;Bouygues;K001;Magasin;en_stock;;05/01/2025;;05/01/2025\n',
+    'CB001;Bouygues;K002;BO Nord;pose;DP001;05/01/2025;06/01/2025;06/01/2025\n',
+    'CB002;Orange;K003;Labo;a_tester;;05/01/2025;;05/01/2025\n',
+    ';SFR;;Magasin;en_stock;;;;\n',  # n_serie manquant
+]
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'import.csv'
+    path.write_text(CSV_HEADER + ''.join(CSV_ROWS), encoding='utf-8')
+    return path
+
+
+def run_import(*args):
+    out = io.StringIO()
+    call_command('import_csv', *map(str, args), stdout=out)
+    return out.getvalue()
+
+
+def snapshot():
+    return sorted(Concentrateur.objects.values_list(
+        'n_serie', 'carton__num_carton', 'operateur', 'affectation', 'etat',
+        'poste_pose__code', 'date_affectation', 'date_pose'
+    ))
+
+
+@pytest.mark.django_db
+class TestImportBulk:
+
+    def test_bulk_matches_row_by_row_import(self, csv_file):
+        run_import(csv_file)
+        expected = snapshot()
+        Concentrateur.objects.all().delete()
+        Carton.objects.all().delete()
+        Poste.objects.all().delete()
+
+        output = run_import(csv_file, '--bulk')
+
+        assert snapshot() == expected
+        assert 'Concentrateurs created: 3' in output
+        assert 'Errors: 1' in output
+        assert 'rows/s' in output
+        assert Poste.objects.get(code='DP001').base_operationnelle == 'BO Nord'
+
+    def test_bulk_rerun_only_writes_changed_rows(self, csv_file):
+        run_import(csv_file, '--bulk')
+        csv_file.write_text(
+            CSV_HEADER + ''.join(CSV_ROWS).replace('K003;Labo;a_tester', 'K003;Magasin;en_stock'),
+            encoding='utf-8'
+        )
+
+        output = run_import(csv_file, '--bulk')
+
+        assert 'Concentrateurs updated: 1' in output
+        assert 'Concentrateurs unchanged: 2' in output
+        k = Concentrateur.objects.get(n_serie='K003')
+        assert (k.etat, k.affectation) == (Etat.EN_STOCK, Affectation.MAGASIN)
+
+    @pytest.mark.parametrize('mode', [(), ('--bulk',)])
+    def test_changes_are_logged_for_offline_sync(self, csv_file, mode):
+        run_import(csv_file, *mode)
+        csv_file.write_text(
+            CSV_HEADER + ''.join(CSV_ROWS).replace('K002;BO Nord;pose;DP001', 'K002;Magasin;en_stock;'),
+            encoding='utf-8'
+        )
+        ChangeLog.objects.all().delete()
+
+        run_import(csv_file, *mode)
+
+        k = Concentrateur.objects.get(n_serie='K002')
+        assert set(ChangeLog.objects.filter(scope='BO Nord').values_list('model', 'object_id')) == {
+            (ChangeLog.CONCENTRATEUR, k.id), (ChangeLog.CARTON, k.carton_id),
+        }
+
+    def test_row_by_row_writes_log_and_stages_once_per_batch(self, csv_file):
+        with CaptureQueriesContext(connection) as ctx:
+            output = run_import(csv_file)
+
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        # Plus one ChangeLog entry from the signal of the created poste
+        assert sum(f'"{ChangeLog._meta.db_table}"' in sql for sql in inserts) == 1 + Poste.objects.count()
+        assert sum(f'"{LifecycleStage._meta.db_table}"' in sql for sql in inserts) == 1
+        assert 'Concentrateurs created: 3' in output
+        assert 'Errors: 1' in output
+        assert LifecycleStage.objects.filter(left_at__isnull=True).count() == 3
+        k = Concentrateur.objects.get(n_serie='K002')
+        assert set(ChangeLog.objects.filter(scope='BO Nord').values_list('model', 'object_id')) == {
+            (ChangeLog.CONCENTRATEUR, k.id), (ChangeLog.CARTON, k.carton_id), (ChangeLog.POSTE, k.poste_pose_id),
+        }
+
+    def test_copy_falls_back_to_bulk_outside_postgresql(self, csv_file):
+        output = run_import(csv_file, '--copy')
+
+        assert '--copy requires PostgreSQL' in output
+        assert 'Concentrateurs created: 3' in output
+        assert 'Concentrateurs unchanged: 0' in output
+
+
+@pytest.mark.django_db
+@pytest.mark.postgresql
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason="--copy needs PostgreSQL (USE_POSTGRES=True)")
+class TestImportCopy:
+
+    def logged(self, k):
+        return set(ChangeLog.objects.filter(
+            Q(model=ChangeLog.CONCENTRATEUR, object_id=k.id) | Q(model=ChangeLog.CARTON, object_id=k.carton_id)
+        ).values_list('model', 'object_id', 'scope'))
+
+    def test_copy_matches_bulk_and_logs_changes(self, csv_file):
+        output = run_import(csv_file, '--copy')
+
+        assert '--copy requires PostgreSQL' not in output
+        assert 'Concentrateurs created: 3' in output
+        assert 'Errors: 1' in output
+        k = Concentrateur.objects.get(n_serie='K003')
+        assert self.logged(k) == {(ChangeLog.CONCENTRATEUR, k.id, 'Labo'), (ChangeLog.CARTON, k.carton_id, 'Labo')}
+        assert LifecycleStage.objects.filter(left_at__isnull=True).count() == 3
+        expected = snapshot()
+        Concentrateur.objects.all().delete()
+        Carton.objects.all().delete()
+        Poste.objects.all().delete()
+        run_import(csv_file, '--bulk')
+        assert snapshot() == expected
+
+    def test_copy_rerun_only_updates_changed_rows(self, csv_file):
+        run_import(csv_file, '--copy')
+        ChangeLog.objects.all().delete()
+        csv_file.write_text(
+            CSV_HEADER + ''.join(CSV_ROWS).replace('K003;Labo;a_tester', 'K003;Magasin;en_stock'),
+            encoding='utf-8'
+        )
+
+        output = run_import(csv_file, '--copy')
+
+        assert 'Concentrateurs created: 0' in output
+        assert 'Concentrateurs updated: 1' in output
+        assert 'Concentrateurs unchanged: 2' in output
+        k = Concentrateur.objects.get(n_serie='K003')
+        assert (k.etat, k.affectation) == (Etat.EN_STOCK, Affectation.MAGASIN)
+        assert self.logged(k) == set(ChangeLog.objects.values_list('model', 'object_id', 'scope')) == {
+            (model, object_id, scope)
+            for model, object_id in ((ChangeLog.CONCENTRATEUR, k.id), (ChangeLog.CARTON, k.carton_id))
+            for scope in ('Labo', 'Magasin')
+        }
+
+
+@pytest.mark.django_db
+class TestImportStream:
+
+    def test_crash_then_resume(self, csv_file, monkeypatch):
+        """Committed chunks survive a crash and --resume skips them."""
+        original = ImportCommand._apply_bulk
+        calls = []
+
+        def failing_apply(self, records, stats):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('connexion perdue')
+            return original(self, records, stats)
+
+        monkeypatch.setattr(ImportCommand, '_apply_bulk', failing_apply)
+        with pytest.raises(CommandError):
+            run_import(csv_file, '--stream', '--chunk-size', 1)
+
+        assert list(Concentrateur.objects.values_list('n_serie', flat=True)) == ['K001']
+        assert ImportCheckpoint.objects.get().rows_done == 1
+
+        monkeypatch.setattr(ImportCommand, '_apply_bulk', original)
+        output = run_import(csv_file, '--resume', '--chunk-size', 1)
+
+        assert 'Resuming after row 1' in output
+        assert 'Concentrateurs created: 2' in output
+        assert Concentrateur.objects.count() == 3
+        checkpoint = ImportCheckpoint.objects.get()
+        assert (checkpoint.rows_done, checkpoint.completed) == (4, True)
+
+    def test_resume_completed_file_is_noop(self, csv_file):
+        run_import(csv_file, '--stream')
+
+        output = run_import(csv_file, '--resume')
+
+        assert 'already fully imported' in output
+
+
+@pytest.mark.django_db
+class TestImportParallel:
+
+    def test_workers_match_sequential_import(self, csv_file):
+        run_import(csv_file, '--bulk')
+        expected = snapshot()
+        Concentrateur.objects.all().delete()
+
+        output = run_import(csv_file, '--workers', 2, '--chunk-size', 1)
+
+        assert snapshot() == expected
+        assert 'Concentrateurs created: 3' in output
+        assert 'Errors: 1' in output
+
+    def test_dry_run_writes_error_report(self, csv_file):
+        output = run_import(csv_file, '--dry-run', '--workers', 2, '--chunk-size', 2)
+
+        assert not Concentrateur.objects.exists()
+        assert not ImportCheckpoint.objects.exists()
+        report = (csv_file.parent / 'import.csv.errors.csv').read_text(encoding='utf-8').splitlines()
+        assert report[0].startswith('row;error;num_carton;operateur;')
+        assert report[1:] == ['5;N° série manquant;;SFR;;Magasin;en_stock;;;;']
+        assert 'Error report:' in output
+
+
+@pytest.mark.django_db
+class TestImportDiff:
+
+    def test_diff_writes_only_changes_and_logs_modification(self, csv_file):
+        run_import(csv_file, '--diff')
+        untouched = Concentrateur.objects.get(n_serie='K002').updated_at
+        csv_file.write_text(
+            CSV_HEADER + ''.join(CSV_ROWS[1:]).replace('K003;Labo;a_tester', 'K003;Magasin;en_stock')
+            + 'CB003;SFR;K004;Magasin;en_stock;;;;\n',
+            encoding='utf-8'
+        )
+
+        output = run_import(csv_file, '--diff')
+
+        assert 'Concentrateurs created: 1' in output
+        assert 'Concentrateurs updated: 1' in output
+        assert 'Concentrateurs unchanged: 1' in output
+        assert 'Concentrateurs missing from file: 1' in output
+        assert Concentrateur.objects.get(n_serie='K002').updated_at == untouched
+        entry = Historique.objects.get(action=ActionType.MODIFICATION)
+        assert (entry.concentrateur.n_serie, entry.ancien_etat, entry.nouvel_etat) == (
+            'K003', Etat.A_TESTER, Etat.EN_STOCK
+        )
+        assert entry.commentaire == 'Import import.csv : affectation, etat'
+
+    def test_diff_dry_run_only_counts(self, csv_file):
+        run_import(csv_file, '--diff')
+        csv_file.write_text(
+            CSV_HEADER + ''.join(CSV_ROWS).replace('K003;Labo;a_tester', 'K003;Magasin;en_stock'),
+            encoding='utf-8'
+        )
+
+        output = run_import(csv_file, '--diff', '--dry-run')
+
+        assert 'Concentrateurs updated: 1' in output
+        assert 'Concentrateurs unchanged: 2' in output
+        assert 'Concentrateurs missing from file: 0' in output
+        assert Concentrateur.objects.get(n_serie='K003').etat == Etat.A_TESTER
+        assert not Historique.objects.exists()
@@ -0,0 +1,235 @@
+"""
+Every API endpoint and service method runs at most its declared query
+budget (services/query_budget.py), and the same number of queries on a
+small and on a larger inventory.
+"""
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import urls as api_urls
+from apps.core.models import User
+from apps.inventory.models import Concentrateur, Carton, Poste, Etat, Affectation
+from apps.tracking.models import ActionType, Historique
+from services import lifecycle, stock_levels
+from services.business_logic import ConcentrateurService
+from services.query_budget import budget_for
+from services.snapshots import take_snapshot
+
+pytestmark = pytest.mark.django_db
+
+SIZES = (3, 12)
+
+# name, method, url, payload, profil (None: anonymous)
+API_CASES = [
+    ('auth.csrf', 'get', '/api/v1/auth/csrf/', None, None),
+    ('auth.login', 'post', '/api/v1/auth/login/', lambda d: {'username': 'admin', 'password': 'password'}, None),
+    ('auth.logout', 'post', '/api/v1/auth/logout/', None, 'admin'),
+    ('auth.me', 'get', '/api/v1/auth/me/', None, 'admin'),
+    ('concentrateurs.list', 'get', '/api/v1/concentrateurs/', None, 'admin'),
+    ('concentrateurs.list_fields', 'get', '/api/v1/concentrateurs/?fields=n_serie,etat,carton', None, 'admin'),
+    ('concentrateurs.filter', 'get', '/api/v1/concentrateurs/?etat=en_stock&affectation=BO%20Nord', None, 'admin'),
+    ('concentrateurs.search', 'get', '/api/v1/concentrateurs/?search=STK', None, 'admin'),
+    ('concentrateurs.retrieve', 'get', '/api/v1/concentrateurs/{k_pose}/', None, 'admin'),
+    ('concentrateurs.historique', 'get', '/api/v1/concentrateurs/{k_pose}/historique/', None, 'admin'),
+    ('concentrateurs.export_csv', 'get', '/api/v1/concentrateurs/export/', None, 'admin'),
+    ('concentrateurs.export_ndjson', 'get', '/api/v1/concentrateurs/export/?format=ndjson', None, 'admin'),
+    ('cartons.list', 'get', '/api/v1/cartons/', None, 'admin'),
+    ('cartons.retrieve', 'get', '/api/v1/cartons/{carton_id}/', None, 'admin'),
+    ('cartons.disponibles', 'get', '/api/v1/cartons/disponibles/', None, 'bo_nord_commande'),
+    ('cartons.en_livraison', 'get', '/api/v1/cartons/en_livraison/', None, 'magasin'),
+    ('postes.list', 'get', '/api/v1/postes/', None, 'bo_nord_terrain'),
+    ('postes.retrieve', 'get', '/api/v1/postes/{poste_id}/', None, 'bo_nord_terrain'),
+    ('historique.export', 'get', '/api/v1/historique/export/', None, 'admin'),
+    ('sync.full', 'get', '/api/v1/sync/changes/', None, 'bo_nord_terrain'),
+    ('sync.delta', 'get', '/api/v1/sync/changes/?since=0', None, 'bo_nord_terrain'),
+    ('dashboard.stats', 'get', '/api/v1/dashboard/stats/', None, 'admin'),
+    ('dashboard.stocks', 'get', '/api/v1/dashboard/stocks/', None, 'admin'),
+    ('dashboard.lifecycle', 'get', '/api/v1/dashboard/lifecycle/', None, 'admin'),
+    ('dashboard.as_of', 'get', '/api/v1/dashboard/as-of/?at={today}&detail=1', None, 'admin'),
+    ('dashboard.stock_levels', 'get', '/api/v1/dashboard/stock-levels/?end={today}', None, 'admin'),
+    ('commande.replenishment', 'get', '/api/v1/commande/replenishment/', None, 'bo_nord_commande'),
+    ('dashboard.stockout_simulation', 'get', '/api/v1/dashboard/stockout-simulation/?trajectories=100', None,
+     'admin'),
+    ('metrics', 'get', '/api/v1/metrics/', None, 'admin'),
+    ('actions.reception', 'post', '/api/v1/actions/reception/',
+     lambda d: {'num_carton': 'LIV'}, 'magasin'),
+    ('actions.commande', 'post', '/api/v1/actions/commande/',
+     lambda d: {'operateur': 'Bouygues', 'nb_cartons': d['size']}, 'bo_nord_commande'),
+    ('actions.pose', 'post', '/api/v1/actions/pose/',
+     lambda d: {'n_serie': 'BO0', 'poste_id': d['poste_libre']}, 'bo_nord_terrain'),
+    ('actions.depose', 'post', '/api/v1/actions/depose/',
+     lambda d: {'n_serie': d['k_pose'], 'poste_id': d['poste_id']}, 'bo_nord_terrain'),
+    ('actions.test', 'post', '/api/v1/actions/test/',
+     lambda d: {'n_serie': 'LAB0', 'resultat_ok': True}, 'labo'),
+]
+
+# method name -> kwargs
+SERVICE_CASES = {
+    'reception_carton': lambda d: {'num_carton': 'LIV', 'user': d['magasin']},
+    'commander_cartons': lambda d: {'operateur': 'Bouygues', 'nb_cartons': d['size'], 'user': d['bo_nord_commande']},
+    'poser_concentrateur': lambda d: {'n_serie': 'BO0', 'poste_id': d['poste_libre'], 'user': d['bo_nord_terrain']},
+    'deposer_concentrateur': lambda d: {'poste_id': d['poste_id'], 'n_serie': d['k_pose'], 'user': d['bo_nord_terrain']},
+    'tester_concentrateur': lambda d: {'n_serie': 'LAB0', 'resultat_ok': True, 'user': d['labo']},
+}
+
+CASE_NAMES = [case[0] for case in API_CASES] + [f'service.{name}' for name in SERVICE_CASES]
+
+
+def build_inventory(size: int) -> dict:
+    """
+    An inventory where every collection grows with ``size``: the delivery
+    carton holds ``size`` K and there are ``size`` cartons to order, K in
+    stock, postes with a K, K to test and days of history.
+    """
+    users = {
+        profil: User.objects.create_user(username=profil, password='password', profil=profil)
+        for profil in ('admin', 'magasin', 'bo_nord_commande', 'bo_nord_terrain', 'labo')
+    }
+    livraison = Carton.objects.create(num_carton='LIV', operateur='Bouygues')
+    cartons = Carton.objects.bulk_create([
+        Carton(num_carton=f'STK{i}', operateur='Bouygues') for i in range(size)
+    ])
+    postes = Poste.objects.bulk_create([
+        Poste(code=f'P{i}', nom=f'Poste {i}', base_operationnelle=Affectation.BO_NORD) for i in range(size)
+    ])
+    poste_libre = Poste.objects.create(code='LIBRE', nom='Libre', base_operationnelle=Affectation.BO_NORD)
+
+    ks = [Concentrateur(n_serie=f'LIV{i}', carton=livraison, operateur='Bouygues') for i in range(size)]
+    ks += [
+        Concentrateur(n_serie=f'STK{i}-{j}', carton=carton, operateur='Bouygues',
+                      etat=Etat.EN_STOCK, affectation=Affectation.MAGASIN)
+        for i, carton in enumerate(cartons) for j in range(4)
+    ]
+    ks += [
+        Concentrateur(n_serie=f'BO{i}', carton=cartons[i], operateur='Bouygues',
+                      etat=Etat.EN_STOCK, affectation=Affectation.BO_NORD)
+        for i in range(size)
+    ]
+    ks += [
+        Concentrateur(n_serie=f'POSE{i}', carton=cartons[i], operateur='Bouygues', etat=Etat.POSE,
+                      affectation=Affectation.BO_NORD, poste_pose=poste, latitude=42.7, longitude=9.45)
+        for i, poste in enumerate(postes)
+    ]
+    ks += [
+        Concentrateur(n_serie=f'LAB{i}', carton=cartons[i], operateur='Bouygues',
+                      etat=Etat.A_TESTER, affectation=Affectation.LABO)
+        for i in range(size)
+    ]
+    # Three K waiting: testing LAB0 OK completes a reconditioned carton
+    ks += [
+        Concentrateur(n_serie=f'REC{i}', operateur='Bouygues',
+                      etat=Etat.EN_ATTENTE_RECONDITIONNEMENT, affectation=Affectation.MAGASIN)
+        for i in range(3)
+    ]
+    ks = Concentrateur.objects.bulk_create(ks)
+
+    posed = [k for k in ks if k.etat == Etat.POSE]
+    Historique.objects.bulk_create(
+        [Historique(concentrateur=k, action=ActionType.RECEPTION, user=users['magasin']) for k in posed]
+        + [Historique(concentrateur=k, action=ActionType.POSE, user=users['bo_nord_terrain'],
+                      poste=k.poste_pose.code) for k in posed]
+    )
+    lifecycle.rebuild()
+    stock_levels.rollup(timezone.localdate())
+    take_snapshot()
+    return {
+        **users,
+        'size': size,
+        'today': timezone.localdate().isoformat(),
+        'carton_id': cartons[0].id,
+        'k_pose': posed[0].n_serie,
+        'poste_id': postes[0].id,
+        'poste_libre': poste_libre.id,
+    }
+
+
+def _view_handler(path: str, method: str):
+    """(view class, handler method) serving ``method`` on ``path``."""
+    callback = resolve(path.split('?')[0]).func
+    actions = getattr(callback, 'actions', None)
+    name = actions[method] if actions else method
+    return callback.cls, getattr(callback.cls, name)
+
+
+def _api_handlers() -> set:
+    """Every (view class, handler) routed by api/urls.py to a view of api.views."""
+    handlers = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is None or view_class.__module__ != 'api.views':
+                continue
+            actions = getattr(pattern.callback, 'actions', None) or {
+                method: method for method in view_class.http_method_names
+                if method not in ('options', 'head') and hasattr(view_class, method)
+            }
+            handlers.update((view_class, getattr(view_class, name)) for name in actions.values())
+
+    walk(api_urls.urlpatterns)
+    return handlers
+
+
+def _run_api_case(client, data, method, url, payload):
+    response = getattr(client, method)(url.format(**data), payload(data) if payload else None, format='json')
+    assert response.status_code == 200, (url, response.status_code, getattr(response, 'data', None))
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+
+@pytest.fixture(scope='module')
+def query_counts(django_db_setup, django_db_blocker):
+    """{case name: {'budget': int, 'counts': {size: queries}, 'handler': ...}}, data rolled back."""
+    results = {name: {'counts': {}} for name in CASE_NAMES}
+
+    def measure(name, func):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                func()
+            transaction.set_rollback(True)
+        results[name]['counts'][size] = len(ctx)
+
+    with django_db_blocker.unblock():
+        for size in SIZES:
+            with transaction.atomic():
+                data = build_inventory(size)
+                for name, method, url, payload, profil in API_CASES:
+                    client = APIClient()
+                    if profil:
+                        client.force_authenticate(data[profil])
+                    view_class, handler = _view_handler(url.format(**data), method)
+                    results[name].update(budget=budget_for(view_class, handler), handler=(view_class, handler))
+                    measure(name, lambda: _run_api_case(client, data, method, url, payload))
+
+                for method_name, kwargs in SERVICE_CASES.items():
+                    name = f'service.{method_name}'
+                    method = getattr(ConcentrateurService, method_name)
+                    results[name]['budget'] = getattr(method, 'query_budget', None)
+                    measure(name, lambda: method(**kwargs(data)))
+                transaction.set_rollback(True)
+    return results
+
+
+@pytest.mark.parametrize('name', CASE_NAMES)
+def test_query_budget(query_counts, name):
+    result = query_counts[name]
+    small, large = (result['counts'][size] for size in SIZES)
+
+    assert result['budget'] is not None, f"{name}: no @query_budget declared"
+    assert small == large, f"{name}: {small} queries at size {SIZES[0]}, {large} at size {SIZES[1]}"
+    assert large <= result['budget'], f"{name}: {large} queries, budget {result['budget']}"
+
+
+def test_every_api_view_is_budgeted_and_measured(query_counts):
+    measured = {result['handler'] for result in query_counts.values() if 'handler' in result}
+
+    for view_class, handler in _api_handlers():
+        assert budget_for(view_class, handler) is not None, f"{view_class.__name__}.{handler.__name__}: no budget"
+        assert (view_class, handler) in measured, f"{view_class.__name__}.{handler.__name__}: no query budget case"